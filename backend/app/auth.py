@@ -1,28 +1,27 @@
 # app/auth.py
 import os
 from datetime import datetime, timedelta
-from passlib.context import CryptContext # type:ignore
+from typing import Optional
 from jose import jwt,  JWTError # type:ignore
 
 from fastapi import Depends, HTTPException, status # type:ignore
 from fastapi.security import OAuth2PasswordBearer # type:ignore
-from sqlmodel import Session, select # type:ignore
+from sqlmodel.ext.asyncio.session import AsyncSession # type:ignore
 
 from .models import User
 from .db import get_session
+from .schemas import CurrentUser
+from .core.user_cache import get_cached_user, cache_user
+# hashing lives with its process pool; re-exported for existing imports
+from .core.passwords import get_password_hash, verify_password # noqa: F401
 
 SECRET_KEY = os.environ.get("SECRET_KEY","abcde")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 5 # 5 min for dev
 
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated="auto") # password context, hashmigration for new algo new hash generation
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
-
-def get_password_hash(password: str)->str:
-    return pwd_context.hash(password)
-
-def verify_password(plain:str, hashed:str)->bool:
-    return pwd_context.verify(plain,hashed)
+# for endpoints that serve anonymous callers too
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
 def create_access_token(subject:str,expires_delta:timedelta = None)-> str:
     to_encode = {'sub':str(subject)}
@@ -31,7 +30,7 @@ def create_access_token(subject:str,expires_delta:timedelta = None)-> str:
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token:str= Depends(oauth2_scheme), session: Session = Depends(get_session))-> User:
+async def get_current_user(token:str= Depends(oauth2_scheme), session: AsyncSession = Depends(get_session))-> CurrentUser:
     credentials_exception = HTTPException(
         status_code = status.HTTP_401_UNAUTHORIZED,
         detail='Could not validate credentials',
@@ -44,7 +43,23 @@ def get_current_user(token:str= Depends(oauth2_scheme), session: Session = Depen
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = session.get(User, int(user_id))
-    if not user:
-        raise credentials_exception
-    return user
\ No newline at end of file
+    user = await get_cached_user(int(user_id))
+    if user is None:
+        db_user = await session.get(User, int(user_id))
+        if not db_user:
+            raise credentials_exception
+        user = CurrentUser.model_validate(db_user, from_attributes=True)
+        await cache_user(user)
+    return user
+
+async def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme), session: AsyncSession = Depends(get_session)) -> Optional[CurrentUser]:
+    # None without a token, and for a bad or expired one: clients keep sending
+    # their stored token, a public read must not fail on it
+    if token is None:
+        return None
+    try:
+        return await get_current_user(token, session)
+    except HTTPException as exc:
+        if exc.status_code != status.HTTP_401_UNAUTHORIZED:
+            raise
+        return None
@@ -0,0 +1,116 @@
+# app/core/cache.py
+"""Versioned Redis cache for rendered comment threads.
+
+Every post has a version counter; rendered payloads are stored under the
+version they were built from, so a write only has to INCR the counter and
+readers never see a thread older than the last bump. The same counter
+backs the ETags of the post and thread endpoints. A counter starts at a
+random value, so one lost with Redis never repeats a version (and an ETag)
+a client may still hold. Counters are created on the first read of any
+id, so they expire after THREAD_VERSION_TTL without writes, and the purge
+drops them with the post. Redis being down is never fatal: reads fall
+through to the database and writes skip the bump (payloads also carry a
+TTL, which bounds any staleness from a missed bump).
+"""
+import os
+import secrets
+from typing import List, Optional, Sequence, Tuple
+
+from redis.exceptions import RedisError # type:ignore
+
+from app.core.redis_client import redis_client, redis_available, mark_redis_down
+
+THREAD_CACHE_TTL = int(os.getenv("THREAD_CACHE_TTL", 300))
+# bound on replica lag; a replica render may predate the version it is stored under
+REPLICA_THREAD_CACHE_TTL = int(os.getenv("REPLICA_THREAD_CACHE_TTL", 5))
+# an expired counter restarts at a fresh epoch, costing one re-render and one full response per client
+THREAD_VERSION_TTL = int(os.getenv("THREAD_VERSION_TTL", 86400))
+
+def thread_version_key(post_id: int) -> str:
+    return f"post:{post_id}:thread_version"
+
+def thread_payload_key(post_id: int, version: str, replica: bool = False) -> str:
+    # replica renders may lag their version, so they are kept apart and get no ETag
+    return f"post:{post_id}:thread:v{version}" + (":replica" if replica else "")
+
+def _new_epoch() -> int:
+    return secrets.randbits(40) << 16
+
+# KEYS: version key; ARGV: fresh epoch used when the counter does not exist, TTL
+_BUMP_VERSION = """
+if redis.call('exists', KEYS[1]) == 1 then
+    local version = redis.call('incr', KEYS[1])
+    redis.call('expire', KEYS[1], ARGV[2])
+    return version
+end
+redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return ARGV[1]
+"""
+
+async def get_thread_versions(post_ids: Sequence[int]) -> Optional[List[str]]:
+    """Current version of each post (one MGET in the common case), None without Redis."""
+    if not redis_available():
+        return None
+    keys = [thread_version_key(post_id) for post_id in post_ids]
+    try:
+        versions = await redis_client.mget(keys) if keys else []
+        missing = [i for i, version in enumerate(versions) if version is None]
+        if missing:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for i in missing:
+                    pipe.set(keys[i], _new_epoch(), nx=True, ex=THREAD_VERSION_TTL)
+                    pipe.get(keys[i])
+                replies = await pipe.execute()
+            for i, version in zip(missing, replies[1::2]):
+                versions[i] = version
+        return versions
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        return None
+
+async def get_thread_version(post_id: int) -> Optional[str]:
+    versions = await get_thread_versions([post_id])
+    return versions[0] if versions else None
+
+async def get_cached_thread(post_id: int, version: Optional[str], replica: bool = False) -> Tuple[Optional[str], bool]:
+    """(payload rendered at `version`, whether it came from the primary).
+
+    Replica readers also accept a replica render; primary readers only a
+    primary one. The payload is None on a miss or without Redis.
+    """
+    if version is None or not redis_available():
+        return None, False
+    keys = [thread_payload_key(post_id, version)]
+    if replica:
+        keys.append(thread_payload_key(post_id, version, replica=True))
+    try:
+        payloads = await redis_client.mget(keys)
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        return None, False
+    if payloads[0] is not None:
+        return payloads[0], True
+    return (payloads[1] if replica else None), False
+
+async def store_thread(post_id: int, version: Optional[str], payload: str, ttl: int = THREAD_CACHE_TTL, replica: bool = False) -> None:
+    if version is None or not redis_available():
+        return
+    try:
+        await redis_client.set(thread_payload_key(post_id, version, replica), payload, ex=ttl)
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+
+async def bump_thread_version(post_id: int) -> None:
+    # called after the write has committed; always attempted so a recovered
+    # Redis stops serving the old version as soon as possible
+    try:
+        await redis_client.eval(_BUMP_VERSION, 1, thread_version_key(post_id), _new_epoch(), THREAD_VERSION_TTL)
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+
+async def delete_thread_version(post_id: int) -> None:
+    # payloads stored under it expire on their own
+    try:
+        await redis_client.delete(thread_version_key(post_id))
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
@@ -0,0 +1,267 @@
+# app/core/like_buffer.py
+"""Write-behind buffering for like toggles (LIKE_WRITE_BEHIND=true).
+
+Toggles are applied to a per-comment Redis set of liker ids, so the
+response (liked, likes_count) is exact immediately, and appended to the
+likes:log stream. A background flusher folds the log into CommentLike in
+large batches every LIKE_FLUSH_INTERVAL seconds, recomputes the affected
+likes_count columns and then advances the likes:watermark. Replaying
+entries past the watermark is idempotent (each pair is applied as its
+final state), so after a crash or restart the flusher simply resumes
+from the watermark. Thread reads see new counts after the next flush.
+Log entries carry the post id, so a flush writes each comment's likes to
+the shard holding its thread (app.core.sharding).
+"""
+import asyncio
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from redis.exceptions import RedisError # type:ignore
+from sqlalchemy import delete, func, tuple_, update # type:ignore
+from sqlalchemy.ext.asyncio import AsyncEngine # type:ignore
+from sqlmodel import select # type:ignore
+from sqlmodel.ext.asyncio.session import AsyncSession # type:ignore
+
+from app import db
+from app.core.cache import bump_thread_version
+from app.core.redis_client import redis_client, redis_available, mark_redis_down, acquire_lock, release_lock
+from app.core.sharding import group_by_shard, shard_router
+from app.models import Comment, CommentLike
+from app.utils.ranking import hot_score
+
+logger = logging.getLogger(__name__)
+
+LIKE_WRITE_BEHIND = os.getenv("LIKE_WRITE_BEHIND", "False").lower() == "true"
+LIKE_FLUSH_INTERVAL = float(os.getenv("LIKE_FLUSH_INTERVAL", 2))
+LIKE_FLUSH_BATCH = int(os.getenv("LIKE_FLUSH_BATCH", 5000))
+# idle like sets expire; must stay far above the flush interval
+LIKE_SET_TTL = int(os.getenv("LIKE_SET_TTL", 86400))
+# bound on ids per IN list (SQLite caps bound parameters)
+LIKED_LOOKUP_CHUNK = int(os.getenv("LIKED_LOOKUP_CHUNK", 1000))
+
+LIKE_LOG = "likes:log"
+LIKE_WATERMARK = "likes:watermark"
+LIKE_FLUSH_LOCK = "likes:flush_lock"
+
+def _likers_key(comment_id: int) -> str:
+    return f"likes:{comment_id}:users"
+
+def _seeded_key(comment_id: int) -> str:
+    return f"likes:{comment_id}:seeded"
+
+# KEYS: likers set, seeded marker, log stream; ARGV: user id, comment id, ttl, post id
+# returns {-1, 0} when the set has not been seeded from the database yet
+_TOGGLE = """
+if redis.call('exists', KEYS[2]) == 0 then
+    return {-1, 0}
+end
+local liked = 1
+if redis.call('sismember', KEYS[1], ARGV[1]) == 1 then
+    redis.call('srem', KEYS[1], ARGV[1])
+    liked = 0
+else
+    redis.call('sadd', KEYS[1], ARGV[1])
+end
+redis.call('xadd', KEYS[3], '*', 'c', ARGV[2], 'u', ARGV[1], 'l', liked, 'p', ARGV[4])
+redis.call('expire', KEYS[1], ARGV[3])
+redis.call('expire', KEYS[2], ARGV[3])
+return {liked, redis.call('scard', KEYS[1])}
+"""
+
+# KEYS: likers set, seeded marker; ARGV: ttl, user ids...
+# a concurrent seeder may have won (and toggles applied since), then do nothing
+_SEED = """
+if redis.call('exists', KEYS[2]) == 1 then
+    return 0
+end
+for i = 2, #ARGV do
+    redis.call('sadd', KEYS[1], ARGV[i])
+end
+redis.call('set', KEYS[2], 1, 'EX', ARGV[1])
+redis.call('expire', KEYS[1], ARGV[1])
+return 1
+"""
+
+_toggle = redis_client.register_script(_TOGGLE)
+_seed = redis_client.register_script(_SEED)
+
+_flusher: Optional[asyncio.Task] = None
+
+
+async def buffered_toggle(session: AsyncSession, comment_id: int, post_id: int, user_id: int) -> Tuple[bool, int]:
+    """Toggle in Redis, seeding the comment's liker set from CommentLike on first use.
+
+    session is on the shard holding the comment.
+    """
+    keys = [_likers_key(comment_id), _seeded_key(comment_id), LIKE_LOG]
+    args = [user_id, comment_id, LIKE_SET_TTL, post_id]
+    liked, count = await _toggle(keys=keys, args=args)
+    if int(liked) == -1:
+        likers = (await session.exec(
+            select(CommentLike.user_id).where(CommentLike.comment_id == comment_id)
+        )).all()
+        await _seed(keys=keys[:2], args=[LIKE_SET_TTL, *likers])
+        liked, count = await _toggle(keys=keys, args=args)
+    return bool(int(liked)), int(count)
+
+async def liked_comment_ids(session: AsyncSession, user_id: int, comment_ids: Iterable[int]) -> Set[int]:
+    """The subset of comment_ids liked by user_id, without a query per comment.
+
+    CommentLike is read with IN lookups on its (comment_id, user_id) unique
+    index. Under write-behind the buffered liker sets are newer than the
+    table, so seeded comments are answered from them in one pipelined round
+    trip, and only the rest go to the database. Without Redis every comment
+    goes to the database, missing likes not flushed yet.
+    """
+    pending = list(comment_ids)
+    liked: Set[int] = set()
+    if LIKE_WRITE_BEHIND and pending and redis_available():
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for comment_id in pending:
+                    pipe.exists(_seeded_key(comment_id))
+                    pipe.sismember(_likers_key(comment_id), user_id)
+                replies = await pipe.execute()
+        except (RedisError, OSError) as exc:
+            mark_redis_down(exc)
+            replies = [0, 0] * len(pending)
+        unseeded = []
+        for comment_id, seeded, member in zip(pending, replies[::2], replies[1::2]):
+            if not seeded:
+                unseeded.append(comment_id)
+            elif member:
+                liked.add(comment_id)
+        pending = unseeded
+
+    for start in range(0, len(pending), LIKED_LOOKUP_CHUNK):
+        chunk = pending[start:start + LIKED_LOOKUP_CHUNK]
+        liked.update((await session.exec(
+            select(CommentLike.comment_id)
+            .where(CommentLike.user_id == user_id, CommentLike.comment_id.in_(chunk))
+        )).all())
+    return liked
+
+async def _apply(session: AsyncSession, final: Dict[Tuple[int, int], bool]) -> List[int]:
+    """Write the final like state of each (comment_id, user_id) pair, returns affected post ids."""
+    likes = [pair for pair, liked in final.items() if liked]
+    unlikes = [pair for pair, liked in final.items() if not liked]
+    pair_col = tuple_(CommentLike.comment_id, CommentLike.user_id)
+
+    if unlikes:
+        await session.exec(delete(CommentLike).where(pair_col.in_(unlikes)))
+    comment_ids = sorted({c for c, _ in final})
+    if likes:
+        existing = set((await session.exec(
+            select(CommentLike.comment_id, CommentLike.user_id).where(pair_col.in_(likes))
+        )).all())
+        # comments purged with a deleted post since the toggle take their likes with them
+        alive = set((await session.exec(select(Comment.id).where(Comment.id.in_(comment_ids)))).all())
+        session.add_all(
+            CommentLike(comment_id=c, user_id=u) for c, u in likes if (c, u) not in existing and c in alive
+        )
+
+    await session.exec(
+        update(Comment)
+        .where(Comment.id.in_(comment_ids))
+        .values(likes_count=(
+            select(func.count(CommentLike.id))
+            .where(CommentLike.comment_id == Comment.id)
+            .scalar_subquery()
+        ))
+        .execution_options(synchronize_session=False)
+    )
+    rows = (await session.exec(
+        select(Comment.id, Comment.post_id, Comment.likes_count, Comment.created_at)
+        .where(Comment.id.in_(comment_ids))
+    )).all()
+    if rows:
+        await session.exec(update(Comment), params=[
+            {"id": comment_id, "hot_score": hot_score(likes_count, created_at)}
+            for comment_id, _, likes_count, created_at in rows
+        ])
+    await session.commit()
+    return list({post_id for _, post_id, _, _ in rows})
+
+async def _apply_sharded(session: AsyncSession, final: Dict[Tuple[int, int], bool], posts: Dict[int, int]) -> List[int]:
+    """_apply on every shard holding one of the comments; session is on the main database."""
+    if not shard_router.enabled:
+        return await _apply(session, final)
+    for comment_id, _ in final:
+        if comment_id not in posts:
+            # logged before entries carried the post id
+            post_id = await shard_router.comment_post_id(session, comment_id)
+            if post_id is not None:
+                posts[comment_id] = post_id
+    post_ids: List[int] = []
+    for shard_name, shard_posts in (await group_by_shard(session, set(posts.values()))).items():
+        on_shard = set(shard_posts)
+        subset = {pair: liked for pair, liked in final.items() if posts.get(pair[0]) in on_shard}
+        async with shard_router.session(shard_name, session) as shard:
+            post_ids.extend(await _apply(shard, subset))
+    return post_ids
+
+async def flush_likes(engine: Optional[AsyncEngine] = None, batch_size: int = LIKE_FLUSH_BATCH) -> int:
+    """Flush one batch of the log past the watermark; returns entries consumed."""
+    # one flusher at a time across workers
+    token = await acquire_lock(LIKE_FLUSH_LOCK, 60)
+    if token is None:
+        return 0
+    try:
+        watermark = await redis_client.get(LIKE_WATERMARK) or "0-0"
+        entries = await redis_client.xrange(LIKE_LOG, min=f"({watermark}", max="+", count=batch_size)
+        if not entries:
+            return 0
+
+        final: Dict[Tuple[int, int], bool] = {}
+        posts: Dict[int, int] = {}
+        for _, fields in entries:
+            final[(int(fields["c"]), int(fields["u"]))] = fields["l"] == "1"
+            if "p" in fields:
+                posts[int(fields["c"])] = int(fields["p"])
+        async with AsyncSession(engine or db.async_engine, expire_on_commit=False) as session:
+            post_ids = await _apply_sharded(session, final, posts)
+
+        last_id = entries[-1][0]
+        await redis_client.set(LIKE_WATERMARK, last_id)
+        await redis_client.xtrim(LIKE_LOG, minid=last_id)
+        for post_id in post_ids:
+            await bump_thread_version(post_id)
+        return len(entries)
+    finally:
+        await release_lock(LIKE_FLUSH_LOCK, token)
+
+async def flush_all(engine: Optional[AsyncEngine] = None) -> int:
+    flushed = 0
+    while (count := await flush_likes(engine)):
+        flushed += count
+    return flushed
+
+async def _flush_periodically() -> None:
+    while True:
+        await asyncio.sleep(LIKE_FLUSH_INTERVAL)
+        try:
+            await flush_all()
+        except Exception:
+            # keep the loop alive, the watermark makes the next attempt resume
+            logger.exception("like flush failed")
+
+async def start_like_flusher() -> None:
+    global _flusher
+    if LIKE_WRITE_BEHIND and _flusher is None:
+        # replay whatever a previous run left past the watermark
+        try:
+            await flush_all()
+        except (RedisError, OSError):
+            logger.exception("initial like flush failed, the periodic flusher will retry")
+        _flusher = asyncio.create_task(_flush_periodically())
+
+async def stop_like_flusher() -> None:
+    global _flusher
+    if _flusher is not None:
+        _flusher.cancel()
+        _flusher = None
+        try:
+            await flush_all()
+        except (RedisError, OSError):
+            logger.exception("final like flush failed, entries stay in the log for the next start")
@@ -0,0 +1,333 @@
+# app/core/metrics.py
+"""In-process metrics, exposed on /metrics in the Prometheus text format.
+
+Every recording is a dict lookup and an integer or float add on the event
+loop thread, so the instrumentation is cheap enough to stay on in
+production (METRICS_ENABLED=false turns the hooks off). Sources:
+
+- MetricsMiddleware: latency and in-flight requests per route template.
+- SQLAlchemy cursor events on every Engine: statement count and database
+  time, overall and per request, so routes that issue a query per row
+  show up in http_request_db_queries.
+- instrument_redis: latency and errors per Redis command.
+- Collectors run at scrape time: the default threadpool, the password
+  pool, the single-flight coalescing counters and the event hub.
+
+Values are per worker process; Prometheus aggregates across workers.
+"""
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event # type:ignore
+from sqlalchemy.engine import Engine # type:ignore
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return self.header() + self.samples()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def set(self, *label_values: str, value: float) -> None:
+        # for counters, only to mirror a count kept elsewhere
+        self._values[label_values] = value
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, values)} {_format_value(value)}"
+            for values, value in self._values.items()
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *label_values: str, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # per label set: [count per bucket (the last one is +Inf), sum]; cumulated when rendering
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return sum(series[0]) if series else 0
+
+    def total(self, *label_values: str) -> float:
+        series = self._series.get(label_values)
+        return series[1][0] if series else 0.0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for values, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def collector(self, fn: Callable[[], None]) -> Callable[[], None]:
+        """Register fn to refresh gauges right before each scrape."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        for collect in self._collectors:
+            collect()
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter("http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"))
+http_latency = registry.histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+http_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests being served.", ("method",))
+request_db_queries = registry.histogram(
+    "http_request_db_queries", "SQL statements issued per HTTP request.", ("method", "route"), COUNT_BUCKETS,
+)
+request_db_time = registry.histogram("http_request_db_seconds", "Time spent in SQL per HTTP request.", ("method", "route"))
+db_queries = registry.counter("db_queries_total", "SQL statements executed.")
+db_query_latency = registry.histogram("db_query_duration_seconds", "SQL statement latency.", buckets=FAST_BUCKETS)
+redis_latency = registry.histogram("redis_command_duration_seconds", "Redis command latency.", ("command",), FAST_BUCKETS)
+redis_errors = registry.counter("redis_command_errors_total", "Redis commands that raised.", ("command",))
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+# the stats of the request being served; tasks it spawns inherit them
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def _route_template(scope: dict) -> str:
+    # the template, not the raw path, keeps label cardinality bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class MetricsMiddleware:
+    """Pure ASGI, so it adds no task or body buffering to each request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        http_in_flight.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.dec(method)
+            _request_stats.reset(token)
+            route = _route_template(scope)
+            http_requests.inc(method, route, str(status_code))
+            http_latency.observe(elapsed, method, route)
+            request_db_queries.observe(stats.queries, method, route)
+            request_db_time.observe(stats.db_seconds, method, route)
+
+
+# registered on the Engine class, so every engine (async ones included) is covered
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None or not METRICS_ENABLED:
+        return
+    elapsed = time.perf_counter() - started
+    db_queries.inc()
+    db_query_latency.observe(elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+def instrument_redis(client) -> None:
+    """Time every command sent through client; pipelines are timed as one PIPELINE command."""
+    if not METRICS_ENABLED or getattr(client, "_metrics_instrumented", False):
+        return
+    execute_command = client.execute_command
+    pipeline = client.pipeline
+
+    async def timed_execute_command(*args, **options):
+        command = str(args[0]).upper() if args else "UNKNOWN"
+        started = time.perf_counter()
+        try:
+            return await execute_command(*args, **options)
+        except Exception:
+            redis_errors.inc(command)
+            raise
+        finally:
+            redis_latency.observe(time.perf_counter() - started, command)
+
+    def timed_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        async def timed_execute(*exec_args, **exec_kwargs):
+            started = time.perf_counter()
+            try:
+                return await execute(*exec_args, **exec_kwargs)
+            except Exception:
+                redis_errors.inc("PIPELINE")
+                raise
+            finally:
+                redis_latency.observe(time.perf_counter() - started, "PIPELINE")
+
+        pipe.execute = timed_execute
+        return pipe
+
+    client.execute_command = timed_execute_command
+    client.pipeline = timed_pipeline
+    client._metrics_instrumented = True
+
+
+# scrape-time collectors
+threadpool_capacity = registry.gauge("threadpool_capacity", "Size of the default threadpool (sync endpoints and dependencies).")
+threadpool_busy = registry.gauge("threadpool_busy_threads", "Threadpool threads currently running a job.")
+threadpool_waiting = registry.gauge("threadpool_waiting_tasks", "Tasks queued for a threadpool thread; above zero means saturated.")
+password_pool_pending = registry.gauge("password_pool_pending", "bcrypt operations queued or running.")
+password_pool_limit = registry.gauge("password_pool_max_pending", "Pending bcrypt operations allowed before answering 429.")
+singleflight_requests = registry.counter(
+    "singleflight_requests_total", "Coalesced reads by outcome: executed here or answered by another run.", ("flight", "outcome"),
+)
+ws_connections = registry.gauge("websocket_connections", "Live event WebSocket clients.")
+ws_resyncs = registry.counter("websocket_resyncs_total", "Slow WebSocket clients whose backlog was dropped.")
+
+@registry.collector
+def _collect_threadpool() -> None:
+    from anyio import to_thread # type:ignore
+    limiter = to_thread.current_default_thread_limiter()
+    threadpool_capacity.set(value=limiter.total_tokens)
+    threadpool_busy.set(value=limiter.borrowed_tokens)
+    threadpool_waiting.set(value=limiter.statistics().tasks_waiting)
+
+@registry.collector
+def _collect_app_state() -> None:
+    from app.core import passwords
+    from app.core.realtime import hub
+    from app.core.singleflight import thread_flight, post_flight
+
+    password_pool_pending.set(value=passwords.password_pool_pending())
+    password_pool_limit.set(value=passwords.PASSWORD_POOL_MAX_PENDING)
+    for flight in (thread_flight, post_flight):
+        for outcome, count in flight.stats().items():
+            singleflight_requests.set(flight.name, outcome, value=count)
+    ws_connections.set(value=hub.connections)
+    ws_resyncs.set(value=hub.resyncs)
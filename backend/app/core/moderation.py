@@ -0,0 +1,260 @@
+# app/core/moderation.py
+"""Blocklist moderation of comment text on create and update.
+
+Terms come from MODERATION_TERMS_FILE, one per line ("#" starts a comment):
+
+    badword              the default action (MODERATION_ACTION)
+    badword | mask       per-term action: reject, mask or flag
+    *spam*               "*" lifts the word boundary on that side
+
+A comment matching a reject term gets a 400, mask terms are replaced with
+"*" in the stored text, flag terms set Comment.flagged for review.
+
+All terms are compiled into one Aho-Corasick automaton, so matching is a
+single pass over the comment whatever the size of the list. Text and
+terms go through the same normalization first: compatibility
+decomposition (fullwidth and styled letters, ligatures), accents and
+zero-width characters dropped, case folded, a few Cyrillic/Greek
+lookalikes and leetspeak digits/symbols mapped to letters. Matches are
+mapped back to the original characters for masking.
+
+The file is checked for changes at most every MODERATION_RELOAD_INTERVAL
+seconds and rebuilt in place, so edits apply without a restart. A file
+that fails to load keeps the previous list.
+"""
+import logging
+import os
+import time
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException # type:ignore
+from fastapi.concurrency import run_in_threadpool # type:ignore
+
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+MODERATION_TERMS_FILE = os.getenv("MODERATION_TERMS_FILE", "")
+MODERATION_ACTION = os.getenv("MODERATION_ACTION", "reject")
+MODERATION_RELOAD_INTERVAL = float(os.getenv("MODERATION_RELOAD_INTERVAL", 5))
+# longer comments are matched on the threadpool instead of the event loop
+MODERATION_INLINE_CHARS = int(os.getenv("MODERATION_INLINE_CHARS", 4096))
+
+REJECT = "reject"
+MASK = "mask"
+FLAG = "flag"
+ACTIONS = (REJECT, MASK, FLAG)
+
+moderation_terms = registry.gauge("moderation_terms", "Terms in the loaded moderation list.")
+moderation_matches = registry.counter("moderation_matches_total", "Comments matching the moderation list, by action.", ("action",))
+
+_LEET = str.maketrans({
+    "0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b",
+    "@": "a", "$": "s", "!": "i", "|": "l", "+": "t",
+})
+# lookalikes that compatibility decomposition leaves alone
+_CONFUSABLES = str.maketrans({
+    "а": "a", "в": "b", "е": "e", "к": "k", "м": "m", "н": "h", "о": "o", "р": "p",
+    "с": "c", "т": "t", "у": "y", "х": "x", "і": "i", "ј": "j", "ѕ": "s", "ԁ": "d",
+    "α": "a", "β": "b", "ε": "e", "ι": "i", "κ": "k", "ν": "v", "ο": "o", "ρ": "p",
+    "τ": "t", "υ": "u", "χ": "x",
+})
+
+
+@lru_cache(maxsize=65536)
+def _fold_char(ch: str) -> str:
+    kept = "".join(
+        c for c in unicodedata.normalize("NFKD", ch)
+        if not unicodedata.combining(c) and unicodedata.category(c) != "Cf"
+    )
+    return kept.casefold().translate(_CONFUSABLES).translate(_LEET)
+
+def normalize(text: str) -> Tuple[str, Optional[List[int]]]:
+    """The folded text and, per folded character, its index in text (None: same index)."""
+    if text.isascii():
+        # the common case folds one to one, without the per-character loop
+        return text.lower().translate(_LEET), None
+    folded: List[str] = []
+    origin: List[int] = []
+    for index, ch in enumerate(text):
+        part = _fold_char(ch)
+        folded.append(part)
+        origin.extend([index] * len(part))
+    return "".join(folded), origin
+
+
+def _word_char(text: str, folded: str, origin: Optional[List[int]], index: int) -> bool:
+    # "!" folds to a letter but still ends a word
+    return folded[index].isalnum() and text[index if origin is None else origin[index]].isalnum()
+
+
+class Term(NamedTuple):
+    text: str
+    action: str
+    # word boundary required at the start / end
+    bounded_start: bool = True
+    bounded_end: bool = True
+
+def parse_terms(lines: Iterable[str], default_action: str = MODERATION_ACTION) -> List[Term]:
+    terms = []
+    for line in lines:
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        text, _, action = (part.strip() for part in line.rpartition("|")) if "|" in line else (line, "", default_action)
+        if action not in ACTIONS:
+            raise ValueError(f"unknown moderation action {action!r} for {text!r}")
+        terms.append(Term(text.strip("*"), action, not text.startswith("*"), not text.endswith("*")))
+    return terms
+
+
+class Match(NamedTuple):
+    term: Term
+    # span in the original text
+    start: int
+    end: int
+
+class TermMatcher:
+    """Aho-Corasick automaton over the normalized terms."""
+
+    def __init__(self, terms: Iterable[Term]):
+        self.terms: List[Term] = []
+        lengths: List[int] = []
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for term in terms:
+            pattern, _ = normalize(term.text)
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    next_state = goto[state][ch] = len(goto)
+                    goto.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(len(self.terms))
+            self.terms.append(term)
+            lengths.append(len(pattern))
+
+        # breadth first, so a state's failure target is finished before it
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in goto[state].items():
+                queue.append(child)
+                target = fail[state]
+                while target and ch not in goto[target]:
+                    target = fail[target]
+                fail[child] = goto[target].get(ch, 0)
+                outputs[child].extend(outputs[fail[child]])
+        self._goto = goto
+        self._fail = fail
+        self._outputs = [tuple(out) for out in outputs]
+        self._lengths = lengths
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def finditer(self, text: str) -> Iterator[Match]:
+        """Term occurrences honoring word boundaries, in one pass over text."""
+        if not self.terms:
+            return
+        folded, origin = normalize(text)
+        goto, fail, outputs, lengths, terms = self._goto, self._fail, self._outputs, self._lengths, self.terms
+        size = len(folded)
+        state = 0
+        for pos, ch in enumerate(folded):
+            next_state = goto[state].get(ch)
+            while next_state is None and state:
+                state = fail[state]
+                next_state = goto[state].get(ch)
+            state = next_state or 0
+            if not outputs[state]:
+                continue
+            for index in outputs[state]:
+                term = terms[index]
+                start = pos + 1 - lengths[index]
+                if term.bounded_start and start > 0 and _word_char(text, folded, origin, start - 1):
+                    continue
+                if term.bounded_end and pos + 1 < size and _word_char(text, folded, origin, pos + 1):
+                    continue
+                if origin is None:
+                    yield Match(term, start, pos + 1)
+                else:
+                    yield Match(term, origin[start], origin[pos] + 1)
+
+
+class Verdict(NamedTuple):
+    content: str
+    rejected: bool
+    flagged: bool
+    matches: List[Match]
+
+def _mask(text: str, matches: List[Match]) -> str:
+    chars = list(text)
+    for match in matches:
+        for index in range(match.start, match.end):
+            if not chars[index].isspace():
+                chars[index] = "*"
+    return "".join(chars)
+
+class Moderator:
+    def __init__(self, path: str = "", reload_interval: float = MODERATION_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.matcher = TermMatcher(())
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        if path:
+            self.reload()
+
+    def reload(self) -> bool:
+        """Rebuild from the term file when it changed; False when it failed to load."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime:
+                return True
+            with open(self.path, encoding="utf-8") as f:
+                matcher = TermMatcher(parse_terms(f))
+        except (OSError, ValueError):
+            logger.exception("moderation terms not reloaded from %s, keeping %d terms", self.path, len(self.matcher))
+            return False
+        # swapped whole, a check in flight keeps the automaton it started with
+        self.matcher, self._mtime = matcher, mtime
+        moderation_terms.set(value=len(matcher))
+        logger.info("loaded %d moderation terms from %s", len(matcher), self.path)
+        return True
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if self.path and now - self._checked_at >= self.reload_interval:
+            self._checked_at = now
+            self.reload()
+
+    def check(self, text: str) -> Verdict:
+        self._maybe_reload()
+        matches = list(self.matcher.finditer(text))
+        actions = {match.term.action for match in matches}
+        for action in actions:
+            moderation_matches.inc(action)
+        masked = [match for match in matches if match.term.action == MASK]
+        return Verdict(_mask(text, masked) if masked else text, REJECT in actions, FLAG in actions, matches)
+
+moderator = Moderator(MODERATION_TERMS_FILE)
+
+
+async def moderate_comment(content: str) -> Tuple[str, bool]:
+    """(text to store, flagged) for a comment body; 400 when it contains a reject term."""
+    if len(content) > MODERATION_INLINE_CHARS:
+        verdict = await run_in_threadpool(moderator.check, content)
+    else:
+        verdict = moderator.check(content)
+    if verdict.rejected:
+        raise HTTPException(status_code=400, detail="comment contains blocked terms")
+    return verdict.content, verdict.flagged
@@ -0,0 +1,81 @@
+# app/core/passwords.py
+"""bcrypt hashing, run on a dedicated, bounded process pool.
+
+The hashing functions live in this small module (no DB or app imports) so
+spawned pool workers start quickly. At most PASSWORD_POOL_MAX_PENDING
+operations may be queued or running per API worker; beyond that callers
+get a 429 instead of piling up behind a login storm.
+PASSWORD_POOL_WORKERS=0 runs hashing on the threadpool instead (dev/tests).
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Optional, Tuple, TypeVar
+
+from fastapi import HTTPException, status # type:ignore
+from fastapi.concurrency import run_in_threadpool # type:ignore
+from passlib.context import CryptContext # type:ignore
+
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", 2))
+PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", 64))
+
+# hashes below BCRYPT_ROUNDS are upgraded on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+
+pwd_context = CryptContext(
+    schemes=['bcrypt'],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+) # password context, hashmigration for new algo new hash generation
+
+T = TypeVar("T")
+
+_executor: Optional[Executor] = None
+_pending = 0
+
+def get_password_hash(password: str)->str:
+    return pwd_context.hash(password)
+
+def verify_password(plain:str, hashed:str)->bool:
+    return pwd_context.verify(plain,hashed)
+
+def verify_and_update_password(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    # (valid, new_hash): new_hash is set when the stored hash uses outdated settings
+    return pwd_context.verify_and_update(plain, hashed)
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        # spawn: forking a process that runs an event loop and threads is unsafe
+        _executor = ProcessPoolExecutor(
+            max_workers=PASSWORD_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+def shutdown_password_pool() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def password_pool_pending() -> int:
+    return _pending
+
+async def run_in_password_pool(fn: Callable[..., T], *args) -> T:
+    global _pending
+    if _pending >= PASSWORD_POOL_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="too many concurrent password operations, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    _pending += 1
+    try:
+        if PASSWORD_POOL_WORKERS <= 0:
+            return await run_in_threadpool(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _pending -= 1
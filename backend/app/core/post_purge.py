@@ -0,0 +1,198 @@
+# app/core/post_purge.py
+"""Deleting posts: an immediate tombstone, then a batched background purge.
+
+delete_post only sets Post.deleted_at, so the request is a single-row
+update however large the thread is, and from then on the post reads as
+gone everywhere. The purger, one asyncio task per API worker with a Redis
+lock so only one of them works at a time, removes what the post owns in
+bounded transactions of POST_PURGE_BATCH rows:
+
+1. comments newest id first, so replies always go before their parents;
+   before each batch their likes are removed in chunks of at most
+   POST_PURGE_BATCH rows,
+2. the comments' search documents and CommentLocator rows,
+3. the post row itself.
+
+Comments and likes are removed on the shard holding the thread (both
+shards while it is being moved, app.core.sharding), everything else on
+the main database.
+
+Nothing tracks progress except the rows that are left, so a purge
+cut short by a restart just continues from them on the next run
+(python -m app.scripts.purge_deleted_posts runs one by hand).
+"""
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import delete # type:ignore
+from sqlalchemy.ext.asyncio import AsyncEngine # type:ignore
+from sqlmodel import select # type:ignore
+from sqlmodel.ext.asyncio.session import AsyncSession # type:ignore
+
+from app import db
+from app.core.cache import delete_thread_version
+from app.core.metrics import registry
+from app.core.redis_client import acquire_lock, extend_lock, release_lock
+from app.core.search import remove_post_documents
+from app.core.sharding import shard_router
+from app.models import Comment, CommentLike, CommentLocator, Post, PostShard
+
+logger = logging.getLogger(__name__)
+
+POST_PURGE_BATCH = int(os.getenv("POST_PURGE_BATCH", 5000))
+POST_PURGE_INTERVAL = float(os.getenv("POST_PURGE_INTERVAL", 30))
+# held across batches and extended after each one
+POST_PURGE_LOCK_SECONDS = int(os.getenv("POST_PURGE_LOCK_SECONDS", 60))
+
+POST_PURGE_LOCK = "posts:purge_lock"
+
+purged_rows = registry.counter("post_purge_rows_total", "Rows removed by the deleted-post purge.", ("table",))
+pending_posts = registry.gauge("post_purge_pending_posts", "Deleted posts still waiting to be purged, as of the last run.")
+
+# called after every committed batch with (post_id, table, rows removed)
+Progress = Callable[[int, str, int], Awaitable[None]]
+
+_purger: Optional[asyncio.Task] = None
+_wake = asyncio.Event()
+
+
+async def get_live_post(session: AsyncSession, post_id: int) -> Optional[Post]:
+    """The post, or None when it does not exist or has been deleted."""
+    post = await session.get(Post, post_id)
+    return post if post is not None and post.deleted_at is None else None
+
+async def _report(progress: Optional[Progress], post_id: int, table: str, rows: int) -> None:
+    purged_rows.inc(table, amount=rows)
+    if progress is not None:
+        await progress(post_id, table, rows)
+
+async def purge_post(
+    session: AsyncSession, post_id: int, batch_size: int = POST_PURGE_BATCH, progress: Optional[Progress] = None,
+) -> Dict[str, int]:
+    """Remove a tombstoned post and everything it owns, one committed batch at a time."""
+    removed = {"likes": 0, "comments": 0, "search": 0}
+    placement = await shard_router.placement(session, post_id)
+    for shard_name in filter(None, (placement.shard, placement.moving_to)):
+        async with shard_router.session(shard_name, session) as shard:
+            await _purge_comments(shard, post_id, batch_size, progress, removed)
+
+    while (documents := await remove_post_documents(session, post_id, limit=batch_size)):
+        await session.commit()
+        removed["search"] += documents
+        await _report(progress, post_id, "search", documents)
+
+    while (locators := (await session.exec(
+        delete(CommentLocator).where(CommentLocator.id.in_(
+            select(CommentLocator.id).where(CommentLocator.post_id == post_id).limit(batch_size).scalar_subquery()
+        )).execution_options(synchronize_session=False)
+    )).rowcount):
+        await session.commit()
+        await _report(progress, post_id, "locators", locators)
+
+    # a comment that slipped in after the last batch fails this on foreign keys
+    # (its locator's, when sharded); the next run picks it up
+    await session.exec(delete(PostShard).where(PostShard.post_id == post_id))
+    await session.exec(
+        delete(Post).where(Post.id == post_id, Post.deleted_at.is_not(None)).execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    shard_router.forget(post_id)
+    await delete_thread_version(post_id)
+    await _report(progress, post_id, "posts", 1)
+    return removed
+
+async def _purge_comments(
+    session: AsyncSession, post_id: int, batch_size: int, progress: Optional[Progress], removed: Dict[str, int],
+) -> None:
+    while True:
+        comment_ids: List[int] = (await session.exec(
+            select(Comment.id).where(Comment.post_id == post_id).order_by(Comment.id.desc()).limit(batch_size)
+        )).all()
+        if not comment_ids:
+            break
+        # a viral comment can carry more likes than a batch
+        while True:
+            likes = (await session.exec(
+                delete(CommentLike).where(CommentLike.id.in_(
+                    select(CommentLike.id).where(CommentLike.comment_id.in_(comment_ids)).limit(batch_size).scalar_subquery()
+                )).execution_options(synchronize_session=False)
+            )).rowcount
+            await session.commit()
+            removed["likes"] += likes
+            await _report(progress, post_id, "likes", likes)
+            if likes < batch_size:
+                break
+        # a like that raced the loop above is removed with its comment
+        await session.exec(
+            delete(CommentLike).where(CommentLike.comment_id.in_(comment_ids)).execution_options(synchronize_session=False)
+        )
+        comments = (await session.exec(
+            delete(Comment).where(Comment.id.in_(comment_ids)).execution_options(synchronize_session=False)
+        )).rowcount
+        await session.commit()
+        removed["comments"] += comments
+        await _report(progress, post_id, "comments", comments)
+
+async def purge_deleted_posts(
+    engine: Optional[AsyncEngine] = None, batch_size: int = POST_PURGE_BATCH, progress: Optional[Progress] = None,
+) -> int:
+    """Purge every tombstoned post, oldest deletion first; returns the number of posts purged."""
+    async with AsyncSession(engine or db.async_engine, expire_on_commit=False) as session:
+        post_ids = (await session.exec(
+            select(Post.id).where(Post.deleted_at.is_not(None)).order_by(Post.deleted_at)
+        )).all()
+        pending_posts.set(value=len(post_ids))
+        for purged, post_id in enumerate(post_ids, start=1):
+            removed = await purge_post(session, post_id, batch_size, progress)
+            pending_posts.set(value=len(post_ids) - purged)
+            logger.info("purged post %s: %s", post_id, removed)
+    return len(post_ids)
+
+
+async def _purge_locked() -> None:
+    # one purger at a time across workers
+    token = await acquire_lock(POST_PURGE_LOCK, POST_PURGE_LOCK_SECONDS)
+    if token is None:
+        return
+
+    async def keep_lock(post_id: int, table: str, rows: int) -> None:
+        if not await extend_lock(POST_PURGE_LOCK, token, POST_PURGE_LOCK_SECONDS):
+            raise RuntimeError("post purge lock lost")
+
+    try:
+        await purge_deleted_posts(progress=keep_lock)
+    finally:
+        await release_lock(POST_PURGE_LOCK, token)
+
+async def _purge_periodically() -> None:
+    while True:
+        try:
+            await asyncio.wait_for(_wake.wait(), POST_PURGE_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+        try:
+            await _purge_locked()
+        except Exception:
+            # keep the loop alive, whatever is left is picked up next time
+            logger.exception("post purge failed")
+
+def wake_post_purger() -> None:
+    # no-op outside the API process, the periodic run catches up anyway
+    _wake.set()
+
+async def start_post_purger() -> None:
+    global _purger
+    if _purger is None:
+        _purger = asyncio.create_task(_purge_periodically())
+        # resume purges a previous run left unfinished
+        wake_post_purger()
+
+async def stop_post_purger() -> None:
+    global _purger
+    if _purger is not None:
+        # a cancelled batch rolls back, the next start redoes it
+        _purger.cancel()
+        _purger = None
@@ -0,0 +1,80 @@
+# app/core/read_routing.py
+"""Read-your-writes window for replica routing.
+
+Successful writes by an authenticated user mark that user as a recent
+writer (in this worker and in Redis for the others). Their reads inside
+the window are served from the primary so they always see what they just
+wrote; everyone else reads from the replica. Does nothing unless
+DB_REPLICA_URL is configured.
+"""
+import os
+import time
+from typing import Dict, Optional
+
+from fastapi import Request # type:ignore
+from jose import jwt, JWTError # type:ignore
+from redis.exceptions import RedisError # type:ignore
+
+from app import db
+from app.auth import SECRET_KEY, ALGORITHM
+from app.core.redis_client import redis_client, redis_available, mark_redis_down
+
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
+
+_WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+_recent_writers: Dict[int, float] = {}  # user_id -> monotonic deadline, this worker only
+
+def _recent_writer_key(user_id: int) -> str:
+    return f"rw:{user_id}"
+
+def _user_id_from_request(request: Request) -> Optional[int]:
+    # signature check only, no DB lookup
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return int(jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])["sub"])
+    except (JWTError, KeyError, ValueError):
+        return None
+
+async def note_write(user_id: int) -> None:
+    now = time.monotonic()
+    if len(_recent_writers) > 10_000:
+        for uid, deadline in list(_recent_writers.items()):
+            if deadline < now:
+                del _recent_writers[uid]
+    _recent_writers[user_id] = now + READ_YOUR_WRITES_SECONDS
+    if not redis_available():
+        return
+    try:
+        await redis_client.set(_recent_writer_key(user_id), 1, px=int(READ_YOUR_WRITES_SECONDS * 1000))
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+
+async def wrote_recently(user_id: int) -> bool:
+    if _recent_writers.get(user_id, 0.0) > time.monotonic():
+        return True
+    if not redis_available():
+        # keep the primary protected, only this worker's writes are honoured
+        return False
+    try:
+        return bool(await redis_client.exists(_recent_writer_key(user_id)))
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        return False
+
+async def read_routing_middleware(request: Request, call_next):
+    if not db.replica_enabled():
+        return await call_next(request)
+    user_id = _user_id_from_request(request)
+    if user_id is None:
+        return await call_next(request)
+
+    if request.method not in _WRITE_METHODS:
+        request.state.read_primary = await wrote_recently(user_id)
+        return await call_next(request)
+
+    response = await call_next(request)
+    if response.status_code < 400:
+        await note_write(user_id)
+    return response
@@ -0,0 +1,169 @@
+# app/core/realtime.py
+"""Per-post live events over Redis pub/sub.
+
+Write handlers publish compact JSON events to post:{post_id}:events.
+Each worker runs one EventHub holding a single pub/sub connection that
+is subscribed only to the posts its local WebSocket clients watch, and
+fans every message out to their queues. like_count events are coalesced
+per post for LIKE_COALESCE_SECONDS and sent as one like_counts batch.
+Every client queue is bounded: a client that falls behind has its
+backlog dropped and gets a single {"type": "resync"} so it refetches.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, Set
+
+from redis.exceptions import RedisError # type:ignore
+
+from app.core.redis_client import redis_client, redis_available, mark_redis_down
+
+logger = logging.getLogger(__name__)
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", 100))
+LIKE_COALESCE_SECONDS = float(os.getenv("LIKE_COALESCE_SECONDS", 0.25))
+
+RESYNC = json.dumps({"type": "resync"})
+
+def event_channel(post_id: int) -> str:
+    return f"post:{post_id}:events"
+
+async def publish_event(post_id: int, event_type: str, data: dict) -> None:
+    """Best effort: live updates are an optimisation, never fail the write."""
+    if not redis_available():
+        return
+    try:
+        await redis_client.publish(event_channel(post_id), json.dumps({"type": event_type, "data": data}, default=str))
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+
+
+class Subscription:
+    __slots__ = ("post_id", "queue")
+
+    def __init__(self, post_id: int):
+        self.post_id = post_id
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+
+    async def get(self) -> str:
+        return await self.queue.get()
+
+
+class EventHub:
+    def __init__(self):
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._pending_likes: Dict[int, Dict[int, int]] = {}
+        self._pubsub = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.resyncs = 0
+
+    @property
+    def connections(self) -> int:
+        return sum(len(subs) for subs in self._subscriptions.values())
+
+    async def subscribe(self, post_id: int) -> Subscription:
+        subscription = Subscription(post_id)
+        subscribers = self._subscriptions.setdefault(post_id, set())
+        subscribers.add(subscription)
+        if len(subscribers) == 1:
+            try:
+                await self._watch(post_id)
+            except (RedisError, OSError):
+                # no live updates without Redis, let the client reconnect later
+                await self.unsubscribe(subscription)
+                raise
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscriptions.get(subscription.post_id)
+        if not subscribers:
+            return
+        subscribers.discard(subscription)
+        if subscribers:
+            return
+        del self._subscriptions[subscription.post_id]
+        self._pending_likes.pop(subscription.post_id, None)
+        if not self._subscriptions:
+            await self._stop()
+        elif self._pubsub is not None:
+            await self._pubsub.unsubscribe(event_channel(subscription.post_id))
+
+    async def _watch(self, post_id: int) -> None:
+        if self._pubsub is not None:
+            await self._pubsub.subscribe(event_channel(post_id))
+            return
+        self._pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(event_channel(post_id))
+        # started after the first subscribe so the reader always has a connection
+        self._tasks = {
+            asyncio.create_task(self._read_loop()),
+            asyncio.create_task(self._flush_likes_loop()),
+        }
+
+    async def _stop(self) -> None:
+        # nothing to watch; also releases a connection bound to this event loop
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = set()
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            try:
+                await pubsub.aclose()
+            except (RedisError, OSError):
+                pass
+
+    async def _read_loop(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except (RedisError, OSError) as exc:
+                logger.warning("event subscription lost, resubscribing: %s", exc)
+                await asyncio.sleep(1)
+                await self._resubscribe()
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            post_id = int(message["channel"].split(":")[1])
+            self.dispatch(post_id, message["data"])
+
+    async def _resubscribe(self) -> None:
+        try:
+            await self._pubsub.subscribe(*(event_channel(p) for p in self._subscriptions))
+        except (RedisError, OSError):
+            return
+        # events may have been missed while disconnected
+        for post_id in self._subscriptions:
+            self._deliver(post_id, RESYNC)
+
+    def dispatch(self, post_id: int, raw: str) -> None:
+        event = json.loads(raw)
+        if event["type"] == "like_count":
+            self._pending_likes.setdefault(post_id, {})[event["data"]["id"]] = event["data"]["likes_count"]
+            return
+        self._deliver(post_id, raw)
+
+    async def _flush_likes_loop(self) -> None:
+        while True:
+            await asyncio.sleep(LIKE_COALESCE_SECONDS)
+            self.flush_likes()
+
+    def flush_likes(self) -> None:
+        pending, self._pending_likes = self._pending_likes, {}
+        for post_id, counts in pending.items():
+            batch = [{"id": comment_id, "likes_count": count} for comment_id, count in counts.items()]
+            self._deliver(post_id, json.dumps({"type": "like_counts", "data": batch}))
+
+    def _deliver(self, post_id: int, message: str) -> None:
+        for subscription in self._subscriptions.get(post_id, ()):
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # slow consumer: drop its backlog rather than buffer without bound
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.queue.put_nowait(RESYNC)
+                self.resyncs += 1
+
+
+hub = EventHub()
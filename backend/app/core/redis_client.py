@@ -1,8 +1,63 @@
+import logging
+import time
+import uuid
+from typing import Optional
 import redis.asyncio as redis
 import os 
 from dotenv import load_dotenv
 
 load_dotenv()
 REDIS_URL=os.getenv("REDIS_URL","redis://localhost:6379/0")
+# keep a stalled Redis from stalling requests, callers fall back on errors
+REDIS_SOCKET_TIMEOUT=float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.5))
+# after a Redis failure skip it for a while instead of paying a timeout per request
+REDIS_RETRY_AFTER = float(os.getenv("REDIS_RETRY_AFTER", 5))
 
-redis_client = redis.from_url(REDIS_URL,port=6379, decode_responses=True)
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+redis_client = redis.from_url(
+    REDIS_URL,
+    port=6379,
+    decode_responses=True,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+)
+
+_redis_down_until = 0.0
+
+def redis_available() -> bool:
+    return time.monotonic() >= _redis_down_until
+
+def mark_redis_down(exc: Exception) -> None:
+    global _redis_down_until
+    _redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+    logger.warning("redis unavailable, falling back: %s", exc)
+
+
+# KEYS: lock; ARGV: token[, ttl ms]; extend or release only while we own it
+_EXTEND_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+async def acquire_lock(key: str, ttl: float) -> Optional[str]:
+    """The owner token when the lock was free, None when someone else holds it."""
+    token = uuid.uuid4().hex
+    if await redis_client.set(key, token, nx=True, px=int(ttl * 1000)):
+        return token
+    return None
+
+async def extend_lock(key: str, token: str, ttl: float) -> bool:
+    """Restart the lock's TTL; False when it expired or was taken over meanwhile."""
+    return bool(await redis_client.eval(_EXTEND_LOCK, 1, key, token, int(ttl * 1000)))
+
+async def release_lock(key: str, token: str) -> None:
+    await redis_client.eval(_RELEASE_LOCK, 1, key, token)
@@ -0,0 +1,74 @@
+# app/core/schema_upgrade.py
+"""In-place upgrades for databases created by an older version of the models.
+
+create_all only creates missing tables, so columns and indexes added to
+existing tables since are applied here: init_db runs it on the main
+database and init_shards on every comment shard, at each API start. Every
+step checks first, so it is cheap once applied. Only tables that exist on
+the connection are touched (a shard holds the comment tables alone). On
+Postgres, timestamp columns created WITHOUT TIME ZONE are converted, their
+values taken as UTC, which is what the API has always written.
+
+Filling the new columns for old rows is left to the scripts in
+app.scripts (reconcile_likes, reconcile_post_counters, refresh_hot_scores,
+backfill_comment_paths, rescan_comments), which also run this first.
+"""
+import logging
+from typing import List, Optional, Tuple
+
+from sqlalchemy import DateTime, inspect, text # type:ignore
+from sqlalchemy.engine import Connection # type:ignore
+
+from app.models import Comment, CommentLike, Post, User
+
+logger = logging.getLogger(__name__)
+
+# (model, column, DDL after the name; None: the model's type, nullable)
+COLUMNS: List[Tuple[type, str, Optional[str]]] = [
+    (Comment, "likes_count", "INTEGER NOT NULL DEFAULT 0"),
+    (Comment, "hot_score", "FLOAT NOT NULL DEFAULT 0"),
+    (Comment, "path", None),
+    (Comment, "depth", "INTEGER NOT NULL DEFAULT 0"),
+    (Comment, "flagged", "BOOLEAN NOT NULL DEFAULT FALSE"),
+    (Post, "comments_count", "INTEGER NOT NULL DEFAULT 0"),
+    (Post, "last_activity_at", None),
+    (Post, "deleted_at", None),
+]
+
+def upgrade_schema(conn: Connection) -> List[str]:
+    """Add missing columns and indexes of the models' tables (and fix Postgres timestamps); returns the changes."""
+    inspector = inspect(conn)
+    present = set(inspector.get_table_names())
+    tables = [model.__table__ for model in (Comment, CommentLike, Post, User) if model.__tablename__ in present]
+    columns = {table.name: {c["name"]: c for c in inspector.get_columns(table.name)} for table in tables}
+    quote = conn.dialect.identifier_preparer
+    applied = []
+    for model, name, ddl in COLUMNS:
+        table = model.__table__
+        if table.name in columns and name not in columns[table.name]:
+            ddl = ddl or table.c[name].type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {quote.format_table(table)} ADD COLUMN {name} {ddl}"))
+            applied.append(f"{table.name}.{name}")
+    if conn.dialect.name == "postgresql":
+        for table in tables:
+            for column in table.columns:
+                existing = columns[table.name].get(column.name)
+                if (
+                    isinstance(column.type, DateTime) and column.type.timezone
+                    and existing is not None and not getattr(existing["type"], "timezone", True)
+                ):
+                    name = quote.quote(column.name)
+                    conn.execute(text(
+                        f"ALTER TABLE {quote.format_table(table)} ALTER COLUMN {name}"
+                        f" TYPE TIMESTAMP WITH TIME ZONE USING {name} AT TIME ZONE 'UTC'"
+                    ))
+                    applied.append(f"{table.name}.{column.name} WITH TIME ZONE")
+    for table in tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+                applied.append(index.name)
+    for change in applied:
+        logger.info("schema upgrade: %s", change)
+    return applied
@@ -0,0 +1,186 @@
+# app/core/search.py
+"""Full-text search over comments and posts.
+
+One inverted index table, search_index, holds a document per live comment
+and per post. Its shape depends on the database:
+
+- Postgres: a plain table with a tsvector column and a GIN index on it,
+  ranked with ts_rank_cd.
+- SQLite: an FTS5 virtual table (porter stemming), ranked with bm25.
+
+Both tables are created by SQLModel.metadata.create_all through the DDL
+hooks below, and they are kept in sync by the write handlers in the same
+transaction as the row itself (a deleted post's comment documents are
+removed in batches by app.core.post_purge). Documents are keyed by
+doc_id * 2 + kind, so a document is replaced or removed with a primary key
+lookup. app.scripts.rebuild_search_index fills the index for existing rows.
+"""
+import os
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import DDL, event, text # type:ignore
+from sqlmodel import SQLModel # type:ignore
+from sqlmodel.ext.asyncio.session import AsyncSession # type:ignore
+
+from app.utils.pagination import encode_value_cursor, decode_value_cursor
+
+SEARCH_LANGUAGE = os.getenv("SEARCH_LANGUAGE", "english")
+# Postgres only: matches ranked per query, newest first beyond that are ignored
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", 10_000))
+
+COMMENT = "comment"
+POST = "post"
+_KIND_BITS = {COMMENT: 0, POST: 1}
+
+_POSTGRES_DDL = [
+    """CREATE TABLE IF NOT EXISTS search_index (
+        doc_key BIGINT PRIMARY KEY,
+        kind VARCHAR NOT NULL,
+        doc_id INTEGER NOT NULL,
+        post_id INTEGER NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        body TSVECTOR NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_search_index_body ON search_index USING GIN (body)",
+    "CREATE INDEX IF NOT EXISTS ix_search_index_post ON search_index (post_id)",
+]
+_SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        body, kind UNINDEXED, doc_id UNINDEXED, post_id UNINDEXED, created_at UNINDEXED,
+        tokenize = 'porter unicode61'
+    )""",
+]
+
+def search_ddl(dialect: str) -> List[str]:
+    return _POSTGRES_DDL if dialect == "postgresql" else _SQLITE_DDL
+
+for _dialect_name in ("postgresql", "sqlite"):
+    for _statement in search_ddl(_dialect_name):
+        event.listen(SQLModel.metadata, "after_create", DDL(_statement).execute_if(dialect=_dialect_name))
+
+
+def doc_key(kind: str, doc_id: int) -> int:
+    return doc_id * 2 + _KIND_BITS[kind]
+
+def _dialect(session: AsyncSession) -> str:
+    return session.bind.dialect.name
+
+async def index_document(
+    session: AsyncSession, kind: str, doc_id: int, post_id: int, body: str, created_at: datetime
+) -> None:
+    """Insert or replace a document; the caller commits."""
+    values = {
+        "key": doc_key(kind, doc_id), "kind": kind, "doc_id": doc_id,
+        "post_id": post_id, "body": body, "created_at": created_at,
+    }
+    if _dialect(session) == "postgresql":
+        await session.exec(text(
+            "INSERT INTO search_index (doc_key, kind, doc_id, post_id, created_at, body) "
+            "VALUES (:key, :kind, :doc_id, :post_id, :created_at, to_tsvector(CAST(:language AS regconfig), :body)) "
+            "ON CONFLICT (doc_key) DO UPDATE SET body = EXCLUDED.body"
+        ).bindparams(language=SEARCH_LANGUAGE, **values))
+        return
+    # FTS5 has no upsert
+    await remove_document(session, kind, doc_id)
+    await session.exec(text(
+        "INSERT INTO search_index (rowid, body, kind, doc_id, post_id, created_at) "
+        "VALUES (:key, :body, :kind, :doc_id, :post_id, :created_at)"
+    ).bindparams(**values))
+
+async def remove_document(session: AsyncSession, kind: str, doc_id: int) -> None:
+    key_column = "doc_key" if _dialect(session) == "postgresql" else "rowid"
+    await session.exec(text(
+        f"DELETE FROM search_index WHERE {key_column} = :key"
+    ).bindparams(key=doc_key(kind, doc_id)))
+
+async def remove_post_documents(session: AsyncSession, post_id: int, limit: Optional[int] = None) -> int:
+    """Remove the post's document and its comments' (at most limit of them), returns the number removed."""
+    if limit is None:
+        result = await session.exec(text("DELETE FROM search_index WHERE post_id = :post_id").bindparams(post_id=post_id))
+        return result.rowcount
+    key_column = "doc_key" if _dialect(session) == "postgresql" else "rowid"
+    result = await session.exec(text(
+        f"DELETE FROM search_index WHERE {key_column} IN "
+        f"(SELECT {key_column} FROM search_index WHERE post_id = :post_id LIMIT :limit)"
+    ).bindparams(post_id=post_id, limit=limit))
+    return result.rowcount
+
+
+def _fts5_query(q: str) -> str:
+    # every word must match; quoting keeps FTS5 operators in user input inert
+    return " ".join(f'"{word}"' for word in re.findall(r"\w+", q))
+
+async def search_documents(
+    session: AsyncSession,
+    q: str,
+    post_id: Optional[int] = None,
+    kind: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+) -> Tuple[List[Dict], Optional[str]]:
+    """One page of (kind, doc_id, post_id, score) hits, best first, and the next cursor.
+
+    Pages are keyset over (score, doc_key), which is only as stable as the
+    scores between requests, and they are not: bm25 (SQLite) weighs terms
+    by statistics of the whole index, so any write may shift every score,
+    and on Postgres new matches push the oldest out of the
+    SEARCH_MAX_CANDIDATES window. Hits can therefore be skipped or repeated
+    across pages of a changing index; clients that need an exact listing
+    should not rely on the cursor for it.
+    """
+    filters, params = [], {"limit": limit + 1}
+    if post_id is not None:
+        filters.append("post_id = :post_id")
+        params["post_id"] = post_id
+    if kind is not None:
+        filters.append("kind = :kind")
+        params["kind"] = kind
+    after = ""
+    if cursor:
+        params["after_score"], params["after_key"] = decode_value_cursor(cursor)
+        after = "WHERE score < :after_score OR (score = :after_score AND doc_key < :after_key)"
+
+    if _dialect(session) == "postgresql":
+        params.update(language=SEARCH_LANGUAGE, q=q, candidates=SEARCH_MAX_CANDIDATES)
+        matches = " AND ".join(["body @@ plainto_tsquery(CAST(:language AS regconfig), :q)", *filters])
+        # ts_rank_cd reads each candidate's whole tsvector, so bound how many get ranked
+        sql = f"""
+            SELECT kind, doc_id, post_id, doc_key, score FROM (
+                SELECT kind, doc_id, post_id, doc_key,
+                       CAST(ts_rank_cd(body, plainto_tsquery(CAST(:language AS regconfig), :q)) AS FLOAT) AS score
+                FROM (
+                    SELECT * FROM search_index WHERE {matches}
+                    ORDER BY doc_key DESC LIMIT :candidates
+                ) AS candidates
+            ) AS ranked
+            {after}
+            ORDER BY score DESC, doc_key DESC
+            LIMIT :limit
+        """
+    else:
+        params["q"] = _fts5_query(q)
+        if not params["q"]:
+            return [], None
+        matches = " AND ".join(["search_index MATCH :q", *filters])
+        sql = f"""
+            SELECT kind, doc_id, post_id, doc_key, score FROM (
+                SELECT kind, doc_id, post_id, rowid AS doc_key, -bm25(search_index) AS score
+                FROM search_index WHERE {matches}
+            ) AS ranked
+            {after}
+            ORDER BY score DESC, doc_key DESC
+            LIMIT :limit
+        """
+
+    rows = (await session.exec(text(sql).bindparams(**params))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_value_cursor(rows[-1].score, rows[-1].doc_key)
+    hits = [
+        {"type": row.kind, "id": int(row.doc_id), "post_id": int(row.post_id), "score": float(row.score)}
+        for row in rows
+    ]
+    return hits, next_cursor
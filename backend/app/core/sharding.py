@@ -0,0 +1,238 @@
+# app/core/sharding.py
+"""Horizontal sharding of comments and likes by post_id.
+
+Users, posts, the search index and the two routing tables below stay on
+the main database (DB_URL). The Comment and CommentLike rows of a post
+live together on one of the DB_SHARD_URLS databases, chosen by:
+
+1. the directory, PostShard rows in the main database: explicit
+   placements, e.g. a hot post given a shard of its own, or a thread moved
+   by app.scripts.rebalance_shards;
+2. otherwise a consistent hash ring over the shard names, so adding a
+   shard remaps only about 1/N of the posts (move those first).
+
+Every comment query is scoped to one post or one comment, so a request
+touches a single shard plus the main database. Comment ids are allocated
+from CommentLocator in the main database, which keeps them unique across
+shards and resolves /comments/{comment_id} routes to their post. While a
+thread is being moved its reads still go to the old shard, and writes
+get a 503 until the move completes.
+
+Placements are cached per worker for SHARD_DIRECTORY_TTL seconds; the
+rebalancing tool waits that long between steps. With DB_SHARD_URLS unset
+there is a single shard, "main", and the dependencies below hand out the
+ordinary session.
+"""
+import hashlib
+import os
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from fastapi import Depends, HTTPException, status # type:ignore
+from sqlalchemy import MetaData # type:ignore
+from sqlalchemy.engine import Engine # type:ignore
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine # type:ignore
+from sqlmodel import create_engine # type:ignore
+from sqlmodel.ext.asyncio.session import AsyncSession # type:ignore
+
+from app import db
+from app.core.schema_upgrade import upgrade_schema
+from app.models import Comment, CommentLike, CommentLocator, PostShard
+
+MAIN_SHARD = db.MAIN_SHARD
+# points per shard on the ring; more points, more even spread
+SHARD_VIRTUAL_NODES = int(os.getenv("SHARD_VIRTUAL_NODES", 64))
+SHARD_DIRECTORY_TTL = float(os.getenv("SHARD_DIRECTORY_TTL", 5))
+SHARD_DIRECTORY_CACHE_SIZE = int(os.getenv("SHARD_DIRECTORY_CACHE_SIZE", 100_000))
+
+SHARDED_TABLES = (Comment.__table__, CommentLike.__table__)
+
+
+def _hash(value: str) -> int:
+    # stable across processes and Python versions, unlike hash()
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    def __init__(self, names: Iterable[str], virtual_nodes: int = SHARD_VIRTUAL_NODES):
+        points = sorted((_hash(f"{name}#{i}"), name) for name in names for i in range(virtual_nodes))
+        self._points = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def lookup(self, post_id: int) -> str:
+        # first point clockwise of the key
+        index = bisect_right(self._points, _hash(str(post_id))) % len(self._points)
+        return self._names[index]
+
+
+class Placement(NamedTuple):
+    shard: str
+    moving_to: Optional[str] = None
+
+
+class ShardRouter:
+    def __init__(self, engines: Dict[str, AsyncEngine]):
+        self._placements: "OrderedDict[int, Tuple[float, Placement]]" = OrderedDict()
+        self._comment_posts: "OrderedDict[int, int]" = OrderedDict()
+        self.configure(engines)
+
+    def configure(self, engines: Dict[str, AsyncEngine]) -> None:
+        self.engines = dict(engines)
+        self.ring = HashRing(sorted(self.engines))
+        self._placements.clear()
+        self._comment_posts.clear()
+
+    @property
+    def enabled(self) -> bool:
+        return set(self.engines) != {MAIN_SHARD}
+
+    def ring_shard(self, post_id: int) -> str:
+        return self.ring.lookup(post_id)
+
+    async def placement(self, session: AsyncSession, post_id: int) -> Placement:
+        """Where the post's comments live; session is on the main database."""
+        if not self.enabled:
+            return Placement(MAIN_SHARD)
+        cached = self._placements.get(post_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        row = await session.get(PostShard, post_id)
+        placement = Placement(row.shard, row.moving_to) if row else Placement(self.ring_shard(post_id))
+        self._placements[post_id] = (time.monotonic() + SHARD_DIRECTORY_TTL, placement)
+        self._placements.move_to_end(post_id)
+        while len(self._placements) > SHARD_DIRECTORY_CACHE_SIZE:
+            self._placements.popitem(last=False)
+        return placement
+
+    def forget(self, post_id: int) -> None:
+        self._placements.pop(post_id, None)
+
+    async def comment_post_id(self, session: AsyncSession, comment_id: int) -> Optional[int]:
+        # a comment never changes post, so hits are cached without expiry
+        post_id = self._comment_posts.get(comment_id)
+        if post_id is None:
+            locator = await session.get(CommentLocator, comment_id)
+            if locator is None:
+                return None
+            post_id = self._comment_posts[comment_id] = locator.post_id
+            while len(self._comment_posts) > SHARD_DIRECTORY_CACHE_SIZE:
+                self._comment_posts.popitem(last=False)
+        return post_id
+
+    @asynccontextmanager
+    async def session(self, shard: str, main: Optional[AsyncSession] = None) -> AsyncIterator[AsyncSession]:
+        """A session on the shard; the main session itself when the shard is the main database."""
+        if shard == MAIN_SHARD and main is not None:
+            yield main
+            return
+        async with AsyncSession(self.engines[shard], expire_on_commit=False) as session:
+            session.info["shard"] = shard
+            yield session
+
+
+def _engines_from_env() -> Dict[str, AsyncEngine]:
+    engines = {}
+    for name, url in db.parse_shard_urls(db.DB_SHARD_URLS).items():
+        if name == MAIN_SHARD:
+            engines[name] = db.async_engine
+        else:
+            engines[name] = create_async_engine(db.to_async_url(url), echo=False, **db.pool_options(url))
+    return engines
+
+shard_router = ShardRouter(_engines_from_env())
+
+
+def shard_sync_engines() -> Dict[str, Engine]:
+    """Sync engines per shard, for the maintenance scripts."""
+    return {
+        name: db.engine if name == MAIN_SHARD else create_engine(url, echo=False)
+        for name, url in db.parse_shard_urls(db.DB_SHARD_URLS).items()
+    }
+
+def shard_metadata() -> MetaData:
+    """The sharded tables without their foreign keys into the main database."""
+    metadata = MetaData()
+    local = {table.name for table in SHARDED_TABLES}
+    for table in SHARDED_TABLES:
+        copy = table.to_metadata(metadata)
+        for constraint in list(copy.foreign_key_constraints):
+            if constraint.elements[0].target_fullname.split(".")[0] not in local:
+                copy.constraints.discard(constraint)
+                for fk in constraint.elements:
+                    copy.foreign_keys.discard(fk)
+                    fk.parent.foreign_keys.discard(fk)
+    return metadata
+
+async def init_shards() -> None:
+    """Create the comment tables on every shard other than the main database."""
+    metadata = shard_metadata()
+    for name, engine in shard_router.engines.items():
+        if name != MAIN_SHARD:
+            async with engine.begin() as conn:
+                await conn.run_sync(metadata.create_all)
+                await conn.run_sync(upgrade_schema)
+
+
+async def allocate_comment_id(session: AsyncSession, post_id: int) -> Optional[int]:
+    """A cluster-wide comment id when sharded (None: let the comment table assign it)."""
+    if not shard_router.enabled:
+        return None
+    locator = CommentLocator(post_id=post_id)
+    session.add(locator)
+    await session.flush()
+    return locator.id
+
+async def commit_all(session: AsyncSession, shard: AsyncSession) -> None:
+    # main first: a failed shard commit leaves an orphan locator, never an unreachable comment
+    await session.commit()
+    if shard is not session:
+        await shard.commit()
+
+
+def _reject_moving(placement: Placement) -> None:
+    if placement.moving_to is not None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="thread is being moved, retry shortly",
+            headers={"Retry-After": str(int(SHARD_DIRECTORY_TTL) + 1)},
+        )
+
+async def _comment_placement(session: AsyncSession, comment_id: int) -> Placement:
+    if not shard_router.enabled:
+        return Placement(MAIN_SHARD)
+    post_id = await shard_router.comment_post_id(session, comment_id)
+    if post_id is None:
+        raise HTTPException(status_code=404, detail="comment not found")
+    return await shard_router.placement(session, post_id)
+
+async def get_post_shard_session(post_id: int, session: AsyncSession = Depends(db.get_session)) -> AsyncGenerator[AsyncSession, None]:
+    placement = await shard_router.placement(session, post_id)
+    _reject_moving(placement)
+    async with shard_router.session(placement.shard, session) as shard:
+        yield shard
+
+async def get_post_shard_read_session(post_id: int, session: AsyncSession = Depends(db.get_read_session)) -> AsyncGenerator[AsyncSession, None]:
+    placement = await shard_router.placement(session, post_id)
+    async with shard_router.session(placement.shard, session) as shard:
+        yield shard
+
+async def get_comment_shard_session(comment_id: int, session: AsyncSession = Depends(db.get_session)) -> AsyncGenerator[AsyncSession, None]:
+    placement = await _comment_placement(session, comment_id)
+    _reject_moving(placement)
+    async with shard_router.session(placement.shard, session) as shard:
+        yield shard
+
+async def get_comment_shard_read_session(comment_id: int, session: AsyncSession = Depends(db.get_read_session)) -> AsyncGenerator[AsyncSession, None]:
+    placement = await _comment_placement(session, comment_id)
+    async with shard_router.session(placement.shard, session) as shard:
+        yield shard
+
+async def group_by_shard(session: AsyncSession, post_ids: Iterable[int]) -> Dict[str, List[int]]:
+    """post ids grouped by the shard holding their comments."""
+    groups: Dict[str, List[int]] = {}
+    for post_id in post_ids:
+        groups.setdefault((await shard_router.placement(session, post_id)).shard, []).append(post_id)
+    return groups
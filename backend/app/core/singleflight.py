@@ -0,0 +1,98 @@
+# app/core/singleflight.py
+"""Request coalescing for hot reads.
+
+Concurrent callers asking for the same key share one computation: inside a
+worker they await the same asyncio task, across workers a short Redis lock
+elects one leader and the others poll for the result it publishes. Results
+are strings (rendered JSON) so they can cross process boundaries as-is.
+Without Redis it degrades to per-process coalescing.
+"""
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict
+
+from redis.exceptions import RedisError # type:ignore
+
+from app.core.redis_client import redis_client, redis_available, mark_redis_down, acquire_lock, release_lock
+
+SINGLEFLIGHT_LOCK_MS = int(os.getenv("SINGLEFLIGHT_LOCK_MS", 2000))
+SINGLEFLIGHT_RESULT_MS = int(os.getenv("SINGLEFLIGHT_RESULT_MS", 1000))
+SINGLEFLIGHT_POLL_SECONDS = float(os.getenv("SINGLEFLIGHT_POLL_SECONDS", 0.01))
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # executed: computations run by this worker
+        # coalesced_local / coalesced_remote: requests answered by someone else's run
+        self.executed = 0
+        self.coalesced_local = 0
+        self.coalesced_remote = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "executed": self.executed,
+            "coalesced_local": self.coalesced_local,
+            "coalesced_remote": self.coalesced_remote,
+        }
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[str]]) -> str:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._do_distributed(key, fn))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced_local += 1
+        # shield: a disconnecting caller must not cancel the shared computation
+        return await asyncio.shield(task)
+
+    async def _run(self, fn: Callable[[], Awaitable[str]]) -> str:
+        self.executed += 1
+        return await fn()
+
+    async def _do_distributed(self, key: str, fn: Callable[[], Awaitable[str]]) -> str:
+        if not redis_available():
+            return await self._run(fn)
+        lock_key = f"singleflight:{self.name}:{key}:lock"
+        result_key = f"singleflight:{self.name}:{key}:result"
+        try:
+            token = await acquire_lock(lock_key, SINGLEFLIGHT_LOCK_MS / 1000)
+        except (RedisError, OSError) as exc:
+            mark_redis_down(exc)
+            return await self._run(fn)
+
+        if token is not None:
+            try:
+                result = await self._run(fn)
+                try:
+                    await redis_client.set(result_key, result, px=SINGLEFLIGHT_RESULT_MS)
+                except (RedisError, OSError) as exc:
+                    mark_redis_down(exc)
+                return result
+            finally:
+                try:
+                    await release_lock(lock_key, token)
+                except (RedisError, OSError):
+                    pass  # the lock expires on its own
+
+        # another worker holds the lock, wait for its result until the lock goes away
+        deadline = time.monotonic() + SINGLEFLIGHT_LOCK_MS / 1000
+        try:
+            while time.monotonic() < deadline:
+                await asyncio.sleep(SINGLEFLIGHT_POLL_SECONDS)
+                result, holder = await redis_client.mget(result_key, lock_key)
+                if result is not None:
+                    self.coalesced_remote += 1
+                    return result
+                if holder is None:
+                    break  # leader gave up without publishing
+        except (RedisError, OSError) as exc:
+            mark_redis_down(exc)
+        return await self._run(fn)
+
+
+thread_flight = SingleFlight("thread")
+post_flight = SingleFlight("post")
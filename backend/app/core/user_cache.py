@@ -0,0 +1,79 @@
+# app/core/user_cache.py
+"""Two-tier cache of the authenticated principal.
+
+get_current_user runs on every authenticated request; this keeps the few
+fields handlers need (CurrentUser) in a per-worker LRU backed by Redis so
+a token with a warm cache costs no database round trip. Local entries
+live for USER_CACHE_TTL seconds, which bounds how long another worker can
+serve a principal after invalidate_user.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from pydantic import ValidationError # type:ignore
+from redis.exceptions import RedisError # type:ignore
+
+from app.core.redis_client import redis_client, redis_available, mark_redis_down
+from app.schemas import CurrentUser
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10_000))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 30))
+USER_CACHE_REDIS_TTL = int(os.getenv("USER_CACHE_REDIS_TTL", 300))
+
+_local: "OrderedDict[int, Tuple[float, CurrentUser]]" = OrderedDict()
+
+def _user_key(user_id: int) -> str:
+    return f"user:{user_id}:principal"
+
+def _remember_locally(user: CurrentUser) -> None:
+    _local[user.id] = (time.monotonic() + USER_CACHE_TTL, user)
+    _local.move_to_end(user.id)
+    while len(_local) > USER_CACHE_SIZE:
+        _local.popitem(last=False)
+
+async def get_cached_user(user_id: int) -> Optional[CurrentUser]:
+    entry = _local.get(user_id)
+    if entry is not None:
+        expires, user = entry
+        if expires > time.monotonic():
+            _local.move_to_end(user_id)
+            return user
+        del _local[user_id]
+
+    if not redis_available():
+        return None
+    try:
+        raw = await redis_client.get(_user_key(user_id))
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        return None
+    if raw is None:
+        return None
+    try:
+        user = CurrentUser.model_validate_json(raw)
+    except ValidationError:
+        return None  # written by an older schema, reload from the database
+    _remember_locally(user)
+    return user
+
+async def cache_user(user: CurrentUser) -> None:
+    _remember_locally(user)
+    if not redis_available():
+        return
+    try:
+        await redis_client.set(_user_key(user.id), user.model_dump_json(), ex=USER_CACHE_REDIS_TTL)
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+
+async def invalidate_user(user_id: int) -> None:
+    # call after committing any change to a User row
+    _local.pop(user_id, None)
+    try:
+        await redis_client.delete(_user_key(user_id))
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+
+def clear_local_cache() -> None:
+    _local.clear()
@@ -1,18 +1,84 @@
 # app/db.py
-from sqlmodel import create_engine, SQLModel, Session  # type:ignore
-from typing import Generator
+from sqlmodel import create_engine, SQLModel  # type:ignore
+from sqlmodel.ext.asyncio.session import AsyncSession # type:ignore
+from sqlalchemy.engine import make_url, URL # type:ignore
+from sqlalchemy.ext.asyncio import create_async_engine # type:ignore
+from fastapi import Request # type:ignore
+from typing import AsyncGenerator, Dict
 from dotenv import load_dotenv
+from app.core.schema_upgrade import upgrade_schema
 import os
 load_dotenv()
 # DATABASE_URL = "sqlite:///./app.db"
 DATABASE_URL = os.getenv("DB_URL")
 
+# async drivers for the URL schemes we accept in DB_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: str) -> URL:
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername))
+
+# optional read replica; read-only endpoints use it through get_read_session
+REPLICA_DATABASE_URL = os.getenv("DB_REPLICA_URL")
+
+# optional comment shards (app.core.sharding): "name=url,name=url";
+# a bare "main" entry stands for DB_URL itself
+DB_SHARD_URLS = os.getenv("DB_SHARD_URLS", "")
+MAIN_SHARD = "main"
+
+def parse_shard_urls(value: str) -> Dict[str, str]:
+    shards = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        name, _, url = entry.partition("=")
+        shards[name.strip()] = url.strip() or DATABASE_URL
+    return shards or {MAIN_SHARD: DATABASE_URL}
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+
+def pool_options(url: str) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    if not make_url(url).drivername.startswith("sqlite"):
+        # SQLite gets a single-connection or null pool that takes no sizing
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+# sync engine is kept for maintenance scripts (app/scripts), the API only uses async_engine
 engine = create_engine(DATABASE_URL, echo=False)
+async_engine = create_async_engine(to_async_url(DATABASE_URL), echo=False, **pool_options(DATABASE_URL))
+replica_engine = (
+    create_async_engine(to_async_url(REPLICA_DATABASE_URL), echo=False, **pool_options(REPLICA_DATABASE_URL))
+    if REPLICA_DATABASE_URL else async_engine
+)
+
+def replica_enabled() -> bool:
+    return replica_engine is not async_engine
 
-def init_db() -> None:
-    SQLModel.metadata.create_all(engine)
+async def init_db() -> None:
+    async with async_engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        # tables from older versions get the columns and indexes added since
+        await conn.run_sync(upgrade_schema)
     
-def get_session()-> Generator[Session, None, None]:
-    with Session(engine) as session:
+async def get_session()-> AsyncGenerator[AsyncSession, None]:
+    # expire_on_commit=False: handlers read attributes after commit without lazy IO
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    # replica unless the caller wrote within the read-your-writes window
+    # (request.state.read_primary is set by app.core.read_routing)
+    use_replica = replica_enabled() and not getattr(request.state, "read_primary", False)
+    async with AsyncSession(replica_engine if use_replica else async_engine, expire_on_commit=False) as session:
+        session.info["replica"] = use_replica
         yield session
-        
\ No newline at end of file
@@ -1,7 +1,123 @@
 # app/libs/limiter.py
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+"""Token-bucket rate limiting shared by all workers through Redis.
 
-# Use in-memory (default) limiter for dev.
-# In production configure Redis backend by passing storage uri to Limiter(...)
-limiter = Limiter(key_func=get_remote_address)
+Limits use the "N/period" syntax ("500/minute"). Each check is one EVALSHA
+that refills and debits every bucket involved (per user and/or per remote
+address) atomically, using the Redis server clock so workers never
+disagree on time. If Redis is unavailable requests are let through.
+"""
+import math
+import os
+from typing import List, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, Response, status # type:ignore
+from redis.exceptions import RedisError # type:ignore
+
+from app.auth import get_current_user
+from app.core.redis_client import redis_client, redis_available, mark_redis_down
+
+# trust the left-most X-Forwarded-For hop (only behind a proxy that sets it)
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "False").lower() == "true"
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# KEYS: bucket keys; ARGV: capacity, refill-per-ms pairs in the same order.
+# Returns {allowed, min remaining tokens, ms until the blocking bucket has a token}.
+_TOKEN_BUCKET = """
+local now_parts = redis.call('TIME')
+local now = now_parts[1] * 1000 + math.floor(now_parts[2] / 1000)
+local tokens = {}
+local allowed = 1
+local remaining = -1
+local retry_ms = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local level = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    level = math.min(capacity, level + math.max(0, now - ts) * rate)
+    tokens[i] = level
+    if level < 1 then
+        allowed = 0
+        retry_ms = math.max(retry_ms, math.ceil((1 - level) / rate))
+    end
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local level = tokens[i]
+    if allowed == 1 then
+        level = level - 1
+    end
+    redis.call('HSET', key, 'tokens', tostring(level), 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate))
+    if remaining < 0 or level < remaining then
+        remaining = level
+    end
+end
+return {allowed, math.floor(remaining), retry_ms}
+"""
+
+_token_bucket = redis_client.register_script(_TOKEN_BUCKET)
+
+
+def parse_limit(limit: str) -> Tuple[int, float]:
+    """'500/minute' -> (capacity 500, refill tokens per millisecond)."""
+    count, _, period = limit.partition("/")
+    seconds = _PERIODS[period.strip().rstrip("s")]
+    capacity = int(count)
+    return capacity, capacity / (seconds * 1000)
+
+def get_remote_address(request: Request) -> str:
+    if TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+async def hit(scope: str, buckets: List[Tuple[str, str]], response: Response) -> None:
+    """Debit one token from every (key, limit) bucket or raise 429."""
+    if not redis_available():
+        return
+    keys, args = [], []
+    for key, limit in buckets:
+        capacity, rate = parse_limit(limit)
+        keys.append(f"ratelimit:{scope}:{key}")
+        args += [capacity, rate]
+    try:
+        allowed, remaining, retry_ms = await _token_bucket(keys=keys, args=args)
+    except (RedisError, OSError) as exc:
+        mark_redis_down(exc)
+        return
+
+    tightest = min(parse_limit(limit)[0] for _, limit in buckets)
+    headers = {"X-RateLimit-Limit": str(tightest), "X-RateLimit-Remaining": str(max(int(remaining), 0))}
+    if not int(allowed):
+        headers["Retry-After"] = str(max(1, math.ceil(int(retry_ms) / 1000)))
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="rate limit exceeded", headers=headers)
+    response.headers.update(headers)
+
+def rate_limit(scope: str, per_user: Optional[str] = None, per_ip: Optional[str] = None):
+    """Route dependency enforcing per-user and/or per-address limits for `scope`."""
+    if per_user:
+        async def limit_user_and_ip(request: Request, response: Response, current_user = Depends(get_current_user)):
+            buckets = [(f"user:{current_user.id}", per_user)]
+            if per_ip:
+                buckets.append((f"ip:{get_remote_address(request)}", per_ip))
+            await hit(scope, buckets, response)
+        return limit_user_and_ip
+
+    async def limit_ip(request: Request, response: Response):
+        await hit(scope, [(f"ip:{get_remote_address(request)}", per_ip)], response)
+    return limit_ip
+
+
+# DoS protection for the write hot paths
+POST_RATE_LIMIT_USER = os.getenv("POST_RATE_LIMIT_USER", "200/minute")
+POST_RATE_LIMIT_IP = os.getenv("POST_RATE_LIMIT_IP", "1000/minute")
+LIKE_RATE_LIMIT_USER = os.getenv("LIKE_RATE_LIMIT_USER", "500/minute")
+LIKE_RATE_LIMIT_IP = os.getenv("LIKE_RATE_LIMIT_IP", "2000/minute")
+
+limit_create_post = rate_limit("create_post", per_user=POST_RATE_LIMIT_USER, per_ip=POST_RATE_LIMIT_IP)
+limit_toggle_like = rate_limit("toggle_like", per_user=LIKE_RATE_LIMIT_USER, per_ip=LIKE_RATE_LIMIT_IP)
@@ -1,40 +1,73 @@
 # app/main.py
+import logging
 from fastapi import FastAPI # type:ignore
+from fastapi.responses import Response # type:ignore
 from fastapi.middleware.cors import CORSMiddleware # type:ignore
 from app.core.redis_client import redis_client
+from app.core.singleflight import thread_flight, post_flight
+from app.core.read_routing import read_routing_middleware
+from app.core.passwords import shutdown_password_pool
+from app.core.like_buffer import start_like_flusher, stop_like_flusher
+from app.core.post_purge import start_post_purger, stop_post_purger
+from app.core.sharding import init_shards
+from app.core.metrics import MetricsMiddleware, instrument_redis, registry, CONTENT_TYPE
 from .db import init_db
-from .routers import auth_router, posts_router, comments_router, likes_router
+from .routers import auth_router, posts_router, comments_router, likes_router, events_router, search_router
 import uvicorn
 from contextlib import asynccontextmanager
 
+logger = logging.getLogger(__name__)
+
+# per-command latency for every module sharing the client
+instrument_redis(redis_client)
+
 # defining lifespan event handler
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # on startup
-    init_db()
+    await init_db()
+    await init_shards()
     try:
         pong = await redis_client.ping()
         if pong:
-            print("Connected to Redis")
+            logger.info("Connected to Redis")
     except Exception as e:
-        print(f" Redis connection failed: {e}")
+        logger.warning("Redis connection failed: %s", e)
+    await start_like_flusher()
+    await start_post_purger()
         
     yield
     
     # on shutdown
+    await stop_post_purger()
+    await stop_like_flusher()
+    shutdown_password_pool()
     try:
         await redis_client.close()
-        print(" Redis connection closed")
+        logger.info("Redis connection closed")
     except Exception as e:
-        print(f"Failed to close Redis: {e}")
+        logger.warning("Failed to close Redis: %s", e)
         
 app = FastAPI(title="Comment System API",lifespan=lifespan)
 
+# routes read-your-writes traffic to the primary when a replica is configured
+app.middleware("http")(read_routing_middleware)
+
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Comment System API"}
 
+@app.get("/stats/coalescing")
+def coalescing_stats():
+    # thundering-herd savings of the single-flight layer, per worker
+    return {flight.name: flight.stats() for flight in (thread_flight, post_flight)}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # async: the threadpool collector must run on the event loop
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
 origins = [
     "http://localhost",
     "http://localhost:3000",
@@ -48,6 +81,8 @@ app.add_middleware(
     allow_methods=["*"], # Allows all HTTP methods (GET, POST, PUT, DELETE, OPTIONS, etc.)
     allow_headers=["*"], # Allows all headers
 )
+# outermost, so the timings include every other middleware
+app.add_middleware(MetricsMiddleware)
 
 
 # include routers
@@ -55,6 +90,8 @@ app.include_router(auth_router.router)
 app.include_router(posts_router.router)
 app.include_router(comments_router.router)
 app.include_router(likes_router.router)
+app.include_router(events_router.router)
+app.include_router(search_router.router)
 
     
 if __name__ == "__main__":
@@ -2,41 +2,85 @@
 from sqlmodel import SQLModel, Field # type:ignore
 from typing import Optional
 from datetime import datetime, timezone
-from sqlalchemy import Column, String, Boolean, UniqueConstraint # type:ignore
+from sqlalchemy import Column, DateTime, String, Boolean, UniqueConstraint, Index # type:ignore
 
 def get_current_utc_time():
     return datetime.now(timezone.utc)
 
+# timestamps are aware UTC values: TIMESTAMP WITH TIME ZONE on Postgres, where
+# asyncpg refuses aware values for a plain TIMESTAMP (SQLite stores them naive)
+UtcDateTime = DateTime(timezone=True)
+
 class User(SQLModel, table=True):
     id: Optional[int]= Field(default=None, primary_key=True)
     username: str = Field(sa_column=Column("username", String, nullable=False, unique=True)) 
     email: str = Field(sa_column=Column("email", String, nullable=False, unique=True))
     password_hash: str
     is_verified:bool
-    created_at: datetime=Field(default_factory=get_current_utc_time)
+    created_at: datetime=Field(default_factory=get_current_utc_time, sa_type=UtcDateTime)
     
 class Post(SQLModel, table=True):
+    __table_args__ = (
+        # keyset pagination of the feed on (created_at, id)
+        Index("ix_post_created_id", "created_at", "id"),
+    )
     id: Optional[int]= Field(default=None, primary_key=True)
     author_id: int = Field(foreign_key="user.id", nullable=False, index=True)
     title: str
     content: str
-    created_at: datetime = Field(default_factory=get_current_utc_time)
+    # denormalized, kept in step by create_comment / delete_comment
+    comments_count: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
+    last_activity_at: datetime = Field(default_factory=get_current_utc_time, sa_type=UtcDateTime)
+    created_at: datetime = Field(default_factory=get_current_utc_time, sa_type=UtcDateTime)
+    # tombstone set by delete_post; app.core.post_purge removes the post and its rows later
+    deleted_at: Optional[datetime] = Field(default=None, index=True, sa_type=UtcDateTime)
     
 class Comment(SQLModel, table=True):
+    __table_args__ = (
+        # keyset pagination of roots / replies on (created_at, id)
+        Index("ix_comment_post_parent_created", "post_id", "parent_id", "created_at", "id"),
+        Index("ix_comment_parent_created", "parent_id", "created_at", "id"),
+        # subtree / descendant range scans on the materialized path
+        Index("ix_comment_post_path", "post_id", "path"),
+        # top-N roots for sort=top / sort=hot without sorting the thread
+        Index("ix_comment_post_parent_likes", "post_id", "parent_id", "likes_count", "id"),
+        Index("ix_comment_post_parent_hot", "post_id", "parent_id", "hot_score", "id"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     post_id: int = Field(foreign_key="post.id", nullable=False, index=True)
     user_id: int = Field(foreign_key="user.id", nullable=False, index=True)
     parent_id: Optional[int] = Field(default=None, foreign_key="comment.id", index=True)
     content: str
     deleted: bool= Field(default=False)
-    created_at: datetime = Field(default_factory=get_current_utc_time)
+    # denormalized COUNT of CommentLike rows, kept in step by toggle_like
+    likes_count: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
+    # app.utils.ranking.hot_score of likes_count and created_at, rewritten on every like change
+    hot_score: float = Field(default=0.0, nullable=False, sa_column_kwargs={"server_default": "0"})
+    # materialized ancestor path (see app.utils.comment_path), set by create_comment
+    # byte-order collation on Postgres, locale collations may ignore the "/" separators
+    path: Optional[str] = Field(default=None, sa_type=String().with_variant(String(collation="C"), "postgresql"))
+    depth: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
+    # matched a flag term of the moderation list (app.core.moderation), awaiting review
+    flagged: bool = Field(default=False, nullable=False, sa_column_kwargs={"server_default": "0"})
+    created_at: datetime = Field(default_factory=get_current_utc_time, sa_type=UtcDateTime)
     
 class CommentLike(SQLModel, table=True):
     __table_args__ = (UniqueConstraint("comment_id","user_id",name='uq_comment_user'),)
     id: Optional[int] = Field(default=None, primary_key=True)
     comment_id: int = Field(foreign_key="comment.id", nullable=False, index=True)
     user_id: int = Field(foreign_key="user.id", nullable=False, index=True)
-    created_at: datetime = Field(default_factory=get_current_utc_time)
-    
-    
-    
\ No newline at end of file
+    created_at: datetime = Field(default_factory=get_current_utc_time, sa_type=UtcDateTime)
+
+class PostShard(SQLModel, table=True):
+    # shard directory (app.core.sharding): explicit placement of a post's
+    # comments, overriding the hash ring; main database only
+    post_id: int = Field(foreign_key="post.id", primary_key=True)
+    shard: str
+    # set while app.scripts.rebalance_shards copies the thread, writes wait
+    moving_to: Optional[str] = None
+
+class CommentLocator(SQLModel, table=True):
+    # comment id -> post id when comments are sharded; also allocates the
+    # comment ids, so they stay unique across shards; main database only
+    id: Optional[int] = Field(default=None, primary_key=True)
+    post_id: int = Field(foreign_key="post.id", nullable=False, index=True)
@@ -1,12 +1,14 @@
 # app/routers/auth_router.py
 from fastapi import APIRouter, Depends, HTTPException, status # type:ignore
-from sqlmodel import Session, select # type:ignore
+from sqlmodel import select # type:ignore
+from sqlmodel.ext.asyncio.session import AsyncSession # type:ignore
 from datetime import datetime, timedelta
 from ..schemas import UserCreate, UserRead, Token, UserLogin, MessageResponse
 from ..models import User
 from ..db import get_session
-from ..auth import get_password_hash, verify_password, create_access_token
-from ..utils.email_utils import generate_otp, send_otp_mail
+from ..auth import create_access_token
+from ..core.passwords import get_password_hash, verify_and_update_password, run_in_password_pool
+from ..utils.email_utils import generate_otp, enqueue_otp_mail
 from pydantic import BaseModel
 import json
 from app.core.redis_client import redis_client
@@ -18,7 +20,7 @@ class VerifyEmailRequest(BaseModel):
     otp:str
     
 @router.post("/verify-email")
-async def verify_email(data:VerifyEmailRequest,session:Session=Depends(get_session)):
+async def verify_email(data:VerifyEmailRequest,session:AsyncSession=Depends(get_session)):
     #retrieve data from redis
     temp_data = await redis_client.get(f"user_otp:{data.email}")
     
@@ -39,8 +41,8 @@ async def verify_email(data:VerifyEmailRequest,session:Session=Depends(get_sessi
     )
     
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
     
     # Delete temporary Redis data
     await redis_client.delete(f"user_otp:{data.email}")
@@ -49,16 +51,17 @@ async def verify_email(data:VerifyEmailRequest,session:Session=Depends(get_sessi
     
 
 @router.post("/register",response_model=MessageResponse)
-async def register(data: UserCreate, session: Session = Depends(get_session)):
+async def register(data: UserCreate, session: AsyncSession = Depends(get_session)):
     # basic uniqueness check
-    exists = session.exec(select(User).where((User.username == data.username) | (User.email == data.email))).first()
+    exists = (await session.exec(select(User).where((User.username == data.username) | (User.email == data.email)))).first()
     
     if exists:
         raise HTTPException(status_code=400, detail="username or email already exists")
     
     otp = generate_otp()
     expires_in = 600 # 10 minutes
-    hashed_pw = get_password_hash(data.password)
+    # bcrypt is CPU bound, keep it off the event loop
+    hashed_pw = await run_in_password_pool(get_password_hash, data.password)
     user_data = {
         "username":data.username,
         "email":data.email,
@@ -68,20 +71,25 @@ async def register(data: UserCreate, session: Session = Depends(get_session)):
     #store user data temporarily in Redis
     await redis_client.setex(f"user_otp:{data.email}",expires_in,json.dumps(user_data))
     
-    # send otp via email
-    await send_otp_mail(data.email, otp)
-    
-    # Send email
-    send_otp_mail(data.email, otp)
+    # queue the otp email, app/workers/email_worker.py delivers it
+    await enqueue_otp_mail(data.email, otp)
 
     return {"message":"OTP sent to your email please verify within 10 minutes"}
 
 @router.post("/login",response_model=Token)
-def login(form: UserLogin, session: Session = Depends(get_session)):
+async def login(form: UserLogin, session: AsyncSession = Depends(get_session)):
     # Accept username or email in 'username' field for simplicity
-    user = session.exec(select(User).where((User.username == form.username) | (User.email == form.username))).first()
+    user = (await session.exec(select(User).where((User.username == form.username) | (User.email == form.username)))).first()
     
-    if not user or not verify_password(form.password, user.password_hash):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    valid, new_hash = await run_in_password_pool(verify_and_update_password, form.password, user.password_hash)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        # stored hash used outdated settings, upgrade it while we have the plaintext
+        user.password_hash = new_hash
+        session.add(user)
+        await session.commit()
     token = create_access_token(subject=str(user.id))
     return {"access_token": token,'token_type':"bearer"}
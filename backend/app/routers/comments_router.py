@@ -1,143 +1,554 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
-from sqlmodel import Session, select
-from typing import List, Dict
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import AsyncIterator, List, Dict, Literal, Optional
 from datetime import datetime
+import json
+import os
 
-from ..db import get_session
-from ..models import Comment, Post, CommentLike, User
-from ..schemas import CommentCreate, CommentOut, CommentUpdate
-from ..auth import get_current_user
-from ..libs.limiter import limiter
-from sqlalchemy import func
+from ..db import get_session, get_read_session
+from ..models import Comment, Post, User
+from ..schemas import CommentCreate, CommentOut, CommentUpdate, CommentPage, CommentContext
+from ..auth import get_current_user, get_optional_user
+from ..utils.pagination import encode_cursor, decode_cursor, encode_value_cursor, decode_value_cursor
+from ..utils.ranking import hot_score
+from ..utils.http_cache import make_etag, etag_matches, not_modified
+from ..utils import fast_json
+from ..utils.fast_json import ThreadNode
+from ..utils.comment_path import child_path, path_depth, path_ids, readable_path, subtree_range, descendants_range
+from ..core.cache import (
+    get_thread_version, get_cached_thread, store_thread, bump_thread_version, THREAD_CACHE_TTL, REPLICA_THREAD_CACHE_TTL,
+)
+from ..core.singleflight import thread_flight
+from ..core.realtime import publish_event
+from ..core.search import index_document, remove_document, COMMENT
+from ..core.like_buffer import liked_comment_ids
+from ..core.moderation import moderate_comment
+from ..core.post_purge import get_live_post
+from ..core.sharding import (
+    get_post_shard_session, get_post_shard_read_session, get_comment_shard_session, get_comment_shard_read_session,
+    allocate_comment_id, commit_all,
+)
+from sqlalchemy import func, tuple_, update
 
 router = APIRouter(tags=["comments"])
 
+# rows fetched per round trip by the NDJSON export
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 500))
+# bound on ids per IN list (SQLite caps bound parameters)
+USERNAME_LOOKUP_CHUNK = int(os.getenv("USERNAME_LOOKUP_CHUNK", 1000))
+
 # New utility function to format a comment for the response
-def format_comment_response(comment: Comment, username: str, session: Session) -> CommentOut:
-    likes_count = session.exec(
-        select(func.count(CommentLike.id)).where(CommentLike.comment_id == comment.id)
-    ).one()
-    
+def format_comment_response(comment: Comment, username: str) -> CommentOut:
     return CommentOut(
         id=comment.id,
         user_id=comment.user_id,
         username=username,
         parent_id=comment.parent_id,
         content=comment.content,
-        likes_count=likes_count or 0,
+        likes_count=comment.likes_count,
         deleted=comment.deleted,
         created_at=comment.created_at,
         children=[]
     )
 
+def _thread_node(comment: Comment, username: Optional[str] = None) -> dict:
+    return {
+        "id": comment.id,
+        "user_id": comment.user_id,
+        "username": username,
+        "parent_id": comment.parent_id,
+        "content": "[deleted]" if comment.deleted else comment.content,
+        "likes_count": comment.likes_count,
+        "deleted": comment.deleted,
+        "created_at": comment.created_at,
+        "children": [],
+        "has_more_children": False,
+        "reply_cursor": None,
+        "liked_by_me": None,
+    }
+
+def _walk(nodes: List[dict]):
+    for node in nodes:
+        yield node
+        yield from _walk(node["children"])
+
+async def _usernames(session: AsyncSession, user_ids) -> Dict[int, str]:
+    # users stay on the main database when comments are sharded, so no join
+    ids = list(user_ids)
+    names: Dict[int, str] = {}
+    for start in range(0, len(ids), USERNAME_LOOKUP_CHUNK):
+        names.update((await session.exec(
+            select(User.id, User.username).where(User.id.in_(ids[start:start + USERNAME_LOOKUP_CHUNK]))
+        )).all())
+    return names
+
+async def _fill_usernames(session: AsyncSession, nodes: List[dict]) -> None:
+    all_nodes = list(_walk(nodes))
+    names = await _usernames(session, {n["user_id"] for n in all_nodes})
+    for node in all_nodes:
+        node["username"] = names[node["user_id"]]
+
+async def _mark_liked_by_me(session: AsyncSession, user_id: int, nodes: List[dict]) -> None:
+    # one batched lookup for the whole tree
+    all_nodes = list(_walk(nodes))
+    liked = await liked_comment_ids(session, user_id, [n["id"] for n in all_nodes])
+    for node in all_nodes:
+        node["liked_by_me"] = node["id"] in liked
+
+CommentSort = Literal["new", "top", "hot"]
+
+def _sort_columns(sort: CommentSort):
+    # new: oldest first (conversation order); top / hot: best first
+    if sort == "top":
+        return Comment.likes_count, True
+    if sort == "hot":
+        return Comment.hot_score, True
+    return Comment.created_at, False
+
+def _sort_cursor(sort: CommentSort, comment: Comment) -> str:
+    if sort == "new":
+        return encode_cursor(comment.created_at, comment.id)
+    return encode_value_cursor(getattr(comment, _sort_columns(sort)[0].key), comment.id)
+
+def _after_cursor(sort: CommentSort, cursor: str):
+    column, descending = _sort_columns(sort)
+    value, comment_id = decode_cursor(cursor) if sort == "new" else decode_value_cursor(cursor)
+    if descending:
+        return tuple_(column, Comment.id) < tuple_(value, comment_id)
+    return tuple_(column, Comment.id) > tuple_(value, comment_id)
+
+def _order_by(sort: CommentSort):
+    column, descending = _sort_columns(sort)
+    return (column.desc(), Comment.id.desc()) if descending else (column, Comment.id)
+
+async def _comment_page(session: AsyncSession, condition, cursor: Optional[str], limit: int, sort: CommentSort = "new") -> dict:
+    """One keyset page of comments matching `condition`, in `sort` order with id as tie-breaker."""
+    stmt = select(Comment).where(condition)
+    if cursor:
+        stmt = stmt.where(_after_cursor(sort, cursor))
+    rows = (await session.exec(stmt.order_by(*_order_by(sort)).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _sort_cursor(sort, rows[-1])
+
+    items = [_thread_node(c) for c in rows]
+    return {"items": items, "next_cursor": next_cursor}
+
+async def _attach_replies(session: AsyncSession, nodes: List[dict], depth: int, replies_limit: int, sort: CommentSort = "new") -> None:
+    """Attach up to `depth` levels of replies beneath `nodes`, one query per level.
+
+    Each parent gets at most `replies_limit` children; parents cut off by either
+    limit are flagged with has_more_children so the client can page the rest
+    through GET /comments/{id}/replies.
+    """
+    frontier = {n["id"]: n for n in nodes}
+    for _ in range(depth):
+        if not frontier:
+            return
+        ranked = (
+            select(
+                Comment.id.label("id"),
+                func.row_number().over(
+                    partition_by=Comment.parent_id,
+                    order_by=_order_by(sort),
+                ).label("rn"),
+            )
+            .where(Comment.parent_id.in_(list(frontier)))
+            .subquery()
+        )
+        rows = (await session.exec(
+            select(Comment)
+            .join(ranked, ranked.c.id == Comment.id)
+            .where(ranked.c.rn <= replies_limit + 1)
+            .order_by(Comment.parent_id, ranked.c.rn)
+        )).all()
+
+        next_frontier: Dict[int, dict] = {}
+        last_shown: Dict[int, Comment] = {}
+        for comment_obj in rows:
+            parent = frontier[comment_obj.parent_id]
+            if len(parent["children"]) == replies_limit:
+                # the (replies_limit + 1)th row only tells us there is more
+                parent["has_more_children"] = True
+                parent["reply_cursor"] = _sort_cursor(sort, last_shown[parent["id"]])
+                continue
+            node = _thread_node(comment_obj)
+            parent["children"].append(node)
+            last_shown[parent["id"]] = comment_obj
+            next_frontier[comment_obj.id] = node
+        frontier = next_frontier
+
+    # nodes on the last level are cut off by depth, flag those that have replies
+    if frontier:
+        with_replies = (await session.exec(
+            select(Comment.parent_id).where(Comment.parent_id.in_(list(frontier))).distinct()
+        )).all()
+        for parent_id in with_replies:
+            frontier[parent_id]["has_more_children"] = True
+
 @router.post('/posts/{post_id}/comments', response_model=CommentOut)
-def create_comment(request: Request, post_id: int, payload: CommentCreate, session: Session = Depends(get_session), current_user = Depends(get_current_user)):
-    post = session.get(Post, post_id)
+async def create_comment(
+    request: Request,
+    post_id: int,
+    payload: CommentCreate,
+    session: AsyncSession = Depends(get_session),
+    shard: AsyncSession = Depends(get_post_shard_session),
+    current_user = Depends(get_current_user),
+):
+    # session: main database (post, search index); shard: the post's comments,
+    # the very same session unless comments are sharded (app.core.sharding)
+    post = await get_live_post(session, post_id)
     if not post:
         raise HTTPException(status_code=404, detail="post not found")
+    parent = None
     if payload.parent_id:
-        parent = session.get(Comment, payload.parent_id)
+        parent = await shard.get(Comment, payload.parent_id)
         if not parent or parent.post_id != post_id:
             raise HTTPException(status_code=400, detail="invalid parent_id")
+    content, flagged = await moderate_comment(payload.content)
 
     comment = Comment(
+        id=await allocate_comment_id(session, post_id),
         post_id=post_id,
         user_id=current_user.id,
         parent_id=payload.parent_id,
-        content=payload.content
+        content=content,
+        flagged=flagged,
     )
-    session.add(comment)
-    session.commit()
-    session.refresh(comment)
+    shard.add(comment)
+    await shard.flush()
+    # the path ends with the comment's own id; a parent still awaiting the
+    # backfill script leaves it unset, the script fills in both
+    if parent is None or parent.path is not None:
+        comment.path = child_path(parent.path if parent else None, comment.id)
+        comment.depth = path_depth(comment.path)
+    comment.hot_score = hot_score(0, comment.created_at)
+    await index_document(session, COMMENT, comment.id, post_id, comment.content, comment.created_at)
+    await session.exec(
+        update(Post)
+        .where(Post.id == post_id)
+        .values(comments_count=Post.comments_count + 1, last_activity_at=comment.created_at)
+    )
+    await commit_all(session, shard)
+    await shard.refresh(comment)
+    await bump_thread_version(post_id)
 
-    return format_comment_response(comment, current_user.username, session)
+    response = format_comment_response(comment, current_user.username)
+    await publish_event(post_id, "new_comment", response.model_dump(mode="json"))
+    return response
 
-@router.get('/posts/{post_id}/comments', response_model=List[CommentOut])
-def get_comments(post_id: int, session: Session = Depends(get_session)):
-    # fetch all comments for this post
-    rows = session.exec(
-        select(Comment, User.username)
-        .join(User, User.id == Comment.user_id)
+async def _build_comment_tree(session: AsyncSession, shard: AsyncSession, post_id: int) -> List[ThreadNode]:
+    # fetch all comments for this post; plain columns, no ORM entities to build
+    rows = (await shard.exec(
+        select(
+            Comment.id, Comment.user_id, Comment.parent_id, Comment.content,
+            Comment.likes_count, Comment.deleted, Comment.created_at,
+        )
         .where(Comment.post_id == post_id)
-        .order_by(Comment.created_at)
-    ).all()
+        .order_by(Comment.created_at, Comment.id)
+    )).all()
     if not rows:
         return []
+    names = await _usernames(session, {row.user_id for row in rows})
+
+    id_map: Dict[int, ThreadNode] = {}
+    for comment_id, user_id, parent_id, content, likes_count, deleted, created_at in rows:
+        id_map[comment_id] = ThreadNode(
+            comment_id, user_id, names[user_id], parent_id,
+            "[deleted]" if deleted else content, likes_count, deleted, created_at,
+        )
 
-    id_map: Dict[int, dict] = {}
-    all_ids = [r.Comment.id for r in rows]
-    
-    likes_rows = session.exec(
-        select(CommentLike.comment_id, func.count(CommentLike.id))
-        .where(CommentLike.comment_id.in_(all_ids))
-        .group_by(CommentLike.comment_id)
-    ).all()
-    likes_map = {r[0]: int(r[1]) for r in likes_rows}
-
-    for r in rows:
-        comment_obj, username = r
-        id_map[comment_obj.id] = {
-            "id": comment_obj.id,
-            "user_id": comment_obj.user_id,
-            "username": username,
-            "parent_id": comment_obj.parent_id,
-            "content": "[deleted]" if comment_obj.deleted else comment_obj.content,
-            "likes_count": likes_map.get(comment_obj.id, 0),
-            "deleted": comment_obj.deleted,
-            "created_at": comment_obj.created_at,
-            "children": []
-        }
-    
     roots = []
-    for r in rows:
-        comment_obj, _ = r
-        node = id_map[comment_obj.id]
-        if comment_obj.parent_id is None:
+    for node in id_map.values():
+        if node.parent_id is None:
             roots.append(node)
         else:
-            parent = id_map.get(comment_obj.parent_id)
+            parent = id_map.get(node.parent_id)
             if parent:
-                parent["children"].append(node)
+                parent.children.append(node)
             else:
                 # parent missing (shouldn't happen) -> treat as root
                 roots.append(node)
 
     return roots
 
+async def _personalize(session: AsyncSession, viewer, payload: str, etag: Optional[str]) -> Response:
+    # the shared payload stays viewer-neutral, liked_by_me is layered on per request
+    headers = {"ETag": etag, "Vary": "Authorization"} if etag else {"Vary": "Authorization"}
+    if viewer is None:
+        return Response(content=payload, media_type="application/json", headers=headers)
+    roots = fast_json.loads(payload)
+    await _mark_liked_by_me(session, viewer.id, roots)
+    return Response(content=fast_json.dumps(roots), media_type="application/json", headers=headers)
+
+def _thread_etag(post_id: int, version: Optional[str], viewer) -> Optional[str]:
+    if version is None:
+        return None
+    # liked_by_me differs per viewer; every like bumps the version
+    return make_etag("t", post_id, version, f"u{viewer.id}" if viewer else "anon")
+
+@router.get('/posts/{post_id}/comments', response_model=List[CommentOut])
+async def get_comments(
+    request: Request,
+    post_id: int,
+    session: AsyncSession = Depends(get_read_session),
+    shard: AsyncSession = Depends(get_post_shard_read_session),
+    viewer = Depends(get_optional_user),
+):
+    replica = bool(session.info.get("replica"))
+    version = await get_thread_version(post_id)
+    etag = _thread_etag(post_id, version, viewer)
+    # unchanged since the client's copy: one Redis GET, no queries, no serialization
+    if etag_matches(request, etag):
+        return not_modified(etag, {"Vary": "Authorization"})
+
+    cached, from_primary = await get_cached_thread(post_id, version, replica)
+    if cached is not None:
+        return await _personalize(shard, viewer, cached, etag if from_primary else None)
+
+    async def render() -> str:
+        # a deleted post's comments linger until the purge reaches them, never show them
+        roots = await _build_comment_tree(session, shard, post_id) if await get_live_post(session, post_id) else []
+        # same wire format as List[CommentOut], without re-validating every node
+        payload = fast_json.dumps(roots)
+        # replica renders may lag the version they are stored under, keep them briefly
+        ttl = REPLICA_THREAD_CACHE_TTL if replica else THREAD_CACHE_TTL
+        await store_thread(post_id, version, payload, ttl, replica)
+        return payload
+
+    # concurrent misses for the same thread version share one build
+    source = "replica" if replica else "primary"
+    payload = await thread_flight.do(f"{post_id}:v{version}:{source}", render)
+    return await _personalize(shard, viewer, payload, None if replica else etag)
+
+def _export_query(post_id: int, after_path: Optional[str] = None):
+    """Every comment of the post in depth-first order (siblings by id), one range scan on the path index."""
+    # plain columns, not entities: nothing accumulates in the session identity map
+    stmt = (
+        select(
+            Comment.id, Comment.parent_id, Comment.user_id, Comment.content,
+            Comment.likes_count, Comment.deleted, Comment.created_at, Comment.depth, Comment.path,
+        )
+        .where(Comment.post_id == post_id, Comment.path.is_not(None))
+    )
+    if after_path is not None:
+        stmt = stmt.where(Comment.path > after_path)
+    return stmt.order_by(Comment.path)
+
+def _export_line(row, username: str) -> str:
+    return json.dumps({
+        "id": row.id,
+        "parent_id": row.parent_id,
+        "user_id": row.user_id,
+        "username": username,
+        "content": "[deleted]" if row.deleted else row.content,
+        "likes_count": row.likes_count,
+        "deleted": row.deleted,
+        "created_at": row.created_at.isoformat(),
+        "depth": row.depth,
+        "path": readable_path(row.path),
+    }) + "\n"
+
+@router.get('/posts/{post_id}/comments/export')
+async def export_comments(
+    post_id: int,
+    after_id: Optional[int] = Query(None, description="resume after this comment id (the last line received)"),
+    session: AsyncSession = Depends(get_read_session),
+    shard: AsyncSession = Depends(get_post_shard_read_session),
+):
+    # NDJSON, one comment per line, streamed from a server-side cursor
+    if not await get_live_post(session, post_id):
+        raise HTTPException(status_code=404, detail="post not found")
+    # the range scan skips rows without a path (awaiting app.scripts.backfill_comment_paths,
+    # or replies under them), refuse rather than stream a silently incomplete thread
+    unbackfilled = (await shard.exec(
+        select(Comment.id).where(Comment.post_id == post_id, Comment.path.is_(None)).limit(1)
+    )).first()
+    if unbackfilled is not None:
+        raise HTTPException(status_code=503, detail="comment hierarchy not backfilled yet")
+
+    after_path = None
+    if after_id is not None:
+        after = await shard.get(Comment, after_id)
+        if not after or after.post_id != post_id or after.path is None:
+            raise HTTPException(status_code=400, detail="invalid after_id")
+        after_path = after.path
+
+    async def lines() -> AsyncIterator[str]:
+        names: Dict[int, str] = {}
+        result = await shard.stream(
+            _export_query(post_id, after_path).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        async for rows in result.partitions():
+            missing = {row.user_id for row in rows} - names.keys()
+            if missing:
+                names.update(await _usernames(session, missing))
+            yield "".join(_export_line(row, names[row.user_id]) for row in rows)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get('/posts/{post_id}/thread', response_model=CommentPage)
+async def get_comment_thread(
+    post_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    depth: int = Query(2, ge=0, le=10),
+    replies_limit: int = Query(5, ge=1, le=100),
+    sort: CommentSort = "new",
+    session: AsyncSession = Depends(get_read_session),
+    shard: AsyncSession = Depends(get_post_shard_read_session),
+    viewer = Depends(get_optional_user),
+):
+    # top-level comments in keyset pages, replies truncated to depth / replies_limit;
+    # sort=top / hot read the leading roots straight off their (likes_count | hot_score) index
+    if not await get_live_post(session, post_id):
+        raise HTTPException(status_code=404, detail="post not found")
+    page = await _comment_page(
+        shard,
+        (Comment.post_id == post_id) & (Comment.parent_id.is_(None)),
+        cursor,
+        limit,
+        sort,
+    )
+    await _attach_replies(shard, page["items"], depth, replies_limit, sort)
+    await _fill_usernames(session, page["items"])
+    if viewer is not None:
+        await _mark_liked_by_me(shard, viewer.id, page["items"])
+    return page
+
+async def _live_comment(session: AsyncSession, shard: AsyncSession, comment_id: int) -> Comment:
+    # a deleted post keeps its comments until the purge reaches them, they are gone all the same
+    comment = await shard.get(Comment, comment_id)
+    if not comment or not await get_live_post(session, comment.post_id):
+        raise HTTPException(status_code=404, detail="comment not found")
+    return comment
+
+@router.get('/comments/{comment_id}/replies', response_model=CommentPage)
+async def get_comment_replies(
+    comment_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    depth: int = Query(2, ge=0, le=10),
+    replies_limit: int = Query(5, ge=1, le=100),
+    sort: CommentSort = "new",
+    session: AsyncSession = Depends(get_read_session),
+    shard: AsyncSession = Depends(get_comment_shard_read_session),
+):
+    # expands a truncated node, pass its reply_cursor (and the same sort) to continue after the shown replies
+    await _live_comment(session, shard, comment_id)
+    page = await _comment_page(shard, Comment.parent_id == comment_id, cursor, limit, sort)
+    await _attach_replies(shard, page["items"], depth, replies_limit, sort)
+    await _fill_usernames(session, page["items"])
+    return page
+
+@router.get('/comments/{comment_id}/context', response_model=CommentContext)
+async def get_comment_context(
+    comment_id: int,
+    depth: int = Query(3, ge=0, le=10),
+    session: AsyncSession = Depends(get_read_session),
+    shard: AsyncSession = Depends(get_comment_shard_read_session),
+):
+    # permalink to a (possibly deep) reply without loading the rest of the thread
+    comment = await _live_comment(session, shard, comment_id)
+    if comment.path is None:
+        raise HTTPException(status_code=503, detail="comment hierarchy not backfilled yet")
+
+    ancestor_rows = (await shard.exec(
+        select(Comment)
+        .where(Comment.id.in_(path_ids(comment.path)[:-1]))
+        .order_by(Comment.depth)
+    )).all()
+
+    low, high = subtree_range(comment.path)
+    subtree_rows = (await shard.exec(
+        select(Comment)
+        .where(Comment.post_id == comment.post_id, Comment.path >= low, Comment.path < high)
+        .where(Comment.depth <= comment.depth + depth)
+        .order_by(Comment.path)
+    )).all()
+    # path order puts every parent before its children
+    nodes: Dict[int, dict] = {}
+    for comment_obj in subtree_rows:
+        node = nodes[comment_obj.id] = _thread_node(comment_obj)
+        if comment_obj.id != comment.id:
+            nodes[comment_obj.parent_id]["children"].append(node)
+
+    # nodes on the last level are cut off by depth, flag those that have replies
+    edge = [c.id for c in subtree_rows if c.depth == comment.depth + depth]
+    if edge:
+        with_replies = (await shard.exec(
+            select(Comment.parent_id).where(Comment.parent_id.in_(edge)).distinct()
+        )).all()
+        for parent_id in with_replies:
+            nodes[parent_id]["has_more_children"] = True
+
+    low, high = descendants_range(comment.path)
+    descendants_count = (await shard.exec(
+        select(func.count())
+        .select_from(Comment)
+        .where(Comment.post_id == comment.post_id, Comment.path >= low, Comment.path < high)
+    )).one()
+
+    ancestors = [_thread_node(c) for c in ancestor_rows]
+    await _fill_usernames(session, ancestors + [nodes[comment.id]])
+    return {
+        "ancestors": ancestors,
+        "comment": nodes[comment.id],
+        "descendants_count": descendants_count,
+    }
+
 @router.patch("/comments/{comment_id}", response_model=CommentOut)
-def update_comment(
+async def update_comment(
     comment_id: int, 
     payload: CommentUpdate, 
-    session: Session = Depends(get_session), 
+    session: AsyncSession = Depends(get_session), 
+    shard: AsyncSession = Depends(get_comment_shard_session),
     current_user=Depends(get_current_user)
 ):
-    comment = session.get(Comment, comment_id)
-    if not comment:
-        raise HTTPException(status_code=404, detail="comment not found")
+    comment = await _live_comment(session, shard, comment_id)
     if comment.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="not allowed")
 
-    comment.content = payload.content
-    session.add(comment)
-    session.commit()
-    session.refresh(comment)
+    comment.content, comment.flagged = await moderate_comment(payload.content)
+    shard.add(comment)
+    if not comment.deleted:
+        await index_document(session, COMMENT, comment.id, comment.post_id, comment.content, comment.created_at)
+    await commit_all(session, shard)
+    await shard.refresh(comment)
+    await bump_thread_version(comment.post_id)
 
-    # Re-fetch username since it's not on the comment object
-    user = session.get(User, comment.user_id)
-    
-    return format_comment_response(comment, user.username, session)
+    # only the author may edit, so the principal already carries the username
+    response = format_comment_response(comment, current_user.username)
+    await publish_event(comment.post_id, "update_comment", response.model_dump(mode="json"))
+    return response
 
 @router.delete("/comments/{comment_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_comment(comment_id: int, session: Session = Depends(get_session), current_user = Depends(get_current_user)):
-    comment = session.get(Comment, comment_id)
-    if not comment:
-        raise HTTPException(status_code=404, detail="comment not found")
+async def delete_comment(
+    comment_id: int,
+    session: AsyncSession = Depends(get_session),
+    shard: AsyncSession = Depends(get_comment_shard_session),
+    current_user = Depends(get_current_user),
+):
+    comment = await _live_comment(session, shard, comment_id)
     
     if comment.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="not allowed")
 
+    if not comment.deleted:
+        await session.exec(
+            update(Post)
+            .where(Post.id == comment.post_id)
+            .values(comments_count=Post.comments_count - 1)
+        )
     comment.deleted = True
     comment.content = "[This comment has been deleted]"
-    session.add(comment)
-    session.commit()
+    shard.add(comment)
+    await remove_document(session, COMMENT, comment.id)
+    await commit_all(session, shard)
+    await bump_thread_version(comment.post_id)
+    await publish_event(comment.post_id, "delete_comment", {"id": comment.id})
     return
\ No newline at end of file
@@ -0,0 +1,39 @@
+# app/routers/events_router.py
+import asyncio
+from fastapi import APIRouter, WebSocket, status # type:ignore
+from redis.exceptions import RedisError # type:ignore
+
+from ..core.realtime import hub
+
+router = APIRouter(tags=["events"])
+
+@router.websocket("/ws/posts/{post_id}")
+async def post_events(websocket: WebSocket, post_id: int):
+    # live new_comment / update_comment / delete_comment / like_counts events for one post
+    await websocket.accept()
+    try:
+        subscription = await hub.subscribe(post_id)
+    except (RedisError, OSError):
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    async def send_events():
+        while True:
+            await websocket.send_text(await subscription.get())
+
+    async def wait_for_disconnect():
+        # clients only listen; anything they send is ignored
+        while True:
+            await websocket.receive_text()
+
+    sender = asyncio.create_task(send_events())
+    receiver = asyncio.create_task(wait_for_disconnect())
+    try:
+        done, _ = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            # a disconnect or failed send ends the session, nothing to report
+            task.exception()
+    finally:
+        sender.cancel()
+        receiver.cancel()
+        await hub.unsubscribe(subscription)
@@ -1,34 +1,71 @@
 # app/routers/likes_router.py
 from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from ..db import get_session
+from ..core.sharding import get_comment_shard_session
+from ..core.post_purge import get_live_post
 from ..models import CommentLike, Comment
 from ..auth import get_current_user
-from ..libs.limiter import limiter  # to be replaced with reverse proxy
-from sqlalchemy import func
+from ..libs.limiter import limit_toggle_like
+from ..core.cache import bump_thread_version
+from ..core import like_buffer
+from ..core.realtime import publish_event
+from ..utils.ranking import hot_score
+from redis.exceptions import RedisError
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
 
 router = APIRouter(tags=["likes"])
 
-@router.post("/comments/{comment_id}/like")
-# @limiter.limit("500/minute")   # DoS protection
-def toggle_like(request:Request,comment_id: int, session: Session = Depends(get_session), current_user = Depends(get_current_user)):
-    comment = session.get(Comment, comment_id)
-    if not comment:
+async def _bump_likes_count(session: AsyncSession, comment_id: int, delta: int) -> None:
+    # relative UPDATE so concurrent toggles never overwrite each other
+    likes_count, created_at = (await session.exec(
+        update(Comment)
+        .where(Comment.id == comment_id)
+        .values(likes_count=Comment.likes_count + delta)
+        .returning(Comment.likes_count, Comment.created_at)
+    )).one()
+    # the row stays locked until commit, so the score matches the count
+    await session.exec(
+        update(Comment)
+        .where(Comment.id == comment_id)
+        .values(hot_score=hot_score(likes_count, created_at))
+    )
+
+@router.post("/comments/{comment_id}/like", dependencies=[Depends(limit_toggle_like)])  # DoS protection
+async def toggle_like(request:Request,comment_id: int, session: AsyncSession = Depends(get_comment_shard_session), main: AsyncSession = Depends(get_session), current_user = Depends(get_current_user)):
+    # session is on the shard holding the comment (app.core.sharding), main holds the post
+    comment = await session.get(Comment, comment_id)
+    if not comment or not await get_live_post(main, comment.post_id):
         raise HTTPException(status_code=404, detail="comment not found")
-    existing = session.exec(select(CommentLike).where((CommentLike.comment_id == comment_id) & (CommentLike.user_id == current_user.id))).first()
+    if like_buffer.LIKE_WRITE_BEHIND:
+        # applied in Redis now, flushed to CommentLike in batches
+        try:
+            liked, count = await like_buffer.buffered_toggle(session, comment_id, comment.post_id, current_user.id)
+        except (RedisError, OSError):
+            raise HTTPException(status_code=503, detail="likes temporarily unavailable")
+        await publish_event(comment.post_id, "like_count", {"id": comment_id, "likes_count": count})
+        return {"liked": liked, "likes_count": count}
+    existing = (await session.exec(select(CommentLike.id).where((CommentLike.comment_id == comment_id) & (CommentLike.user_id == current_user.id)))).first()
     if existing:
-        session.delete(existing)
-        session.commit()
+        removed = (await session.exec(delete(CommentLike).where(CommentLike.id == existing))).rowcount
+        if removed:
+            # a concurrent unlike may already have removed the row
+            await _bump_likes_count(session, comment_id, -1)
+        await session.commit()
         liked = False
     else:
-        like = CommentLike(comment_id=comment_id, user_id=current_user.id)
-        session.add(like)
+        session.add(CommentLike(comment_id=comment_id, user_id=current_user.id))
         try:
-            session.commit()
-        except Exception:
-            session.rollback()
+            await session.flush()
+            await _bump_likes_count(session, comment_id, 1)
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
             # possible unique constraint race, treat as already liked
         liked = True
-    # compute current count
-    count = session.exec(select(func.count()).select_from(CommentLike).where(CommentLike.comment_id == comment_id)).one() or 0
-    return {"liked": liked, "likes_count": int(count)}
+    await session.refresh(comment)
+    await bump_thread_version(comment.post_id)
+    await publish_event(comment.post_id, "like_count", {"id": comment_id, "likes_count": comment.likes_count})
+    return {"liked": liked, "likes_count": comment.likes_count}
@@ -1,42 +1,98 @@
 # app/routers/posts_router.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Request # type:ignore
-from sqlmodel import Session, select # type:ignore
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response # type:ignore
+from sqlmodel import select # type:ignore
+from sqlmodel.ext.asyncio.session import AsyncSession # type:ignore
+from typing import List, Optional
+from sqlalchemy import tuple_ # type:ignore
 
-from ..db import get_session
-from ..models import Post
-from ..schemas import PostCreate, PostRead
+from ..db import get_session, get_read_session
+from ..models import Post, get_current_utc_time
+from ..schemas import PostCreate, PostRead, PostPage
 from ..auth import get_current_user
-from ..libs.limiter import limiter   # to be replaced with reverse proxy
+from ..libs.limiter import limit_create_post
+from ..core.singleflight import post_flight
+from ..utils.pagination import encode_cursor, decode_cursor
+from ..core.search import index_document, remove_document, POST
+from ..core.post_purge import get_live_post, wake_post_purger
+from ..core.cache import get_thread_version, get_thread_versions, bump_thread_version
+from ..utils.http_cache import make_etag, etag_matches, matches_any, not_modified
+import hashlib
 
 router = APIRouter(prefix='/posts',tags=["posts"])
 
 # serialization is handled by response model
 # deserialization is handled by Pydantic schema classes
-@router.post('/',response_model=PostRead) 
-# @limiter.limit('200/minute') # DoS protection for create posts
-def create_post(request:Request,payload: PostCreate, session: Session=Depends(get_session), current_user = Depends(get_current_user)):
+@router.post('/',response_model=PostRead, dependencies=[Depends(limit_create_post)]) # DoS protection for create posts
+async def create_post(request:Request,payload: PostCreate, session: AsyncSession=Depends(get_session), current_user = Depends(get_current_user)):
     post= Post(author_id=current_user.id, title=payload.title, content=payload.content)
     session.add(post)
-    session.commit()
-    session.refresh(post)
+    await session.flush()
+    await index_document(session, POST, post.id, post.id, f"{post.title}\n{post.content}", post.created_at)
+    await session.commit()
+    await session.refresh(post)
     return post
 
 @router.get("/",response_model=List[PostRead])
-def list_post(skip:int = 0, limit:int = Query(20, le=100), session:Session = Depends(get_session)):
-    posts = session.exec(select(Post).offset(skip).limit(limit)).all()
+async def list_post(request: Request, response: Response, skip:int = 0, limit:int = Query(20, le=100), session:AsyncSession = Depends(get_read_session)):
+    # offset paging is kept for existing clients, new ones should use /posts/feed
+    ordered = (Post.created_at.desc(), Post.id.desc())
+    live = Post.deleted_at.is_(None)
+    if not session.info.get("replica"):
+        # the page's ETag covers which posts are on it and each one's version:
+        # an index-only id scan plus one MGET decide a 304
+        post_ids = (await session.exec(select(Post.id).where(live).order_by(*ordered).offset(skip).limit(limit))).all()
+        versions = await get_thread_versions(post_ids)
+        if versions is not None:
+            digest = hashlib.sha1(",".join(f"{p}:{v}" for p, v in zip(post_ids, versions)).encode()).hexdigest()
+            etag = make_etag("l", digest[:20])
+            if etag_matches(request, etag):
+                return not_modified(etag)
+            response.headers["ETag"] = etag
+    posts = (await session.exec(select(Post).where(live).order_by(*ordered).offset(skip).limit(limit))).all()
     return posts
-    
-@router.get("/{post_id}",response_model=PostRead)
-def get_post(post_id:int , session: Session = Depends(get_session)):
-    post = session.get(Post,post_id)
+
+@router.get("/feed", response_model=PostPage)
+async def post_feed(cursor: Optional[str] = None, limit: int = Query(20, ge=1, le=100), session: AsyncSession = Depends(get_read_session)):
+    # newest first, keyset over (created_at, id) so deep pages cost the same as the first
+    stmt = select(Post).where(Post.deleted_at.is_(None))
+    if cursor:
+        created_at, post_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(Post.created_at, Post.id) < tuple_(created_at, post_id))
+    posts = (await session.exec(stmt.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = encode_cursor(posts[-1].created_at, posts[-1].id)
+    return {"items": posts, "next_cursor": next_cursor}
+
+async def _render_post(session: AsyncSession, post_id: int) -> str:
+    post = await get_live_post(session, post_id)
     if not post:
+        return "null"
+    return PostRead.model_validate(post, from_attributes=True).model_dump_json()
+
+@router.get("/{post_id}",response_model=PostRead)
+async def get_post(request: Request, post_id:int , session: AsyncSession = Depends(get_read_session)):
+    replica = bool(session.info.get("replica"))
+    version = etag = None
+    if not replica:
+        # a replica row may lag the version, those reads get no ETag
+        version = await get_thread_version(post_id)
+        etag = make_etag("p", post_id, version) if version is not None else None
+        if etag_matches(request, etag) and (not matches_any(request) or await get_live_post(session, post_id)):
+            return not_modified(etag)
+    # concurrent reads of the same post version share one lookup; a render
+    # started before a write must not be handed out under the new ETag
+    source = "replica" if replica else "primary"
+    payload = await post_flight.do(f"{post_id}:v{version}:{source}", lambda: _render_post(session, post_id))
+    if payload == "null":
         raise HTTPException(status_code=404, detail="post not found")
-    return post
+    return Response(content=payload, media_type="application/json", headers={"ETag": etag} if etag else None)
 
 @router.put("/{post_id}", response_model=PostRead)
-def update_post(post_id: int , payload: PostCreate, session: Session = Depends(get_session),current_user = Depends(get_current_user)):
-    post = session.get(Post, post_id)
+async def update_post(post_id: int , payload: PostCreate, session: AsyncSession = Depends(get_session),current_user = Depends(get_current_user)):
+    post = await get_live_post(session, post_id)
     if not post:
         raise HTTPException(status_code=404, detail="post not found")
     
@@ -45,17 +101,25 @@ def update_post(post_id: int , payload: PostCreate, session: Session = Depends(g
     post.title= payload.title
     post.content = payload.content 
     session.add(post)
-    session.commit()
-    session.refresh(post)
+    await index_document(session, POST, post.id, post.id, f"{post.title}\n{post.content}", post.created_at)
+    await session.commit()
+    await session.refresh(post)
+    await bump_thread_version(post.id)
     return post
 
 @router.delete("/{post_id}")
-def delete_post(post_id:int, session: Session= Depends(get_session),current_user = Depends(get_current_user)):
-        post = session.get(Post, post_id)
+async def delete_post(post_id:int, session: AsyncSession= Depends(get_session),current_user = Depends(get_current_user)):
+        post = await get_live_post(session, post_id)
         if not post:
             raise HTTPException(status_code=404, detail="post not found")
         if post.author_id != current_user.id:
             raise HTTPException(status_code=403, detail="not allowed")
-        session.delete(post)
-        session.commit()
+        # tombstone only: comments, likes and search documents are purged in
+        # batches in the background (app.core.post_purge)
+        post.deleted_at = get_current_utc_time()
+        session.add(post)
+        await remove_document(session, POST, post.id)
+        await session.commit()
+        await bump_thread_version(post_id)
+        wake_post_purger()
         return {"ok":True}
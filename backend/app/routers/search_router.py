@@ -0,0 +1,47 @@
+# app/routers/search_router.py
+from fastapi import APIRouter, Depends, Query # type:ignore
+from sqlmodel import select # type:ignore
+from sqlmodel.ext.asyncio.session import AsyncSession # type:ignore
+from typing import Literal, Optional
+
+from ..db import get_read_session
+from ..models import Comment, Post
+from ..schemas import SearchPage
+from ..core.search import search_documents, COMMENT, POST
+from ..core.sharding import group_by_shard, shard_router
+
+router = APIRouter(tags=["search"])
+
+@router.get("/search", response_model=SearchPage)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    post_id: Optional[int] = None,
+    type: Optional[Literal["comment", "post"]] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    session: AsyncSession = Depends(get_read_session),
+):
+    # ranked hits from the search index, then IN lookups for their content
+    hits, next_cursor = await search_documents(session, q, post_id=post_id, kind=type, cursor=cursor, limit=limit)
+
+    # documents of a deleted post outlive it until the purge removes them
+    posts = {p.id: p for p in (await session.exec(
+        select(Post).where(Post.id.in_({h["post_id"] for h in hits}), Post.deleted_at.is_(None))
+    )).all()} if hits else {}
+    comment_hits = [h for h in hits if h["type"] == COMMENT and h["post_id"] in posts]
+    comments = {}
+    # comments live on their thread's shard (app.core.sharding)
+    for shard_name, shard_posts in (await group_by_shard(session, {h["post_id"] for h in comment_hits})).items():
+        comment_ids = [h["id"] for h in comment_hits if h["post_id"] in shard_posts]
+        async with shard_router.session(shard_name, session) as shard:
+            comments.update((c.id, c) for c in (await shard.exec(select(Comment).where(Comment.id.in_(comment_ids)))).all())
+
+    items = []
+    for hit in hits:
+        if hit["type"] == COMMENT and hit["id"] in comments:
+            comment = comments[hit["id"]]
+            items.append({**hit, "content": comment.content, "created_at": comment.created_at})
+        elif hit["type"] == POST and hit["id"] in posts:
+            post = posts[hit["id"]]
+            items.append({**hit, "title": post.title, "content": post.content, "created_at": post.created_at})
+    return {"items": items, "next_cursor": next_cursor}
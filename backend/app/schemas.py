@@ -20,6 +20,12 @@ class UserRead(BaseModel):
     email: EmailStr
     created_at: datetime
     
+# what handlers get from get_current_user, cached per request token
+class CurrentUser(BaseModel):
+    id: int
+    username: str
+    is_verified: bool
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -33,7 +39,13 @@ class PostRead(BaseModel):
     author_id: int 
     title: str
     content: str
+    comments_count: int = 0
+    last_activity_at: Optional[datetime] = None
     created_at: datetime
+
+class PostPage(BaseModel):
+    items: List[PostRead]
+    next_cursor: Optional[str] = None
     
 class CommentCreate(BaseModel):
     content: str 
@@ -53,6 +65,34 @@ class CommentOut(BaseModel):
     deleted:bool
     created_at: datetime
     children: List['CommentOut'] = []
+    # set on nodes whose replies were cut off by depth or replies_limit
+    has_more_children: bool = False
+    reply_cursor: Optional[str] = None
+    # only set for authenticated readers, never part of a shared cached payload
+    liked_by_me: Optional[bool] = None
+
+class CommentPage(BaseModel):
+    items: List[CommentOut]
+    next_cursor: Optional[str] = None
+
+# permalink view of one comment inside its thread
+class CommentContext(BaseModel):
+    ancestors: List[CommentOut]
+    comment: CommentOut
+    descendants_count: int
+    
+class SearchHit(BaseModel):
+    type: str  # "comment" or "post"
+    id: int
+    post_id: int
+    score: float
+    title: Optional[str] = None
+    content: str
+    created_at: datetime
+
+class SearchPage(BaseModel):
+    items: List[SearchHit]
+    next_cursor: Optional[str] = None
     
 #for recursive type
 CommentOut.update_forward_refs()
\ No newline at end of file
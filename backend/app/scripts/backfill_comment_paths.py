@@ -0,0 +1,73 @@
+# app/scripts/backfill_comment_paths.py
+"""Fill Comment.path / Comment.depth for rows created before the hierarchy index.
+
+    python -m app.scripts.backfill_comment_paths [--batch-size 5000]
+
+Brings the schema up to date first (app.core.schema_upgrade), adding the
+columns and the (post_id, path) index.
+Works top down: roots, then every comment whose parent already has a path,
+in short batches, so it can run against a live database and be stopped
+and restarted at any point.
+"""
+import argparse
+
+from sqlalchemy import update # type:ignore
+from sqlalchemy.orm import aliased # type:ignore
+from sqlmodel import Session, select # type:ignore
+
+from ..core.schema_upgrade import upgrade_schema
+from ..core.sharding import shard_sync_engines
+from ..models import Comment
+from ..utils.comment_path import child_path, path_depth
+
+
+def _write_paths(session: Session, rows) -> int:
+    paths = [
+        {"id": comment_id, "path": (path := child_path(parent_path, comment_id)), "depth": path_depth(path)}
+        for comment_id, parent_path in rows
+    ]
+    if paths:
+        session.exec(update(Comment), params=paths)
+        session.commit()
+    return len(paths)
+
+def backfill_comment_paths(session: Session, batch_size: int = 5000) -> int:
+    """Returns the number of comments given a path."""
+    filled = 0
+    while True:
+        roots = session.exec(
+            select(Comment.id)
+            .where(Comment.parent_id.is_(None), Comment.path.is_(None))
+            .limit(batch_size)
+        ).all()
+        if not roots:
+            break
+        filled += _write_paths(session, [(root_id, None) for root_id in roots])
+
+    parent = aliased(Comment)
+    while True:
+        # each pass reaches one level deeper than the previous one
+        children = session.exec(
+            select(Comment.id, parent.path)
+            .join(parent, parent.id == Comment.parent_id)
+            .where(Comment.path.is_(None), parent.path.is_not(None))
+            .limit(batch_size)
+        ).all()
+        if not children:
+            break
+        filled += _write_paths(session, children)
+    return filled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    # comments may be spread over several databases (app.core.sharding)
+    for name, bind in shard_sync_engines().items():
+        with bind.begin() as conn:
+            upgrade_schema(conn)
+        with Session(bind) as session:
+            filled = backfill_comment_paths(session, args.batch_size)
+        print(f"{name}: backfilled {filled} comment paths")
@@ -0,0 +1,33 @@
+# app/scripts/purge_deleted_posts.py
+"""Purge deleted (tombstoned) posts with their comments, likes and search documents.
+
+    python -m app.scripts.purge_deleted_posts [--batch-size 5000]
+
+The API does this in the background (app.core.post_purge); run this to
+finish a backlog by hand, e.g. with the API stopped. Brings the schema
+up to date first (app.core.schema_upgrade) when running against an older
+database.
+Every batch is its own transaction, so it can be stopped and restarted
+at any point.
+"""
+import argparse
+import asyncio
+
+from ..db import engine
+from ..core.schema_upgrade import upgrade_schema
+from ..core.post_purge import purge_deleted_posts, POST_PURGE_BATCH
+
+
+async def _print_progress(post_id: int, table: str, rows: int) -> None:
+    print(f"post {post_id}: removed {rows} {table}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=POST_PURGE_BATCH)
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        upgrade_schema(conn)
+    purged = asyncio.run(purge_deleted_posts(batch_size=args.batch_size, progress=_print_progress))
+    print(f"purged {purged} posts")
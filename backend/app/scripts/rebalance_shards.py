@@ -0,0 +1,192 @@
+# app/scripts/rebalance_shards.py
+"""Move comment threads between shards (app.core.sharding).
+
+    python -m app.scripts.rebalance_shards locators
+    python -m app.scripts.rebalance_shards pin "main,b=postgresql://..."
+    python -m app.scripts.rebalance_shards move POST_ID TARGET [--batch-size 5000]
+
+locators seeds CommentLocator from the comments already in the main
+database, run it once before turning sharding on. pin takes the
+DB_SHARD_URLS value about to be deployed and records the current shard of
+every post the new hash ring would place elsewhere, so adding a shard
+moves nothing until those posts are moved one by one with move.
+
+move marks the post as moving (writes get a 503, reads stay on the
+source), waits for the workers' cached placements to expire, flushes
+buffered likes, copies comments and likes in batches, switches the
+directory, waits again for readers, then deletes the source rows. A move
+cut short can be rerun: rows left on the target are cleared first.
+"""
+import argparse
+import asyncio
+from typing import Callable, List, Optional
+
+from sqlalchemy import delete, insert, text # type:ignore
+from sqlalchemy.ext.asyncio import AsyncEngine # type:ignore
+from sqlmodel import select # type:ignore
+from sqlmodel.ext.asyncio.session import AsyncSession # type:ignore
+
+from .. import db
+from ..core import like_buffer
+from ..core.cache import bump_thread_version
+from ..core.sharding import HashRing, SHARD_DIRECTORY_TTL, shard_router
+from ..models import Comment, CommentLike, CommentLocator, Post, PostShard
+
+MOVE_BATCH = 5000
+
+Progress = Callable[[str], None]
+
+
+async def _delete_thread(session: AsyncSession, post_id: int, batch_size: int) -> int:
+    """Remove a post's comments and likes from one shard, newest comments first."""
+    removed = 0
+    while (comment_ids := (await session.exec(
+        select(Comment.id).where(Comment.post_id == post_id).order_by(Comment.id.desc()).limit(batch_size)
+    )).all()):
+        await session.exec(
+            delete(CommentLike).where(CommentLike.comment_id.in_(comment_ids)).execution_options(synchronize_session=False)
+        )
+        removed += (await session.exec(
+            delete(Comment).where(Comment.id.in_(comment_ids)).execution_options(synchronize_session=False)
+        )).rowcount
+        await session.commit()
+    return removed
+
+async def _copy_thread(source: AsyncSession, target: AsyncSession, post_id: int, batch_size: int, progress: Progress) -> int:
+    # ascending ids: a parent is always copied before its replies
+    comment_columns = list(Comment.__table__.c)
+    like_columns = [c for c in CommentLike.__table__.c if c.name != "id"]
+    copied, last_id = 0, 0
+    while (rows := (await source.exec(
+        select(*comment_columns)
+        .where(Comment.post_id == post_id, Comment.id > last_id)
+        .order_by(Comment.id)
+        .limit(batch_size)
+    )).all()):
+        comment_ids = [row.id for row in rows]
+        await target.exec(insert(Comment), params=[dict(row._mapping) for row in rows])
+        last_like = 0
+        # likes get new ids on the target, only (comment_id, user_id) matters
+        while (likes := (await source.exec(
+            select(CommentLike.id, *like_columns)
+            .where(CommentLike.comment_id.in_(comment_ids), CommentLike.id > last_like)
+            .order_by(CommentLike.id)
+            .limit(batch_size)
+        )).all()):
+            await target.exec(insert(CommentLike), params=[
+                {c.name: like._mapping[c.name] for c in like_columns} for like in likes
+            ])
+            last_like = likes[-1].id
+        await target.commit()
+        copied += len(rows)
+        last_id = comment_ids[-1]
+        progress(f"post {post_id}: copied {copied} comments")
+    return copied
+
+async def move_post(
+    post_id: int, target: str, engine: Optional[AsyncEngine] = None, batch_size: int = MOVE_BATCH,
+    settle: float = 2 * SHARD_DIRECTORY_TTL, progress: Progress = print,
+) -> int:
+    """Move a post's comments and likes to the target shard; returns comments moved."""
+    if target not in shard_router.engines:
+        raise ValueError(f"unknown shard {target!r}")
+    async with AsyncSession(engine or db.async_engine, expire_on_commit=False) as main:
+        if await main.get(Post, post_id) is None:
+            raise ValueError(f"post {post_id} not found")
+        row = await main.get(PostShard, post_id)
+        if row is None:
+            row = PostShard(post_id=post_id, shard=shard_router.ring_shard(post_id))
+        if row.moving_to not in (None, target):
+            raise ValueError(f"post {post_id} is already moving to {row.moving_to}")
+        if row.shard == target:
+            return 0
+        source = row.shard
+        row.moving_to = target
+        main.add(row)
+        await main.commit()
+        # until every worker has seen moving_to, one of them may still write to the source
+        await asyncio.sleep(settle)
+        if like_buffer.LIKE_WRITE_BEHIND:
+            await like_buffer.flush_all()
+
+        async with shard_router.session(source, main) as source_session, \
+                shard_router.session(target, main) as target_session:
+            await _delete_thread(target_session, post_id, batch_size)
+            moved = await _copy_thread(source_session, target_session, post_id, batch_size, progress)
+
+            row.shard, row.moving_to = target, None
+            main.add(row)
+            await main.commit()
+            shard_router.forget(post_id)
+            await bump_thread_version(post_id)
+            # readers with the old placement cached still read the source
+            await asyncio.sleep(settle)
+            await _delete_thread(source_session, post_id, batch_size)
+    progress(f"post {post_id}: moved {moved} comments from {source} to {target}")
+    return moved
+
+async def pin_remapped_posts(shard_urls: str, engine: Optional[AsyncEngine] = None, batch_size: int = MOVE_BATCH) -> int:
+    """Pin every post the ring built from shard_urls would move to its current shard."""
+    new_ring = HashRing(sorted(db.parse_shard_urls(shard_urls)))
+    pinned, last_id = 0, 0
+    async with AsyncSession(engine or db.async_engine, expire_on_commit=False) as main:
+        while (post_ids := (await main.exec(
+            select(Post.id)
+            .outerjoin(PostShard, PostShard.post_id == Post.id)
+            .where(PostShard.post_id.is_(None), Post.id > last_id)
+            .order_by(Post.id)
+            .limit(batch_size)
+        )).all()):
+            rows: List[PostShard] = [
+                PostShard(post_id=post_id, shard=shard_router.ring_shard(post_id))
+                for post_id in post_ids
+                if new_ring.lookup(post_id) != shard_router.ring_shard(post_id)
+            ]
+            main.add_all(rows)
+            await main.commit()
+            pinned += len(rows)
+            last_id = post_ids[-1]
+    return pinned
+
+async def seed_comment_locators(engine: Optional[AsyncEngine] = None) -> int:
+    """CommentLocator rows for the comments in the main database; new ids continue after them."""
+    async with AsyncSession(engine or db.async_engine, expire_on_commit=False) as main:
+        seeded = (await main.exec(
+            insert(CommentLocator).from_select(
+                ["id", "post_id"],
+                select(Comment.id, Comment.post_id).where(
+                    ~select(CommentLocator.id).where(CommentLocator.id == Comment.id).exists()
+                ),
+            )
+        )).rowcount
+        if main.bind.dialect.name == "postgresql":
+            # explicit ids do not advance the serial, SQLite continues after MAX(id) by itself
+            await main.exec(text(
+                "SELECT setval(pg_get_serial_sequence('commentlocator', 'id'), "
+                "(SELECT COALESCE(MAX(id), 0) + 1 FROM commentlocator), false)"
+            ))
+        await main.commit()
+    return seeded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("locators", help="seed CommentLocator from the main database")
+    pin = commands.add_parser("pin", help="pin the posts a new shard list would remap")
+    pin.add_argument("shard_urls", help="the DB_SHARD_URLS value about to be deployed")
+    move = commands.add_parser("move", help="move one post's thread to another shard")
+    move.add_argument("post_id", type=int)
+    move.add_argument("target")
+    move.add_argument("--batch-size", type=int, default=MOVE_BATCH)
+    args = parser.parse_args()
+
+    if args.command == "locators":
+        print(f"seeded {asyncio.run(seed_comment_locators())} comment locators")
+    elif args.command == "pin":
+        print(f"pinned {asyncio.run(pin_remapped_posts(args.shard_urls))} posts to their current shard")
+    else:
+        try:
+            asyncio.run(move_post(args.post_id, args.target, batch_size=args.batch_size))
+        except ValueError as exc:
+            parser.exit(1, f"{exc}\n")
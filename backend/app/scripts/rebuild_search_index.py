@@ -0,0 +1,90 @@
+# app/scripts/rebuild_search_index.py
+"""(Re)index every live comment and every post into search_index.
+
+    python -m app.scripts.rebuild_search_index [--batch-size 10000]
+
+Creates the index table first when it is missing. Each id range is one
+INSERT ... SELECT in its own short transaction, so the script can run
+against a live database; documents written by the API meanwhile are
+simply replaced with identical ones.
+"""
+import argparse
+
+from sqlalchemy import func, text # type:ignore
+from sqlalchemy.engine import Engine # type:ignore
+from sqlmodel import Session, select # type:ignore
+
+from ..core.sharding import shard_router
+from ..db import engine
+from ..models import Comment, Post
+from ..core.search import SEARCH_LANGUAGE, search_ddl
+
+
+def ensure_search_index(bind: Engine) -> None:
+    with bind.begin() as conn:
+        for statement in search_ddl(bind.dialect.name):
+            conn.execute(text(statement))
+
+def _postgres_batches():
+    upsert = "ON CONFLICT (doc_key) DO UPDATE SET body = EXCLUDED.body"
+    tsvector = "to_tsvector(CAST(:language AS regconfig), {})"
+    return [
+        (Comment, f"""
+            INSERT INTO search_index (doc_key, kind, doc_id, post_id, created_at, body)
+            SELECT id * 2, 'comment', id, post_id, created_at, {tsvector.format("content")}
+            FROM comment WHERE NOT deleted AND id > :low AND id <= :high {upsert}
+        """),
+        (Post, f"""
+            INSERT INTO search_index (doc_key, kind, doc_id, post_id, created_at, body)
+            SELECT id * 2 + 1, 'post', id, id, created_at, {tsvector.format("title || ' ' || content")}
+            FROM post WHERE id > :low AND id <= :high {upsert}
+        """),
+    ]
+
+def _sqlite_batches():
+    return [
+        (Comment, """
+            DELETE FROM search_index WHERE rowid IN (SELECT id * 2 FROM comment WHERE id > :low AND id <= :high);
+            INSERT INTO search_index (rowid, body, kind, doc_id, post_id, created_at)
+            SELECT id * 2, content, 'comment', id, post_id, created_at
+            FROM comment WHERE NOT deleted AND id > :low AND id <= :high
+        """),
+        (Post, """
+            DELETE FROM search_index WHERE rowid IN (SELECT id * 2 + 1 FROM post WHERE id > :low AND id <= :high);
+            INSERT INTO search_index (rowid, body, kind, doc_id, post_id, created_at)
+            SELECT id * 2 + 1, title || char(10) || content, 'post', id, id, created_at
+            FROM post WHERE id > :low AND id <= :high
+        """),
+    ]
+
+def rebuild_search_index(session: Session, batch_size: int = 10_000) -> int:
+    """Returns the number of documents written."""
+    postgres = session.get_bind().dialect.name == "postgresql"
+    written = 0
+    for model, sql in (_postgres_batches() if postgres else _sqlite_batches()):
+        max_id = session.exec(select(func.max(model.id))).one() or 0
+        for low in range(0, max_id, batch_size):
+            params = {"low": low, "high": low + batch_size}
+            if postgres:
+                params["language"] = SEARCH_LANGUAGE
+            for statement in filter(str.strip, sql.split(";")):
+                result = session.exec(text(statement).bindparams(**{
+                    name: value for name, value in params.items() if f":{name}" in statement
+                }))
+            written += result.rowcount
+            session.commit()
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+    if shard_router.enabled:
+        # reads comments and writes the main database in one pass
+        parser.exit(1, "not supported while comments are sharded (DB_SHARD_URLS)\n")
+
+    ensure_search_index(engine)
+    with Session(engine) as session:
+        written = rebuild_search_index(session, args.batch_size)
+    print(f"indexed {written} documents")
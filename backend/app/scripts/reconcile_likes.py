@@ -0,0 +1,52 @@
+# app/scripts/reconcile_likes.py
+"""Recompute drifted Comment.likes_count values from CommentLike.
+
+    python -m app.scripts.reconcile_likes [--batch-size 10000]
+
+Brings the schema up to date first (app.core.schema_upgrade) when running
+against a database created before the counter existed.
+"""
+import argparse
+
+from sqlalchemy import func, update # type:ignore
+from sqlmodel import Session, select # type:ignore
+
+from ..core.schema_upgrade import upgrade_schema
+from ..core.sharding import shard_sync_engines
+from ..models import Comment, CommentLike
+
+
+def reconcile_likes_counts(session: Session, batch_size: int = 10_000) -> int:
+    """Fix counters in id-range batches (one short transaction each), returns rows changed."""
+    actual = (
+        select(func.count(CommentLike.id))
+        .where(CommentLike.comment_id == Comment.id)
+        .scalar_subquery()
+    )
+    max_id = session.exec(select(func.max(Comment.id))).one() or 0
+    fixed = 0
+    for start in range(0, max_id, batch_size):
+        result = session.exec(
+            update(Comment)
+            .where(Comment.id > start, Comment.id <= start + batch_size)
+            .where(Comment.likes_count != actual)
+            .values(likes_count=actual)
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+        fixed += result.rowcount
+    return fixed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    # comments may be spread over several databases (app.core.sharding)
+    for name, bind in shard_sync_engines().items():
+        with bind.begin() as conn:
+            upgrade_schema(conn)
+        with Session(bind) as session:
+            fixed = reconcile_likes_counts(session, args.batch_size)
+        print(f"{name}: reconciled {fixed} comment like counters")
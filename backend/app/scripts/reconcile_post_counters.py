@@ -0,0 +1,62 @@
+# app/scripts/reconcile_post_counters.py
+"""Recompute Post.comments_count and Post.last_activity_at from Comment.
+
+    python -m app.scripts.reconcile_post_counters [--batch-size 10000]
+
+Brings the schema up to date first (app.core.schema_upgrade) when running
+against a database created before the counters existed.
+"""
+import argparse
+
+from sqlalchemy import func, or_, update # type:ignore
+from sqlmodel import Session, select # type:ignore
+
+from ..core.schema_upgrade import upgrade_schema
+from ..core.sharding import shard_router
+from ..db import engine
+from ..models import Comment, Post
+
+
+def reconcile_post_counters(session: Session, batch_size: int = 10_000) -> int:
+    """Fix counters in id-range batches (one short transaction each), returns rows changed."""
+    actual_count = (
+        select(func.count(Comment.id))
+        .where(Comment.post_id == Post.id, Comment.deleted.is_(False))
+        .scalar_subquery()
+    )
+    actual_activity = func.coalesce(
+        select(func.max(Comment.created_at)).where(Comment.post_id == Post.id).scalar_subquery(),
+        Post.created_at,
+    )
+    max_id = session.exec(select(func.max(Post.id))).one() or 0
+    fixed = 0
+    for start in range(0, max_id, batch_size):
+        result = session.exec(
+            update(Post)
+            .where(Post.id > start, Post.id <= start + batch_size)
+            .where(or_(
+                Post.comments_count != actual_count,
+                Post.last_activity_at.is_(None),
+                Post.last_activity_at < actual_activity,
+            ))
+            .values(comments_count=actual_count, last_activity_at=actual_activity)
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+        fixed += result.rowcount
+    return fixed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+    if shard_router.enabled:
+        # reads comments and writes the main database in one pass
+        parser.exit(1, "not supported while comments are sharded (DB_SHARD_URLS)\n")
+
+    with engine.begin() as conn:
+        upgrade_schema(conn)
+    with Session(engine) as session:
+        fixed = reconcile_post_counters(session, args.batch_size)
+    print(f"reconciled {fixed} post counters")
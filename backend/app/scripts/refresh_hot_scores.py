@@ -0,0 +1,54 @@
+# app/scripts/refresh_hot_scores.py
+"""Recompute Comment.hot_score from likes_count and created_at.
+
+    python -m app.scripts.refresh_hot_scores [--batch-size 5000]
+
+Scores never decay in place (see app.utils.ranking), so this is only
+needed once for databases created before the column existed, or after
+changing HOT_DECAY_SECONDS. Brings the schema up to date first
+(app.core.schema_upgrade), adding the column and the sort indexes.
+"""
+import argparse
+
+from sqlalchemy import update # type:ignore
+from sqlmodel import Session, select # type:ignore
+
+from ..core.schema_upgrade import upgrade_schema
+from ..core.sharding import shard_sync_engines
+from ..models import Comment
+from ..utils.ranking import hot_score
+
+
+def refresh_hot_scores(session: Session, batch_size: int = 5000) -> int:
+    """Rescore in id order (one short transaction per batch), returns rows rescored."""
+    last_id, rescored = 0, 0
+    while True:
+        rows = session.exec(
+            select(Comment.id, Comment.likes_count, Comment.created_at)
+            .where(Comment.id > last_id)
+            .order_by(Comment.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return rescored
+        session.exec(update(Comment), params=[
+            {"id": comment_id, "hot_score": hot_score(likes_count, created_at)}
+            for comment_id, likes_count, created_at in rows
+        ])
+        session.commit()
+        last_id = rows[-1][0]
+        rescored += len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    # comments may be spread over several databases (app.core.sharding)
+    for name, bind in shard_sync_engines().items():
+        with bind.begin() as conn:
+            upgrade_schema(conn)
+        with Session(bind) as session:
+            rescored = refresh_hot_scores(session, args.batch_size)
+        print(f"{name}: rescored {rescored} comments")
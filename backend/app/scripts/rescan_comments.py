@@ -0,0 +1,64 @@
+# app/scripts/rescan_comments.py
+"""Re-flag existing comments against the current moderation list.
+
+    python -m app.scripts.rescan_comments [--terms terms.txt] [--batch-size 5000]
+
+New and edited comments are checked on write (app.core.moderation); this
+applies a changed list to what is already stored. Comments matching any
+term, whatever its action, are flagged for review, and no longer matching
+ones are unflagged; stored text is never rewritten. Brings the schema up
+to date first (app.core.schema_upgrade), which adds Comment.flagged.
+"""
+import argparse
+
+from sqlalchemy import update # type:ignore
+from sqlmodel import Session, select # type:ignore
+
+from ..core.moderation import MODERATION_TERMS_FILE, TermMatcher, parse_terms
+from ..core.schema_upgrade import upgrade_schema
+from ..core.sharding import shard_sync_engines
+from ..models import Comment
+
+
+def rescan_comments(session: Session, matcher: TermMatcher, batch_size: int = 5000) -> int:
+    """Update Comment.flagged in id order (one short transaction per batch), returns comments flagged."""
+    last_id, flagged = 0, 0
+    while True:
+        rows = session.exec(
+            select(Comment.id, Comment.content, Comment.flagged)
+            .where(Comment.id > last_id, Comment.deleted.is_(False))
+            .order_by(Comment.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return flagged
+        changes = []
+        for comment_id, content, was_flagged in rows:
+            matched = next(matcher.finditer(content), None) is not None
+            flagged += matched
+            if matched != was_flagged:
+                changes.append({"id": comment_id, "flagged": matched})
+        if changes:
+            session.exec(update(Comment), params=changes)
+        session.commit()
+        last_id = rows[-1][0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terms", default=MODERATION_TERMS_FILE, help="defaults to MODERATION_TERMS_FILE")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    if not args.terms:
+        parser.exit(1, "no term file, pass --terms or set MODERATION_TERMS_FILE\n")
+    with open(args.terms, encoding="utf-8") as f:
+        matcher = TermMatcher(parse_terms(f))
+
+    # comments may be spread over several databases (app.core.sharding)
+    for name, bind in shard_sync_engines().items():
+        with bind.begin() as conn:
+            upgrade_schema(conn)
+        with Session(bind) as session:
+            flagged = rescan_comments(session, matcher, args.batch_size)
+        print(f"{name}: {flagged} comments flagged")
@@ -0,0 +1,36 @@
+# app/utils/comment_path.py
+"""Materialized paths for the comment hierarchy.
+
+Comment.path is the chain of ancestor ids down to the comment itself,
+each zero-padded to PATH_SEGMENT_WIDTH and joined with "/". The padding
+makes string order equal to depth-first order (siblings by id), and a
+node plus its whole subtree is exactly the range [path, path + "0"),
+because "/" sorts just below "0". Subtree reads, descendant counts and
+depth-limited reads are therefore one range scan on (post_id, path).
+"""
+from typing import List, Optional, Tuple
+
+PATH_SEGMENT_WIDTH = 10
+PATH_SEPARATOR = "/"
+
+def child_path(parent_path: Optional[str], comment_id: int) -> str:
+    segment = f"{comment_id:0{PATH_SEGMENT_WIDTH}d}"
+    return f"{parent_path}{PATH_SEPARATOR}{segment}" if parent_path else segment
+
+def path_depth(path: str) -> int:
+    return path.count(PATH_SEPARATOR)
+
+def subtree_range(path: str) -> Tuple[str, str]:
+    """Bounds (inclusive, exclusive) covering the node and all its descendants."""
+    return path, path + "0"
+
+def descendants_range(path: str) -> Tuple[str, str]:
+    """Bounds (inclusive, exclusive) covering the descendants only."""
+    return path + PATH_SEPARATOR, path + "0"
+
+def path_ids(path: str) -> List[int]:
+    return [int(segment) for segment in path.split(PATH_SEPARATOR)]
+
+def readable_path(path: str) -> str:
+    # "0000000003/0000000012" -> "3/12"
+    return PATH_SEPARATOR.join(str(i) for i in path_ids(path))
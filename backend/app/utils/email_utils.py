@@ -1,24 +1,42 @@
 #app/utils/email_utils
+import json
 import random
+import uuid
 from fastapi_mail import FastMail, MessageSchema, MessageType
 from app.core.config import conf
+from app.core.redis_client import redis_client
+
+# Redis keys of the mail outbox, drained by app/workers/email_worker.py
+MAIL_OUTBOX = "mail:outbox"          # list, LPUSH by producers, popped from the right
+MAIL_PROCESSING = "mail:processing"  # list, messages a worker has claimed
+MAIL_RETRY = "mail:retry"            # sorted set, score = unix time of next attempt
+MAIL_DEAD = "mail:dead"              # list, messages that exhausted their retries
 
 
 def generate_otp()->str:
     return str(random.randint(100000,999999))
 
-async def send_otp_mail(to_email:str,otp:str):
+def build_otp_mail(to_email: str, otp: str) -> dict:
     subject = "Your OTP Verification Code"
     body = (
         f"Your OTP code is {otp}.\n\n"
         "It will expire in 10 minutes.\n\n"
         "If you did not request this, please ignore this email."
     )
+    return {"id": uuid.uuid4().hex, "to": to_email, "subject": subject, "body": body, "attempts": 0}
+
+async def enqueue_otp_mail(to_email: str, otp: str) -> None:
+    # durable hand-off, the request never waits on SMTP
+    await redis_client.lpush(MAIL_OUTBOX, json.dumps(build_otp_mail(to_email, otp)))
+
+async def send_otp_mail(to_email:str,otp:str):
+    # direct send over a fresh connection, request handlers use enqueue_otp_mail
+    mail = build_otp_mail(to_email, otp)
     message = MessageSchema(
-        subject=subject,
+        subject=mail["subject"],
         recipients=[to_email],
-        body=body,
+        body=mail["body"],
         subtype=MessageType.plain  # plain text only
     )
     fm = FastMail(conf)
-    await fm.send_message(message)
\ No newline at end of file
+    await fm.send_message(message)
@@ -0,0 +1,27 @@
+# app/utils/http_cache.py
+"""Conditional GET helpers: strong ETags and If-None-Match handling."""
+from typing import Optional
+
+from fastapi import Request, Response # type:ignore
+
+def make_etag(*parts) -> str:
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+def matches_any(request: Request) -> bool:
+    # "If-None-Match: *" matches any current representation, callers must check one exists
+    return (request.headers.get("if-none-match") or "").strip() == "*"
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    if etag is None:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if matches_any(request):
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+def not_modified(etag: str, headers: Optional[dict] = None) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, **(headers or {})})
@@ -0,0 +1,40 @@
+#app/utils/pagination
+import base64
+import json
+import math
+from datetime import datetime
+from typing import Tuple, Union
+
+from fastapi import HTTPException # type:ignore
+
+
+def encode_cursor(created_at: datetime, item_id: int) -> str:
+    # opaque keyset cursor over (created_at, id)
+    raw = f"{created_at.isoformat()}|{item_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, item_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+def encode_value_cursor(value: Union[int, float], item_id: int) -> str:
+    # opaque keyset cursor over (numeric sort value, id)
+    raw = json.dumps([value, item_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_value_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        # bound straight into SQL comparisons, so only plain finite numbers
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(value)
+        if isinstance(item_id, bool):
+            raise ValueError(item_id)
+        return value, int(item_id)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="invalid cursor")
@@ -0,0 +1,24 @@
+# app/utils/ranking.py
+"""Precomputed comment ranking for sort=hot.
+
+hot_score = log10(1 + likes) + age_offset / HOT_DECAY_SECONDS
+
+The time term grows with creation time instead of shrinking with age, so
+newer comments outrank older ones unless the older ones have ~10x the
+likes per HOT_DECAY_SECONDS of age difference. Because the
+decay is relative, a stored score never goes stale: it only changes when
+the comment's likes change, and no periodic rescoring job is needed.
+"""
+import math
+import os
+from datetime import datetime, timezone
+
+HOT_DECAY_SECONDS = float(os.getenv("HOT_DECAY_SECONDS", 45000))
+_HOT_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+def hot_score(likes_count: int, created_at: datetime) -> float:
+    if created_at.tzinfo is None:
+        # SQLite hands back naive UTC timestamps
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    age_offset = (created_at - _HOT_EPOCH).total_seconds()
+    return round(math.log10(1 + max(likes_count, 0)) + age_offset / HOT_DECAY_SECONDS, 7)
@@ -0,0 +1,200 @@
+# app/workers/email_worker.py
+"""Drains the Redis mail outbox over one reused SMTP connection.
+
+    python -m app.workers.email_worker
+
+Messages are claimed by moving them from MAIL_OUTBOX to MAIL_PROCESSING,
+so a crashed worker loses nothing: whatever is left in MAIL_PROCESSING is
+requeued on start. Transient failures are retried with exponential backoff
+through MAIL_RETRY; permanent (5xx) rejections and messages out of retries
+go to MAIL_DEAD.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from email.message import EmailMessage
+from typing import List, Optional
+
+import aiosmtplib # type:ignore
+
+from app.core.redis_client import redis_client
+from app.utils.email_utils import MAIL_OUTBOX, MAIL_PROCESSING, MAIL_RETRY, MAIL_DEAD
+
+logger = logging.getLogger(__name__)
+
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", 50))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", 5))
+MAIL_RETRY_BASE_SECONDS = float(os.getenv("MAIL_RETRY_BASE_SECONDS", 5))
+MAIL_RETRY_MAX_SECONDS = float(os.getenv("MAIL_RETRY_MAX_SECONDS", 600))
+MAIL_POLL_SECONDS = float(os.getenv("MAIL_POLL_SECONDS", 1))
+
+
+class EmailWorker:
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        sender: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = False,
+        start_tls: bool = False,
+        validate_certs: bool = True,
+        redis=None,
+        batch_size: int = MAIL_BATCH_SIZE,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.validate_certs = validate_certs
+        self.redis = redis or redis_client
+        self.batch_size = batch_size
+        self._smtp: Optional[aiosmtplib.SMTP] = None
+        self._stopping = False
+
+    @classmethod
+    def from_config(cls) -> "EmailWorker":
+        from app.core.config import conf
+        return cls(
+            hostname=conf.MAIL_SERVER,
+            port=conf.MAIL_PORT,
+            sender=str(conf.MAIL_FROM),
+            username=conf.MAIL_USERNAME if conf.USE_CREDENTIALS else None,
+            password=conf.MAIL_PASSWORD.get_secret_value() if conf.USE_CREDENTIALS else None,
+            use_tls=conf.MAIL_SSL_TLS,
+            start_tls=conf.MAIL_STARTTLS,
+            validate_certs=conf.VALIDATE_CERTS,
+        )
+
+    async def _connection(self) -> aiosmtplib.SMTP:
+        if self._smtp is not None and self._smtp.is_connected:
+            return self._smtp
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls,
+            validate_certs=self.validate_certs,
+        )
+        await smtp.connect()
+        if self.username:
+            await smtp.login(self.username, self.password)
+        self._smtp = smtp
+        return smtp
+
+    async def close(self) -> None:
+        if self._smtp is not None and self._smtp.is_connected:
+            try:
+                await self._smtp.quit()
+            except aiosmtplib.SMTPException:
+                self._smtp.close()
+        self._smtp = None
+
+    def _build_message(self, mail: dict) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = mail["to"]
+        message["Subject"] = mail["subject"]
+        message.set_content(mail["body"])
+        return message
+
+    async def requeue_in_flight(self) -> int:
+        # messages claimed by a worker that died mid-batch
+        moved = 0
+        while await self.redis.lmove(MAIL_PROCESSING, MAIL_OUTBOX, "RIGHT", "RIGHT"):
+            moved += 1
+        return moved
+
+    async def promote_due_retries(self) -> int:
+        due = await self.redis.zrangebyscore(MAIL_RETRY, 0, time.time(), start=0, num=self.batch_size)
+        for raw in due:
+            # only the worker that removes it from the set requeues it
+            if await self.redis.zrem(MAIL_RETRY, raw):
+                await self.redis.lpush(MAIL_OUTBOX, raw)
+        return len(due)
+
+    async def fetch_batch(self, block: bool = True) -> List[str]:
+        batch: List[str] = []
+        if block:
+            first = await self.redis.blmove(MAIL_OUTBOX, MAIL_PROCESSING, MAIL_POLL_SECONDS, "RIGHT", "LEFT")
+            if first is None:
+                return batch
+            batch.append(first)
+        while len(batch) < self.batch_size:
+            raw = await self.redis.lmove(MAIL_OUTBOX, MAIL_PROCESSING, "RIGHT", "LEFT")
+            if raw is None:
+                break
+            batch.append(raw)
+        return batch
+
+    async def _send(self, mail: dict) -> None:
+        message = self._build_message(mail)
+        try:
+            await (await self._connection()).send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # the kept-alive connection was dropped by the server, reconnect once
+            self._smtp = None
+            await (await self._connection()).send_message(message)
+
+    async def _fail(self, raw: str, mail: dict, exc: Exception) -> None:
+        mail["attempts"] = mail.get("attempts", 0) + 1
+        permanent = isinstance(exc, aiosmtplib.SMTPResponseException) and exc.code >= 500
+        if isinstance(exc, aiosmtplib.SMTPRecipientsRefused):
+            permanent = all(r.code >= 500 for r in exc.recipients)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(MAIL_PROCESSING, 1, raw)
+            if permanent or mail["attempts"] >= MAIL_MAX_ATTEMPTS:
+                mail["error"] = str(exc)
+                pipe.lpush(MAIL_DEAD, json.dumps(mail))
+            else:
+                delay = min(MAIL_RETRY_BASE_SECONDS * 2 ** (mail["attempts"] - 1), MAIL_RETRY_MAX_SECONDS)
+                pipe.zadd(MAIL_RETRY, {json.dumps(mail): time.time() + delay})
+            await pipe.execute()
+        logger.warning("mail %s to %s failed (attempt %s): %s", mail.get("id"), mail["to"], mail["attempts"], exc)
+
+    async def deliver(self, batch: List[str]) -> int:
+        sent = 0
+        for raw in batch:
+            mail = json.loads(raw)
+            try:
+                await self._send(mail)
+            except (aiosmtplib.SMTPException, OSError) as exc:
+                if not isinstance(exc, aiosmtplib.SMTPResponseException):
+                    await self.close()
+                await self._fail(raw, mail, exc)
+                continue
+            await self.redis.lrem(MAIL_PROCESSING, 1, raw)
+            sent += 1
+        return sent
+
+    async def run_once(self, block: bool = False) -> int:
+        await self.promote_due_retries()
+        batch = await self.fetch_batch(block=block)
+        if not batch:
+            return 0
+        return await self.deliver(batch)
+
+    async def run_forever(self) -> None:
+        # a single worker per outbox; requeueing would steal a live peer's batch
+        requeued = await self.requeue_in_flight()
+        if requeued:
+            logger.info("requeued %s in-flight mails", requeued)
+        try:
+            while not self._stopping:
+                await self.run_once(block=True)
+        finally:
+            await self.close()
+
+    def stop(self) -> None:
+        self._stopping = True
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(EmailWorker.from_config().run_forever())
@@ -0,0 +1,61 @@
+# benchmarks/compare.py
+"""Per-scenario deltas between two load.py result files.
+
+    python benchmarks/compare.py before.json after.json [--threshold 10]
+
+Exits with status 1 when any latency or queries_per_request figure got
+worse, or throughput dropped, by more than --threshold percent.
+"""
+import argparse
+import json
+import sys
+
+# metric -> True when higher is better
+METRICS = {
+    "throughput_rps": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "queries_per_request": False,
+    "errors": False,
+}
+
+def change(before: float, after: float) -> float:
+    if before == 0:
+        return 0.0 if after == 0 else float("inf")
+    return (after - before) / before * 100
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent")
+    args = parser.parse_args()
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"{before['meta']['commit']} -> {after['meta']['commit']}")
+    if before["meta"]["data"] != after["meta"]["data"]:
+        print("warning: the runs used different data sets")
+    regressions = 0
+    for scenario, old in before["scenarios"].items():
+        new = after["scenarios"].get(scenario)
+        if new is None:
+            continue
+        print(f"\n{scenario}")
+        for metric, higher_is_better in METRICS.items():
+            delta = change(old[metric], new[metric])
+            worse = -delta if higher_is_better else delta
+            flag = ""
+            if worse > args.threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"  {metric:<20} {old[metric]:>10} -> {new[metric]:>10}  {delta:+7.1f}%{flag}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# benchmarks/datagen.py
+"""Synthetic users, posts, comment trees and likes for the load suite.
+
+    python benchmarks/datagen.py --users 500 --posts 200 --comments-per-post 300
+
+Writes straight to DB_URL with bulk INSERTs. Every derived column is filled
+in as the API would have left it: materialized path/depth, likes_count,
+hot_score, and the post counters. Output is deterministic for a given
+--seed. Post popularity and like counts both follow a power law
+(--like-skew), so a few threads and comments are hot and most are quiet,
+as in production.
+"""
+import argparse
+import os
+import random
+import sys
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert # type:ignore
+from sqlalchemy.engine import Engine # type:ignore
+from sqlmodel import Session, SQLModel # type:ignore
+
+from app.core import search # noqa: F401  (registers the search_index DDL with create_all)
+from app.core.passwords import get_password_hash
+from app.models import Comment, CommentLike, Post, User
+from app.utils.comment_path import child_path, path_depth
+from app.utils.ranking import hot_score
+
+PASSWORD = "benchmark-password"
+
+
+@dataclass
+class DataConfig:
+    users: int = 500
+    posts: int = 200
+    comments_per_post: int = 300
+    fanout: int = 4
+    max_depth: int = 6
+    # Pareto shape: lower is more skewed (a few comments collect most likes)
+    like_skew: float = 1.2
+    seed: int = 42
+
+def username(i: int) -> str:
+    return f"bench{i}"
+
+def _like_count(rng: random.Random, cfg: DataConfig) -> int:
+    return min(cfg.users, int(rng.paretovariate(cfg.like_skew)) - 1)
+
+def _thread_size(rng: random.Random, cfg: DataConfig) -> int:
+    # popular threads are much larger than the median one
+    return max(1, min(cfg.comments_per_post * 10, int(cfg.comments_per_post * rng.paretovariate(2.0) / 2)))
+
+def generate(bind: Engine, cfg: DataConfig, batch_size: int = 5000) -> dict:
+    """Fill an empty database, returns row counts."""
+    rng = random.Random(cfg.seed)
+    SQLModel.metadata.create_all(bind)
+    # one hash for everyone: bcrypt per user would dominate generation time
+    password_hash = get_password_hash(PASSWORD)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    clock = start
+
+    users = [
+        {"id": i, "username": username(i), "email": f"{username(i)}@example.com",
+         "password_hash": password_hash, "is_verified": True, "created_at": start}
+        for i in range(1, cfg.users + 1)
+    ]
+    posts: List[dict] = []
+    comments: List[dict] = []
+    likes: List[dict] = []
+    comment_id = 0
+    for post_id in range(1, cfg.posts + 1):
+        clock += timedelta(seconds=rng.randint(1, 600))
+        post = {"id": post_id, "author_id": rng.randint(1, cfg.users), "title": f"Post {post_id}",
+                "content": f"Synthetic post {post_id}", "created_at": clock, "comments_count": 0,
+                "last_activity_at": clock}
+        posts.append(post)
+
+        # breadth-first growth: each node gets up to 2 * fanout replies until the thread is full
+        size = _thread_size(rng, cfg)
+        frontier = deque([None])
+        while frontier and post["comments_count"] < size:
+            parent = frontier.popleft()
+            replies = cfg.fanout * 3 if parent is None else rng.randint(0, cfg.fanout * 2)
+            for _ in range(replies):
+                if post["comments_count"] >= size:
+                    break
+                comment_id += 1
+                clock += timedelta(seconds=rng.randint(1, 30))
+                path = child_path(parent["path"] if parent else None, comment_id)
+                count = _like_count(rng, cfg)
+                comment = {
+                    "id": comment_id, "post_id": post_id, "user_id": rng.randint(1, cfg.users),
+                    "parent_id": parent["id"] if parent else None,
+                    "content": f"Comment {comment_id} " + "lorem ipsum " * rng.randint(1, 20),
+                    "deleted": rng.random() < 0.01, "likes_count": count,
+                    "hot_score": hot_score(count, clock), "path": path, "depth": path_depth(path),
+                    "created_at": clock,
+                }
+                comments.append(comment)
+                likes += [{"comment_id": comment_id, "user_id": u, "created_at": clock}
+                          for u in rng.sample(range(1, cfg.users + 1), count)]
+                post["comments_count"] += 1
+                post["last_activity_at"] = clock
+                if comment["depth"] + 1 < cfg.max_depth:
+                    frontier.append(comment)
+
+    with Session(bind) as session:
+        for model, rows in ((User, users), (Post, posts), (Comment, comments), (CommentLike, likes)):
+            for i in range(0, len(rows), batch_size):
+                session.exec(insert(model), params=rows[i:i + batch_size])
+            session.commit()
+    return {"users": len(users), "posts": len(posts), "comments": len(comments), "likes": len(likes)}
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = DataConfig()
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--posts", type=int, default=defaults.posts)
+    parser.add_argument("--comments-per-post", type=int, default=defaults.comments_per_post,
+                        help="median thread size is about half of this, popular ones much larger")
+    parser.add_argument("--fanout", type=int, default=defaults.fanout)
+    parser.add_argument("--max-depth", type=int, default=defaults.max_depth)
+    parser.add_argument("--like-skew", type=float, default=defaults.like_skew)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+def config_from_args(args: argparse.Namespace) -> DataConfig:
+    return DataConfig(
+        users=args.users, posts=args.posts, comments_per_post=args.comments_per_post,
+        fanout=args.fanout, max_depth=args.max_depth, like_skew=args.like_skew, seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    from app.db import engine
+    print(generate(engine, config_from_args(args)))
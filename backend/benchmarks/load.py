@@ -0,0 +1,242 @@
+# benchmarks/load.py
+"""Load test of the API hot paths against the in-process ASGI app.
+
+    python benchmarks/load.py --out results.json [--requests 500 --concurrency 20]
+    python benchmarks/compare.py before.json after.json
+
+Builds a fresh SQLite database with datagen.py in a temporary directory,
+replaces the Redis client with an in-memory fakeredis server (pass
+--redis-url to use a real one), and drives the app through
+httpx.ASGITransport, so no network or server process is involved.
+Scenarios run one after another, each with its own warm-up. For each one
+the suite records p50/p95/p99 latency, throughput, the error count and
+SQL statements per request, counted on the engine. The JSON output also
+records the commit and configuration, so runs can be compared across
+commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from typing import Awaitable, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datagen
+
+SCENARIOS = ["thread_read", "feed", "comment_create", "like_toggle", "login"]
+
+
+def configure_environment(db_path: str, redis_url: str) -> None:
+    # read by app modules at import time, so set before importing them
+    os.environ["DB_URL"] = f"sqlite:///{db_path}"
+    for name, value in {
+        "MAIL_USERNAME": "bench", "MAIL_PASSWORD": "bench", "MAIL_FROM": "bench@example.com",
+        "MAIL_SERVER": "localhost",
+        # measure the endpoints, not the DoS limits
+        "POST_RATE_LIMIT_USER": "1000000/minute", "POST_RATE_LIMIT_IP": "1000000/minute",
+        "LIKE_RATE_LIMIT_USER": "1000000/minute", "LIKE_RATE_LIMIT_IP": "1000000/minute",
+    }.items():
+        os.environ.setdefault(name, value)
+    if redis_url:
+        os.environ["REDIS_URL"] = redis_url
+        return
+    import fakeredis # type:ignore
+    import app.core.redis_client as redis_module
+    redis_module.redis_client = fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+
+def percentile(sorted_ms: List[float], pct: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    index = min(len(sorted_ms) - 1, max(0, round(pct / 100 * len(sorted_ms)) - 1))
+    return sorted_ms[index]
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            # the commit of this checkout, wherever the script is run from
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        from sqlalchemy import event # type:ignore
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+class LoadRun:
+    def __init__(self, client, cfg: datagen.DataConfig, post_weights: List[float], comment_ids: Dict[int, List[int]], seed: int):
+        self.client = client
+        self.cfg = cfg
+        self.rng = random.Random(seed)
+        self.post_ids = list(range(1, cfg.posts + 1))
+        self.post_weights = post_weights
+        self.comment_ids = comment_ids
+        self.tokens: Dict[int, str] = {}
+
+    def pick_post(self) -> int:
+        # traffic follows thread size: hot threads get most reads and writes
+        return self.rng.choices(self.post_ids, weights=self.post_weights)[0]
+
+    def pick_user(self) -> int:
+        return self.rng.randint(1, self.cfg.users)
+
+    async def log_in(self, count: int) -> None:
+        # outside the measurements: bcrypt would dominate every write scenario
+        for user_id in self.rng.sample(range(1, self.cfg.users + 1), min(count, self.cfg.users)):
+            response = await self.login_as(user_id)
+            self.tokens[user_id] = response.json()["access_token"]
+
+    async def login_as(self, user_id: int):
+        return await self.client.post(
+            "/auth/login", json={"username": datagen.username(user_id), "password": datagen.PASSWORD},
+        )
+
+    def auth(self) -> dict:
+        token = self.tokens[self.rng.choice(list(self.tokens))]
+        return {"Authorization": f"Bearer {token}"}
+
+    async def thread_read(self):
+        return await self.client.get(f"/posts/{self.pick_post()}/comments")
+
+    async def feed(self):
+        response = await self.client.get("/posts/feed", params={"limit": 20})
+        cursor = response.json().get("next_cursor")
+        if cursor:
+            response = await self.client.get("/posts/feed", params={"limit": 20, "cursor": cursor})
+        return response
+
+    async def comment_create(self):
+        post_id = self.pick_post()
+        siblings = self.comment_ids.get(post_id) or [None]
+        payload = {"content": "benchmark reply " * 5, "parent_id": self.rng.choice(siblings + [None])}
+        return await self.client.post(f"/posts/{post_id}/comments", json=payload, headers=self.auth())
+
+    async def like_toggle(self):
+        post_id = self.pick_post()
+        if not self.comment_ids.get(post_id):
+            post_id = max(self.comment_ids, key=lambda p: len(self.comment_ids[p]))
+        comment_id = self.rng.choice(self.comment_ids[post_id])
+        return await self.client.post(f"/comments/{comment_id}/like", headers=self.auth())
+
+    async def login(self):
+        return await self.login_as(self.pick_user())
+
+
+async def measure(call: Callable[[], Awaitable], requests: int, concurrency: int, counter: QueryCounter) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await call()
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    queries_before = counter.count
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "queries_per_request": round((counter.count - queries_before) / len(latencies), 2),
+    }
+
+async def run(args, cfg: datagen.DataConfig) -> dict:
+    import httpx # type:ignore
+    from sqlmodel import Session, select # type:ignore
+    from app import db
+    from app.main import app
+    from app.models import Comment
+
+    counts = datagen.generate(db.engine, cfg)
+    await db.init_db()
+    with Session(db.engine) as session:
+        comment_ids: Dict[int, List[int]] = {}
+        for comment_id, post_id in session.exec(select(Comment.id, Comment.post_id)).all():
+            comment_ids.setdefault(post_id, []).append(comment_id)
+    post_weights = [len(comment_ids.get(p, ())) + 1 for p in range(1, cfg.posts + 1)]
+
+    counter = QueryCounter(db.async_engine)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        load = LoadRun(client, cfg, post_weights, comment_ids, cfg.seed)
+        await load.log_in(args.sessions)
+        for name in args.scenarios:
+            call = getattr(load, name)
+            requests = args.login_requests if name == "login" else args.requests
+            await measure(call, max(1, requests // 10), args.concurrency, counter)  # warm-up
+            results[name] = await measure(call, requests, args.concurrency, counter)
+            print(f"{name:<16} " + "  ".join(f"{k}={v}" for k, v in results[name].items()))
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "redis": args.redis_url or "fakeredis",
+            "concurrency": args.concurrency,
+            "sessions": args.sessions,
+            "data": {**asdict(cfg), **counts},
+        },
+        "scenarios": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    datagen.add_arguments(parser)
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=50, help="login is bcrypt bound, keep it short")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=20, help="users logged in up front for the write scenarios")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--redis-url", help="use a real Redis instead of fakeredis (it gets FLUSHDB'd)")
+    parser.add_argument("--out", default="benchmark-results.json")
+    args = parser.parse_args()
+    cfg = datagen.config_from_args(args)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(os.path.join(workdir, "bench.db"), args.redis_url)
+        if args.redis_url:
+            from app.core.redis_client import redis_client
+            asyncio.run(redis_client.flushdb())
+        report = asyncio.run(run(args, cfg))
+
+    with open(args.out, "w") as out:
+        json.dump(report, out, indent=2)
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/serialize_threads.py
+"""Thread rendering: dict nodes + pydantic vs ThreadNode + orjson.
+
+    python benchmarks/serialize_threads.py [--nodes 20000] [--repeat 5]
+
+Each strategy starts from the same row tuples that _build_comment_tree
+fetches, builds the tree and encodes it, so node construction counts too.
+
+- fastapi: dict nodes, validated against List[CommentOut], then
+  jsonable_encoder + json.dumps (FastAPI's default response path)
+- pydantic: dict nodes, TypeAdapter validate_python + dump_json (the
+  previous get_comments path)
+- fast: ThreadNode + orjson (current get_comments path)
+
+Prints the median time per strategy for several tree shapes and checks
+that every strategy produces identical JSON.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder # type:ignore
+from pydantic import TypeAdapter # type:ignore
+
+from app.schemas import CommentOut
+from app.utils import fast_json
+from app.utils.fast_json import ThreadNode
+
+_adapter = TypeAdapter(List[CommentOut])
+
+
+def make_rows(parents: List[int]) -> List[tuple]:
+    """(id, user_id, username, parent_id, content, likes_count, deleted, created_at) per comment."""
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i, parent in enumerate(parents, start=1):
+        rows.append((
+            i, i % 50, f"user{i % 50}", parent, f"comment number {i} " * 4,
+            i % 17, i % 41 == 0, start + timedelta(seconds=i),
+        ))
+    return rows
+
+def shapes(n: int) -> Dict[str, List[int]]:
+    rng = random.Random(1)
+    return {
+        "flat": [None] * n,
+        "chains of 100": [None if i % 100 == 1 else i - 1 for i in range(1, n + 1)],
+        "balanced (4-ary)": [None if i == 1 else (i - 2) // 4 + 1 for i in range(1, n + 1)],
+        "random": [None if i == 1 or rng.random() < 0.05 else rng.randint(1, i - 1) for i in range(1, n + 1)],
+    }
+
+def _link(nodes: Dict[int, object], parents: List[int], children_of) -> list:
+    roots = []
+    for node_id, parent in zip(nodes, parents):
+        if parent is None:
+            roots.append(nodes[node_id])
+        else:
+            children_of(nodes[parent]).append(nodes[node_id])
+    return roots
+
+def dict_tree(rows: List[tuple], parents: List[int]) -> list:
+    nodes = {
+        r[0]: {
+            "id": r[0], "user_id": r[1], "username": r[2], "parent_id": r[3],
+            "content": "[deleted]" if r[6] else r[4], "likes_count": r[5], "deleted": r[6],
+            "created_at": r[7], "children": [], "has_more_children": False,
+            "reply_cursor": None, "liked_by_me": None,
+        }
+        for r in rows
+    }
+    return _link(nodes, parents, lambda n: n["children"])
+
+def node_tree(rows: List[tuple], parents: List[int]) -> list:
+    nodes = {r[0]: ThreadNode(r[0], r[1], r[2], r[3], "[deleted]" if r[6] else r[4], r[5], r[6], r[7]) for r in rows}
+    return _link(nodes, parents, lambda n: n.children)
+
+def render_fastapi(rows, parents) -> str:
+    models = _adapter.validate_python(dict_tree(rows, parents))
+    return json.dumps(jsonable_encoder(models), separators=(",", ":"), ensure_ascii=False)
+
+def render_pydantic(rows, parents) -> str:
+    return _adapter.dump_json(_adapter.validate_python(dict_tree(rows, parents))).decode()
+
+def render_fast(rows, parents) -> str:
+    return fast_json.dumps(node_tree(rows, parents))
+
+STRATEGIES: Dict[str, Callable] = {"fastapi": render_fastapi, "pydantic": render_pydantic, "fast": render_fast}
+
+def median_ms(fn: Callable, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def main(nodes: int, repeat: int) -> None:
+    # deep chains recurse once per level in the validator and encoder
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10_000))
+    print(f"{nodes} comments, median of {repeat} runs (ms)")
+    print(f"{'shape':<18}" + "".join(f"{name:>12}" for name in STRATEGIES) + f"{'speedup':>10}")
+    for shape, parents in shapes(nodes).items():
+        rows = make_rows(parents)
+        outputs = {json.loads(render(rows, parents)) == json.loads(render_fast(rows, parents)) for render in STRATEGIES.values()}
+        assert outputs == {True}, f"{shape}: strategies disagree"
+        results = {name: median_ms(lambda: render(rows, parents), repeat) for name, render in STRATEGIES.items()}
+        print(
+            f"{shape:<18}" + "".join(f"{results[name]:>12.1f}" for name in STRATEGIES)
+            + f"{results['pydantic'] / results['fast']:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.nodes, args.repeat)
@@ -0,0 +1,86 @@
+# benchmarks/ws_idle_connections.py
+"""How many idle /ws/posts/{id} subscribers one worker holds, and at what memory.
+
+Start a single worker first (raise its fd limit too), then point this at it:
+
+    ulimit -n 65536; uvicorn app.main:app --workers 1 --port 8000 &
+    python benchmarks/ws_idle_connections.py --connections 10000 --server-pid $!
+
+Connections are opened in steps; after each step the server's resident
+memory is read from /proc, so the output shows the per-connection cost.
+"""
+import argparse
+import asyncio
+import resource
+import time
+from typing import List, Optional
+
+import websockets # type:ignore
+
+
+def rss_mib(pid: Optional[int]) -> Optional[float]:
+    if pid is None:
+        return None
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+def raise_fd_limit(needed: int) -> None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+async def open_connections(url: str, count: int, posts: int, offset: int, concurrency: int) -> List:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def connect(i: int):
+        async with semaphore:
+            try:
+                return await websockets.connect(f"{url}/ws/posts/{(offset + i) % posts + 1}", ping_interval=None)
+            except (OSError, websockets.exceptions.WebSocketException):
+                return None
+
+    results = await asyncio.gather(*(connect(i) for i in range(count)))
+    return [ws for ws in results if ws is not None]
+
+async def main(args) -> None:
+    raise_fd_limit(args.connections + 100)
+    baseline = rss_mib(args.server_pid)
+    print(f"server rss before: {baseline:.1f} MiB" if baseline else "server rss: pass --server-pid to measure")
+
+    opened: List = []
+    step = max(1, args.connections // args.steps)
+    while len(opened) < args.connections:
+        batch = min(step, args.connections - len(opened))
+        started = time.perf_counter()
+        new = await open_connections(args.url, batch, args.posts, len(opened), args.concurrency)
+        opened += new
+        elapsed = time.perf_counter() - started
+        rss = rss_mib(args.server_pid)
+        line = f"{len(opened):>7} open  +{len(new)}/{batch} in {elapsed:.2f}s"
+        if rss is not None:
+            per_conn = (rss - baseline) * 1024 / len(opened) if opened else 0
+            line += f"  rss {rss:.1f} MiB  ~{per_conn:.1f} KiB/conn"
+        print(line)
+        if len(new) < batch:
+            print("connections started failing, stopping here")
+            break
+
+    await asyncio.sleep(args.hold)
+    alive = sum(1 for ws in opened if ws.state.name == "OPEN")
+    print(f"{alive}/{len(opened)} still open after {args.hold}s idle")
+    await asyncio.gather(*(ws.close() for ws in opened), return_exceptions=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://127.0.0.1:8000")
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--posts", type=int, default=100, help="spread subscribers over this many post ids")
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=200, help="handshakes in flight at once")
+    parser.add_argument("--hold", type=float, default=10, help="seconds to keep the connections idle")
+    parser.add_argument("--server-pid", type=int)
+    asyncio.run(main(parser.parse_args()))
@@ -1,29 +1,61 @@
+import os
 import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import Session, SQLModel, create_engine
-from sqlmodel.pool import StaticPool
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+# app modules read these at import time
+os.environ.setdefault("DB_URL", "sqlite://")
+os.environ.setdefault("MAIL_USERNAME", "test")
+os.environ.setdefault("MAIL_PASSWORD", "test")
+os.environ.setdefault("MAIL_FROM", "test@example.com")
+os.environ.setdefault("MAIL_SERVER", "localhost")
+# hash on the threadpool, test_passwords covers the process pool
+os.environ.setdefault("PASSWORD_POOL_WORKERS", "0")
+
+# swap the shared Redis client for an in-memory fake before routers import it
+import fakeredis
+import app.core.redis_client as redis_module
+redis_server = fakeredis.FakeServer()
+redis_module.redis_client = fakeredis.aioredis.FakeRedis(server=redis_server, decode_responses=True)
 
 from app.main import app
-from app.db import get_session
+from app.db import get_session, get_read_session
+from app.core.user_cache import clear_local_cache
+
+@pytest.fixture(autouse=True)
+def flush_redis():
+    yield
+    fakeredis.FakeRedis(server=redis_server).flushall()
+    clear_local_cache()
 
-# Use in-memory SQLite for tests
+@pytest.fixture(name="db_path")
+def db_path_fixture(tmp_path):
+    # a file database so the sync fixture session and the async app share data
+    return tmp_path / "test.db"
+
+# Sync session for arranging data and asserting on it
 @pytest.fixture(name="session")
-def session_fixture():
-    engine = create_engine(
-        "sqlite://", 
-        connect_args={"check_same_thread": False}, 
-        poolclass=StaticPool
-    )
+def session_fixture(db_path):
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
     SQLModel.metadata.create_all(engine)
     with Session(engine) as session:
         yield session
+    engine.dispose()
 
 @pytest.fixture(name="client")
-def client_fixture(session: Session):
-    def get_session_override():
-        return session
+def client_fixture(session: Session, db_path):
+    # NullPool: TestClient may run each request on a fresh event loop
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+
+    async def get_session_override():
+        async with AsyncSession(async_engine, expire_on_commit=False) as async_session:
+            yield async_session
 
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
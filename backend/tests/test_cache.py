@@ -0,0 +1,133 @@
+import asyncio
+import httpx
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from redis.exceptions import ConnectionError as RedisConnectionError
+import fakeredis
+from app.core import cache
+from conftest import redis_server
+import app.core.redis_client as redis_module
+from app.main import app
+from app.routers import posts_router
+
+from test_comments import create_user, create_post, get_auth_headers, add_comment
+
+def test_thread_served_from_cache_until_write(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    headers = get_auth_headers(client)
+    add_comment(session, post.id, user.id, "first")
+
+    assert len(client.get(f"/posts/{post.id}/comments").json()) == 1
+
+    # a row written behind the API's back is not visible until the version moves
+    add_comment(session, post.id, user.id, "sneaky")
+    assert len(client.get(f"/posts/{post.id}/comments").json()) == 1
+
+    client.post(f"/posts/{post.id}/comments", json={"content": "via api"}, headers=headers)
+    contents = [c["content"] for c in client.get(f"/posts/{post.id}/comments").json()]
+    assert contents == ["first", "sneaky", "via api"]
+
+def test_like_invalidates_cached_thread(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    headers = get_auth_headers(client)
+    comment = add_comment(session, post.id, user.id, "likeable")
+
+    assert client.get(f"/posts/{post.id}/comments").json()[0]["likes_count"] == 0
+    client.post(f"/comments/{comment.id}/like", headers=headers)
+    assert client.get(f"/posts/{post.id}/comments").json()[0]["likes_count"] == 1
+
+class BrokenRedis:
+    async def get(self, *args, **kwargs):
+        raise RedisConnectionError("down")
+
+    set = incr = mget = eval = get
+
+def test_thread_falls_back_without_redis(client: TestClient, session: Session, monkeypatch):
+    monkeypatch.setattr(cache, "redis_client", BrokenRedis())
+    monkeypatch.setattr(redis_module, "_redis_down_until", 0.0)
+    user = create_user(session)
+    post = create_post(session, user.id)
+    headers = get_auth_headers(client)
+    add_comment(session, post.id, user.id, "still served")
+
+    response = client.get(f"/posts/{post.id}/comments")
+    assert response.status_code == 200
+    assert response.json()[0]["content"] == "still served"
+
+    response = client.post(f"/posts/{post.id}/comments", json={"content": "write ok"}, headers=headers)
+    assert response.status_code == 200
+
+def test_conditional_get_on_thread_and_post(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    headers = get_auth_headers(client)
+    comment = add_comment(session, post.id, user.id, "watch me")
+
+    first = client.get(f"/posts/{post.id}/comments")
+    etag = first.headers["etag"]
+    assert client.get(f"/posts/{post.id}/comments", headers={"If-None-Match": etag}).status_code == 304
+    # a viewer's copy carries liked_by_me, so it has its own tag
+    assert client.get(f"/posts/{post.id}/comments", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+    post_etag = client.get(f"/posts/{post.id}").headers["etag"]
+    list_etag = client.get("/posts/").headers["etag"]
+    assert client.get(f"/posts/{post.id}", headers={"If-None-Match": post_etag}).status_code == 304
+    assert client.get("/posts/", headers={"If-None-Match": list_etag}).status_code == 304
+
+    client.post(f"/comments/{comment.id}/like", headers=headers)
+    after_like = client.get(f"/posts/{post.id}/comments", headers={"If-None-Match": etag})
+    assert after_like.status_code == 200 and after_like.headers["etag"] != etag
+    assert client.get(f"/posts/{post.id}", headers={"If-None-Match": post_etag}).status_code == 200
+    assert client.get("/posts/", headers={"If-None-Match": list_etag}).status_code == 200
+
+def test_lost_version_counter_does_not_repeat_etags(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    etag = client.get(f"/posts/{post.id}/comments").headers["etag"]
+    fakeredis.FakeRedis(server=redis_server).flushall()
+    assert client.get(f"/posts/{post.id}/comments").headers["etag"] != etag
+
+def test_version_counters_expire_and_wildcard_needs_a_post(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    redis = fakeredis.FakeRedis(server=redis_server)
+
+    assert client.get(f"/posts/{post.id}", headers={"If-None-Match": "*"}).status_code == 304
+    # reading an id that never existed must not leave a counter behind for good
+    assert client.get("/posts/999999", headers={"If-None-Match": "*"}).status_code == 404
+    assert 0 < redis.ttl(cache.thread_version_key(999999)) <= cache.THREAD_VERSION_TTL
+    client.put(f"/posts/{post.id}", json={"title": "t", "content": "c"}, headers=get_auth_headers(client))
+    assert 0 < redis.ttl(cache.thread_version_key(post.id)) <= cache.THREAD_VERSION_TTL
+
+def test_post_read_does_not_join_a_render_from_before_a_write(client: TestClient, session: Session, monkeypatch):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    headers = get_auth_headers(client)
+    original = posts_router._render_post
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_first_render(session, post_id):
+        payload = await original(session, post_id)
+        if not started.is_set():
+            started.set()
+            await release.wait()
+        return payload
+
+    monkeypatch.setattr(posts_router, "_render_post", slow_first_render)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            in_flight = asyncio.ensure_future(http.get(f"/posts/{post.id}"))
+            await started.wait()
+            await http.put(f"/posts/{post.id}", json={"title": "New title", "content": "new"}, headers=headers)
+            # joining the stalled render would wait for release
+            fresh = await asyncio.wait_for(http.get(f"/posts/{post.id}"), 5)
+            release.set()
+            await in_flight
+            return fresh
+
+    fresh = asyncio.run(run())
+    assert fresh.json()["title"] == "New title"
+    assert client.get(f"/posts/{post.id}", headers={"If-None-Match": fresh.headers["etag"]}).status_code == 304
@@ -1,24 +1,31 @@
+import base64
+import json
 from fastapi.testclient import TestClient
-from sqlmodel import Session
-from app.models import Post, User
+from sqlalchemy import update
+from sqlmodel import Session, select
+from app.models import Post, User, Comment
 from app.auth import get_password_hash
+from app.utils.comment_path import child_path, path_depth
+from app.scripts.backfill_comment_paths import backfill_comment_paths
+from app.scripts.refresh_hot_scores import refresh_hot_scores
+from app.utils.ranking import hot_score
 
 def create_user(session: Session, username: str = "testuser"):
-    user = User(username=username, email=f"{username}@example.com", password_hash=get_password_hash("password"))
+    user = User(username=username, email=f"{username}@example.com", password_hash=get_password_hash("password"), is_verified=True)
     session.add(user)
     session.commit()
     session.refresh(user)
     return user
 
 def create_post(session: Session, user_id: int):
-    post = Post(title="Test Post", content="Test Content", user_id=user_id)
+    post = Post(title="Test Post", content="Test Content", author_id=user_id)
     session.add(post)
     session.commit()
     session.refresh(post)
     return post
 
 def get_auth_headers(client: TestClient, username: str = "testuser", password: str = "password"):
-    response = client.post("/token", data={"username": username, "password": password})
+    response = client.post("/auth/login", json={"username": username, "password": password})
     token = response.json()["access_token"]
     return {"Authorization": f"Bearer {token}"}
 
@@ -77,3 +84,187 @@ def test_delete_comment(client: TestClient, session: Session):
     data = get_resp.json()
     assert data[0]["deleted"] is True
     assert data[0]["content"] == "[deleted]"
+
+def add_comment(session: Session, post_id: int, user_id: int, content: str, parent_id: int = None):
+    # mirrors create_comment, including the materialized path
+    comment = Comment(post_id=post_id, user_id=user_id, parent_id=parent_id, content=content)
+    session.add(comment)
+    session.flush()
+    comment.path = child_path(session.get(Comment, parent_id).path if parent_id else None, comment.id)
+    comment.depth = path_depth(comment.path)
+    comment.hot_score = hot_score(0, comment.created_at)
+    session.commit()
+    session.refresh(comment)
+    return comment
+
+def test_thread_paginates_roots(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    for i in range(5):
+        add_comment(session, post.id, user.id, f"root {i}")
+
+    first = client.get(f"/posts/{post.id}/thread", params={"limit": 2}).json()
+    assert [c["content"] for c in first["items"]] == ["root 0", "root 1"]
+    assert first["next_cursor"]
+
+    seen = [c["content"] for c in first["items"]]
+    cursor = first["next_cursor"]
+    while cursor:
+        page = client.get(f"/posts/{post.id}/thread", params={"limit": 2, "cursor": cursor}).json()
+        seen += [c["content"] for c in page["items"]]
+        cursor = page["next_cursor"]
+    assert seen == [f"root {i}" for i in range(5)]
+
+def test_thread_truncates_depth_and_replies(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    root = add_comment(session, post.id, user.id, "root")
+    replies = [add_comment(session, post.id, user.id, f"reply {i}", root.id) for i in range(3)]
+    deep = add_comment(session, post.id, user.id, "deep", replies[0].id)
+    add_comment(session, post.id, user.id, "deeper", deep.id)
+
+    data = client.get(f"/posts/{post.id}/thread", params={"depth": 2, "replies_limit": 2}).json()
+    node = data["items"][0]
+    assert [c["content"] for c in node["children"]] == ["reply 0", "reply 1"]
+    assert node["has_more_children"] is True
+    deep_node = node["children"][0]["children"][0]
+    assert deep_node["content"] == "deep"
+    assert deep_node["children"] == []
+    assert deep_node["has_more_children"] is True
+    assert node["children"][1]["has_more_children"] is False
+
+    rest = client.get(f"/comments/{root.id}/replies", params={"cursor": node["reply_cursor"]}).json()
+    assert [c["content"] for c in rest["items"]] == ["reply 2"]
+    assert rest["next_cursor"] is None
+
+    subtree = client.get(f"/comments/{deep.id}/replies").json()
+    assert [c["content"] for c in subtree["items"]] == ["deeper"]
+
+def test_thread_rejects_bad_cursor(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    response = client.get(f"/posts/{post.id}/thread", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_export_streams_depth_first_and_resumes(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    a = add_comment(session, post.id, user.id, "a")
+    b = add_comment(session, post.id, user.id, "b")
+    a1 = add_comment(session, post.id, user.id, "a1", parent_id=a.id)
+    a1x = add_comment(session, post.id, user.id, "a1x", parent_id=a1.id)
+    b1 = add_comment(session, post.id, user.id, "b1", parent_id=b.id)
+    a2 = add_comment(session, post.id, user.id, "a2", parent_id=a.id)
+
+    response = client.get(f"/posts/{post.id}/comments/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [l["content"] for l in lines] == ["a", "a1", "a1x", "a2", "b", "b1"]
+    assert [l["depth"] for l in lines] == [0, 1, 2, 1, 0, 1]
+    assert lines[2]["path"] == f"{a.id}/{a1.id}/{a1x.id}"
+
+    resumed = client.get(f"/posts/{post.id}/comments/export", params={"after_id": a1x.id})
+    assert [json.loads(line)["id"] for line in resumed.text.splitlines()] == [a2.id, b.id, b1.id]
+
+    other = create_post(session, user.id)
+    assert client.get(f"/posts/{other.id}/comments/export", params={"after_id": a.id}).status_code == 400
+    assert client.get("/posts/999/comments/export").status_code == 404
+
+def test_create_comment_stores_path(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    headers = get_auth_headers(client)
+    root = client.post(f"/posts/{post.id}/comments", json={"content": "root"}, headers=headers).json()
+    reply = client.post(f"/posts/{post.id}/comments", json={"content": "reply", "parent_id": root["id"]}, headers=headers).json()
+
+    stored = session.get(Comment, reply["id"])
+    assert stored.path == child_path(child_path(None, root["id"]), reply["id"])
+    assert stored.depth == 1
+
+def test_comment_context_for_deep_reply(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    chain = [add_comment(session, post.id, user.id, "level 0")]
+    for level in range(1, 6):
+        chain.append(add_comment(session, post.id, user.id, f"level {level}", parent_id=chain[-1].id))
+    sibling = add_comment(session, post.id, user.id, "sibling", parent_id=chain[2].id)
+    add_comment(session, post.id, user.id, "unrelated")
+
+    response = client.get(f"/comments/{chain[2].id}/context", params={"depth": 2})
+    assert response.status_code == 200
+    data = response.json()
+    assert [a["id"] for a in data["ancestors"]] == [chain[0].id, chain[1].id]
+    assert data["descendants_count"] == 4
+    node = data["comment"]
+    assert [c["id"] for c in node["children"]] == [chain[3].id, sibling.id]
+    grandchild = node["children"][0]["children"][0]
+    assert grandchild["id"] == chain[4].id
+    assert grandchild["children"] == [] and grandchild["has_more_children"] is True
+
+def test_backfill_comment_paths(session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    root = add_comment(session, post.id, user.id, "root")
+    reply = add_comment(session, post.id, user.id, "reply", parent_id=root.id)
+    nested = add_comment(session, post.id, user.id, "nested", parent_id=reply.id)
+    expected = {c.id: (c.path, c.depth) for c in (root, reply, nested)}
+    session.exec(update(Comment).values(path=None, depth=0))
+    session.commit()
+
+    assert backfill_comment_paths(session, batch_size=1) == 3
+    session.expire_all()
+    assert {c.id: (c.path, c.depth) for c in session.exec(select(Comment)).all()} == expected
+    assert backfill_comment_paths(session) == 0
+
+def test_export_refuses_threads_awaiting_backfill(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    root = add_comment(session, post.id, user.id, "root")
+    add_comment(session, post.id, user.id, "reply", parent_id=root.id)
+    session.exec(update(Comment).where(Comment.id == root.id).values(path=None, depth=0))
+    session.commit()
+
+    # a partial export would look complete
+    assert client.get(f"/posts/{post.id}/comments/export").status_code == 503
+    backfill_comment_paths(session)
+    assert len(client.get(f"/posts/{post.id}/comments/export").text.splitlines()) == 2
+
+def test_thread_sort_top_and_hot(client: TestClient, session: Session):
+    users = [create_user(session, f"user{i}") for i in range(3)]
+    post = create_post(session, users[0].id)
+    quiet = add_comment(session, post.id, users[0].id, "quiet")
+    popular = add_comment(session, post.id, users[0].id, "popular")
+    newest = add_comment(session, post.id, users[0].id, "newest")
+    for user in users:
+        client.post(f"/comments/{popular.id}/like", headers=get_auth_headers(client, user.username))
+    client.post(f"/comments/{quiet.id}/like", headers=get_auth_headers(client, users[0].username))
+
+    top = client.get(f"/posts/{post.id}/thread", params={"sort": "top", "limit": 2}).json()
+    assert [c["id"] for c in top["items"]] == [popular.id, quiet.id]
+    rest = client.get(f"/posts/{post.id}/thread", params={"sort": "top", "limit": 2, "cursor": top["next_cursor"]}).json()
+    assert [c["id"] for c in rest["items"]] == [newest.id]
+
+    # created moments apart, so likes dominate the time term
+    hot = client.get(f"/posts/{post.id}/thread", params={"sort": "hot"}).json()
+    assert [c["id"] for c in hot["items"]] == [popular.id, quiet.id, newest.id]
+    session.refresh(popular)
+    assert popular.hot_score == hot_score(3, popular.created_at)
+
+    assert client.get(f"/posts/{post.id}/thread", params={"sort": "top", "cursor": "garbage"}).status_code == 400
+    # well-formed cursors carrying something other than a number
+    for value in ("3", True, None, [1], {"a": 1}):
+        cursor = base64.urlsafe_b64encode(json.dumps([value, 1]).encode()).decode()
+        assert client.get(f"/posts/{post.id}/thread", params={"sort": "top", "cursor": cursor}).status_code == 400
+
+def test_refresh_hot_scores(session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    comment = add_comment(session, post.id, user.id, "liked before scores existed")
+    comment.likes_count, comment.hot_score = 9, 0.0
+    session.add(comment)
+    session.commit()
+
+    assert refresh_hot_scores(session, batch_size=1) == 1
+    session.refresh(comment)
+    assert comment.hot_score == hot_score(9, comment.created_at)
@@ -0,0 +1,53 @@
+from datetime import datetime
+from sqlalchemy import insert, text
+from sqlalchemy.dialects.postgresql import asyncpg
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.core.schema_upgrade import upgrade_schema
+from app.db import to_async_url, pool_options
+from app.models import Comment, Post, get_current_utc_time
+
+def test_to_async_url_picks_async_drivers():
+    assert to_async_url("postgresql://u:p@db/app").drivername == "postgresql+asyncpg"
+    assert to_async_url("sqlite:///./app.db").drivername == "sqlite+aiosqlite"
+    # already-async URLs pass through untouched
+    assert to_async_url("sqlite+aiosqlite://").drivername == "sqlite+aiosqlite"
+
+def test_pool_options_only_size_server_databases():
+    assert "pool_size" in pool_options("postgresql://u:p@db/app")
+    sqlite_options = pool_options("sqlite:///./app.db")
+    assert "pool_size" not in sqlite_options
+    assert sqlite_options["pool_pre_ping"] is True
+
+def test_upgrade_schema_brings_old_tables_up_to_date(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        # the post and comment tables as the first release created them
+        conn.execute(text("CREATE TABLE post (id INTEGER PRIMARY KEY, author_id INTEGER, title VARCHAR, content VARCHAR, created_at DATETIME)"))
+        conn.execute(text(
+            "CREATE TABLE comment (id INTEGER PRIMARY KEY, post_id INTEGER, user_id INTEGER, parent_id INTEGER,"
+            " content VARCHAR, deleted BOOLEAN, created_at DATETIME)"
+        ))
+        conn.execute(text("INSERT INTO post VALUES (1, 1, 't', 'c', '2020-01-01')"))
+        conn.execute(text("INSERT INTO comment VALUES (1, 1, 1, NULL, 'old', 0, '2020-01-01')"))
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        applied = upgrade_schema(conn)
+    assert {"comment.likes_count", "comment.flagged", "post.deleted_at", "ix_comment_post_path"} <= set(applied)
+
+    with Session(engine) as session:
+        assert session.get(Comment, 1).likes_count == 0
+        assert session.get(Post, 1).deleted_at is None
+    with engine.begin() as conn:
+        assert upgrade_schema(conn) == []
+
+def test_timestamps_bind_with_time_zone_on_postgres():
+    # asyncpg refuses the aware values get_current_utc_time makes for a plain TIMESTAMP
+    dialect = asyncpg.dialect()
+    for table in SQLModel.metadata.sorted_tables:
+        stamps = [c for c in table.columns if c.type.python_type is datetime]
+        for column in stamps:
+            assert column.type.timezone, column
+        if stamps:
+            compiled = str(insert(table).values({c.name: get_current_utc_time() for c in stamps}).compile(dialect=dialect))
+            assert compiled.count("::TIMESTAMP WITH TIME ZONE") == len(stamps), compiled
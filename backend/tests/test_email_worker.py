@@ -0,0 +1,109 @@
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from app.core.redis_client import redis_client
+from app.utils.email_utils import enqueue_otp_mail, MAIL_OUTBOX, MAIL_PROCESSING, MAIL_RETRY, MAIL_DEAD
+from app.workers.email_worker import EmailWorker
+
+
+class StubSMTPServer:
+    """Just enough SMTP to accept (or refuse) messages on localhost."""
+
+    def __init__(self, rcpt_reply: bytes = b"250 OK"):
+        self.rcpt_reply = rcpt_reply
+        self.messages = []
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        writer.write(b"220 stub ESMTP\r\n")
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                writer.write(b"250 stub\r\n")
+            elif command.startswith("RCPT TO"):
+                writer.write(self.rcpt_reply + b"\r\n")
+            elif command == "DATA":
+                writer.write(b"354 go ahead\r\n")
+                await writer.drain()
+                data = []
+                while (chunk := await reader.readline()) != b".\r\n":
+                    data.append(chunk)
+                self.messages.append(b"".join(data).decode())
+                writer.write(b"250 queued\r\n")
+            elif command == "QUIT":
+                writer.write(b"221 bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
+
+async def run_with_stub(stub: StubSMTPServer, work):
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    worker = EmailWorker(hostname="127.0.0.1", port=port, sender="noreply@example.com", batch_size=10)
+    try:
+        return await work(worker)
+    finally:
+        await worker.close()
+        server.close()
+        await server.wait_closed()
+
+def test_worker_sends_batch_over_one_connection():
+    stub = StubSMTPServer()
+
+    async def work(worker):
+        for i in range(3):
+            await enqueue_otp_mail(f"user{i}@example.com", "123456")
+        sent = await worker.run_once()
+        return sent, await redis_client.llen(MAIL_OUTBOX), await redis_client.llen(MAIL_PROCESSING)
+
+    assert asyncio.run(run_with_stub(stub, work)) == (3, 0, 0)
+    assert len(stub.messages) == 3
+    assert stub.connections == 1
+    assert "Your OTP code is 123456" in stub.messages[0]
+
+def test_transient_failure_is_scheduled_for_retry():
+    stub = StubSMTPServer(rcpt_reply=b"450 mailbox busy")
+
+    async def work(worker):
+        await enqueue_otp_mail("busy@example.com", "111111")
+        sent = await worker.run_once()
+        return sent, await redis_client.zrange(MAIL_RETRY, 0, -1), await redis_client.llen(MAIL_PROCESSING)
+
+    sent, retries, processing = asyncio.run(run_with_stub(stub, work))
+    assert sent == 0
+    assert processing == 0
+    assert json.loads(retries[0])["attempts"] == 1
+
+def test_permanent_failure_goes_to_dead_letter():
+    stub = StubSMTPServer(rcpt_reply=b"550 no such user")
+
+    async def work(worker):
+        await enqueue_otp_mail("ghost@example.com", "222222")
+        await worker.run_once()
+        return await redis_client.lrange(MAIL_DEAD, 0, -1)
+
+    dead = asyncio.run(run_with_stub(stub, work))
+    assert json.loads(dead[0])["to"] == "ghost@example.com"
+
+def test_claimed_messages_requeued_after_crash():
+    async def work():
+        await enqueue_otp_mail("crash@example.com", "333333")
+        worker = EmailWorker(hostname="127.0.0.1", port=1, sender="noreply@example.com")
+        await worker.fetch_batch(block=False)
+        assert await redis_client.llen(MAIL_PROCESSING) == 1
+        return await worker.requeue_in_flight(), await redis_client.llen(MAIL_OUTBOX)
+
+    assert asyncio.run(work()) == (1, 1)
+
+def test_register_enqueues_instead_of_sending(client: TestClient):
+    response = client.post("/auth/register", json={"username": "new", "email": "new@example.com", "password": "pw"})
+    assert response.status_code == 200
+    queued = asyncio.run(redis_client.lrange(MAIL_OUTBOX, 0, -1))
+    assert [json.loads(m)["to"] for m in queued] == ["new@example.com"]
@@ -0,0 +1,19 @@
+from datetime import datetime, timezone
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app.schemas import CommentOut
+from app.utils import fast_json
+from app.utils.fast_json import ThreadNode
+
+def test_thread_nodes_encode_like_comment_out():
+    naive = datetime(2024, 5, 1, 12, 30, 0, 123456)
+    aware = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    root = ThreadNode(1, 7, "ünïcode", None, 'quotes " and \\ slashes', 3, False, naive)
+    root.children.append(ThreadNode(2, 8, "bob", 1, "[deleted]", 0, True, aware, liked_by_me=True))
+    root.children[0].children.append(ThreadNode(3, 7, "alice", 2, "emoji 🎉", 1, False, naive, has_more_children=True, reply_cursor="abc"))
+
+    adapter = TypeAdapter(List[CommentOut])
+    expected = adapter.dump_json(adapter.validate_python([root], from_attributes=True)).decode()
+    assert fast_json.dumps([root]) == expected
@@ -0,0 +1,93 @@
+import asyncio
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from redis.exceptions import ConnectionError as RedisConnectionError
+from app.core import like_buffer
+import app.core.redis_client as redis_module
+from app.core.redis_client import redis_client
+from app.models import CommentLike
+
+from test_comments import create_user, create_post, get_auth_headers, add_comment
+
+def flush(db_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+    return asyncio.run(like_buffer.flush_all(engine))
+
+def likers(session: Session, comment_id: int):
+    return sorted(session.exec(select(CommentLike.user_id).where(CommentLike.comment_id == comment_id)).all())
+
+def test_toggles_are_buffered_then_flushed(client: TestClient, session: Session, db_path, monkeypatch):
+    monkeypatch.setattr(like_buffer, "LIKE_WRITE_BEHIND", True)
+    user = create_user(session)
+    other = create_user(session, "other")
+    post = create_post(session, user.id)
+    comment = add_comment(session, post.id, user.id, "hot")
+    # a like from before write-behind was enabled seeds the Redis set
+    session.add(CommentLike(comment_id=comment.id, user_id=other.id))
+    session.commit()
+    headers = get_auth_headers(client)
+
+    assert client.post(f"/comments/{comment.id}/like", headers=headers).json() == {"liked": True, "likes_count": 2}
+    assert client.post(f"/comments/{comment.id}/like", headers=headers).json() == {"liked": False, "likes_count": 1}
+    assert client.post(f"/comments/{comment.id}/like", headers=headers).json() == {"liked": True, "likes_count": 2}
+    assert likers(session, comment.id) == [other.id]
+
+    assert flush(db_path) == 3
+    session.expire_all()
+    assert likers(session, comment.id) == [user.id, other.id]
+    session.refresh(comment)
+    assert comment.likes_count == 2
+    assert client.get(f"/posts/{post.id}/comments").json()[0]["likes_count"] == 2
+
+def test_replay_after_crash_is_idempotent(client: TestClient, session: Session, db_path, monkeypatch):
+    monkeypatch.setattr(like_buffer, "LIKE_WRITE_BEHIND", True)
+    user = create_user(session)
+    post = create_post(session, user.id)
+    comment = add_comment(session, post.id, user.id, "hot")
+    headers = get_auth_headers(client)
+    client.post(f"/comments/{comment.id}/like", headers=headers)
+
+    flush(db_path)
+    # simulate a crash between the database commit and the watermark update
+    asyncio.run(redis_client.delete(like_buffer.LIKE_WATERMARK))
+    flush(db_path)
+
+    session.expire_all()
+    assert likers(session, comment.id) == [user.id]
+    session.refresh(comment)
+    assert comment.likes_count == 1
+
+def test_liked_by_me_sees_buffered_toggles(client: TestClient, session: Session, monkeypatch):
+    monkeypatch.setattr(like_buffer, "LIKE_WRITE_BEHIND", True)
+    user = create_user(session)
+    post = create_post(session, user.id)
+    buffered = add_comment(session, post.id, user.id, "buffered")
+    stored = add_comment(session, post.id, user.id, "stored")
+    session.add(CommentLike(comment_id=stored.id, user_id=user.id))
+    session.commit()
+    headers = get_auth_headers(client)
+
+    client.post(f"/comments/{buffered.id}/like", headers=headers)
+    flags = {c["id"]: c["liked_by_me"] for c in client.get(f"/posts/{post.id}/comments", headers=headers).json()}
+    assert flags == {buffered.id: True, stored.id: True}
+
+def test_liked_by_me_falls_back_to_the_table_without_redis(client: TestClient, session: Session, monkeypatch):
+    class DownRedis:
+        def pipeline(self, **kwargs):
+            raise RedisConnectionError("down")
+
+    monkeypatch.setattr(like_buffer, "LIKE_WRITE_BEHIND", True)
+    user = create_user(session)
+    post = create_post(session, user.id)
+    stored = add_comment(session, post.id, user.id, "stored")
+    session.add(CommentLike(comment_id=stored.id, user_id=user.id))
+    session.commit()
+    headers = get_auth_headers(client)
+
+    monkeypatch.setattr(like_buffer, "redis_client", DownRedis())
+    monkeypatch.setattr(redis_module, "_redis_down_until", 0.0)
+    response = client.get(f"/posts/{post.id}/thread", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["items"][0]["liked_by_me"] is True
@@ -0,0 +1,66 @@
+from datetime import timedelta
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from app.auth import create_access_token
+from app.models import CommentLike
+from app.scripts.reconcile_likes import reconcile_likes_counts
+
+from test_comments import create_user, create_post, get_auth_headers, add_comment
+
+def test_toggle_like_updates_counter(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    comment = add_comment(session, post.id, user.id, "likeable")
+    headers = get_auth_headers(client)
+
+    response = client.post(f"/comments/{comment.id}/like", headers=headers)
+    assert response.json() == {"liked": True, "likes_count": 1}
+    thread = client.get(f"/posts/{post.id}/comments").json()
+    assert thread[0]["likes_count"] == 1
+
+    response = client.post(f"/comments/{comment.id}/like", headers=headers)
+    assert response.json() == {"liked": False, "likes_count": 0}
+    session.refresh(comment)
+    assert comment.likes_count == 0
+
+def test_reconcile_fixes_drifted_counters(session: Session):
+    user = create_user(session)
+    other = create_user(session, "other")
+    post = create_post(session, user.id)
+    drifted = add_comment(session, post.id, user.id, "drifted")
+    untouched = add_comment(session, post.id, user.id, "untouched")
+    session.add(CommentLike(comment_id=drifted.id, user_id=user.id))
+    session.add(CommentLike(comment_id=drifted.id, user_id=other.id))
+    session.commit()
+
+    assert reconcile_likes_counts(session, batch_size=1) == 1
+    session.refresh(drifted)
+    session.refresh(untouched)
+    assert drifted.likes_count == 2
+    assert untouched.likes_count == 0
+
+def test_liked_by_me_is_per_viewer_on_a_shared_cache(client: TestClient, session: Session):
+    user = create_user(session)
+    other = create_user(session, "other")
+    post = create_post(session, user.id)
+    root = add_comment(session, post.id, user.id, "root")
+    reply = add_comment(session, post.id, user.id, "reply", parent_id=root.id)
+    session.add(CommentLike(comment_id=reply.id, user_id=user.id))
+    session.commit()
+
+    anonymous = client.get(f"/posts/{post.id}/comments").json()
+    assert anonymous[0]["liked_by_me"] is None
+    # served from the cached payload built by the anonymous read
+    mine = client.get(f"/posts/{post.id}/comments", headers=get_auth_headers(client)).json()
+    assert mine[0]["liked_by_me"] is False and mine[0]["children"][0]["liked_by_me"] is True
+    theirs = client.get(f"/posts/{post.id}/comments", headers=get_auth_headers(client, "other")).json()
+    assert theirs[0]["children"][0]["liked_by_me"] is False
+    assert client.get(f"/posts/{post.id}/comments").json()[0]["children"][0]["liked_by_me"] is None
+
+    thread = client.get(f"/posts/{post.id}/thread", headers=get_auth_headers(client)).json()
+    assert thread["items"][0]["children"][0]["liked_by_me"] is True
+    # a stale or broken token reads like no token at all
+    expired = {"Authorization": f"Bearer {create_access_token(user.id, timedelta(minutes=-1))}"}
+    for headers in ({"Authorization": "Bearer junk"}, expired):
+        assert client.get(f"/posts/{post.id}/comments", headers=headers).json()[0]["children"][0]["liked_by_me"] is None
+        assert client.get(f"/posts/{post.id}/thread", headers=headers).json()["items"][0]["liked_by_me"] is None
@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from fastapi import HTTPException, Response
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from app.libs.limiter import hit, parse_limit
+
+from test_comments import create_user, create_post, get_auth_headers, add_comment
+
+def test_parse_limit():
+    assert parse_limit("500/minute") == (500, 500 / 60000)
+    assert parse_limit("10/seconds")[0] == 10
+
+def test_bucket_blocks_when_empty_and_reports_quota():
+    async def run():
+        responses = [Response() for _ in range(3)]
+        for response in responses:
+            await hit("test", [("user:1", "3/hour")], response)
+        with pytest.raises(HTTPException) as blocked:
+            await hit("test", [("user:1", "3/hour")], Response())
+        # other keys have their own bucket
+        await hit("test", [("user:2", "3/hour")], Response())
+        return responses, blocked.value
+
+    responses, blocked = asyncio.run(run())
+    assert [r.headers["X-RateLimit-Remaining"] for r in responses] == ["2", "1", "0"]
+    assert blocked.status_code == 429
+    assert int(blocked.headers["Retry-After"]) >= 1
+
+def test_denied_request_does_not_drain_other_buckets():
+    async def run():
+        await hit("test", [("ip:a", "1/hour")], Response())
+        with pytest.raises(HTTPException):
+            await hit("test", [("user:1", "5/hour"), ("ip:a", "1/hour")], Response())
+        response = Response()
+        await hit("test", [("user:1", "5/hour")], response)
+        return response.headers["X-RateLimit-Remaining"]
+
+    assert asyncio.run(run()) == "4"
+
+def test_toggle_like_exposes_quota_headers(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    comment = add_comment(session, post.id, user.id, "likeable")
+    headers = get_auth_headers(client)
+
+    response = client.post(f"/comments/{comment.id}/like", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["X-RateLimit-Limit"] == "500"
+    assert response.headers["X-RateLimit-Remaining"] == "499"
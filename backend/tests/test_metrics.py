@@ -0,0 +1,74 @@
+import asyncio
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.core import metrics
+from app.core.redis_client import redis_client
+from test_comments import create_user, create_post, add_comment
+
+def test_metrics_endpoint_exposes_route_and_query_stats(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    for i in range(3):
+        add_comment(session, post.id, user.id, f"comment {i}")
+
+    route = "/posts/{post_id}/comments"
+    before = metrics.request_db_queries.count("GET", route)
+    queries_before = metrics.request_db_queries.total("GET", route)
+    assert client.get(f"/posts/{post.id}/comments").status_code == 200
+    client.get("/no/such/route")
+
+    # labelled by template, not by the raw path
+    assert metrics.http_requests.value("GET", route, "200") >= 1
+    assert metrics.http_requests.value("GET", "unmatched", "404") >= 1
+    assert metrics.request_db_queries.count("GET", route) == before + 1
+    # statements on the async engine are attributed to the request
+    assert metrics.request_db_queries.total("GET", route) > queries_before
+    assert metrics.http_in_flight.value("GET") == 0
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert '# TYPE http_request_duration_seconds histogram' in body
+    assert f'http_request_duration_seconds_bucket{{method="GET",route="{route}",le="+Inf"}}' in body
+    assert f'http_request_db_queries_count{{method="GET",route="{route}"}}' in body
+    assert "threadpool_capacity " in body
+    assert 'singleflight_requests_total{flight="thread",outcome="executed"}' in body
+    assert "websocket_connections 0" in body
+
+def test_sql_queries_counted_per_request_context(session: Session):
+    stats = metrics.RequestStats()
+    token = metrics._request_stats.set(stats)
+    try:
+        create_user(session)
+    finally:
+        metrics._request_stats.reset(token)
+    assert stats.queries >= 1
+    assert stats.db_seconds > 0
+
+def test_redis_commands_timed_by_name():
+    before = metrics.redis_latency.count("SET")
+    pipelines = metrics.redis_latency.count("PIPELINE")
+
+    async def run():
+        await redis_client.set("metrics:test", 1)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.get("metrics:test")
+            await pipe.execute()
+
+    asyncio.run(run())
+    assert metrics.redis_latency.count("SET") == before + 1
+    assert metrics.redis_latency.count("PIPELINE") == pipelines + 1
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_seconds", "Test.", ("kind",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, "a")
+    assert histogram.samples() == [
+        'test_seconds_bucket{kind="a",le="0.1"} 1',
+        'test_seconds_bucket{kind="a",le="1.0"} 3',
+        'test_seconds_bucket{kind="a",le="+Inf"} 4',
+        'test_seconds_sum{kind="a"} 6.05',
+        'test_seconds_count{kind="a"} 4',
+    ]
@@ -0,0 +1,83 @@
+import os
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.core import moderation
+from app.core.moderation import Moderator, TermMatcher, parse_terms
+from app.models import Comment
+from app.scripts.rescan_comments import rescan_comments
+from test_comments import create_user, create_post, get_auth_headers, add_comment
+
+def found(matcher: TermMatcher, text: str):
+    return [(m.term.text, text[m.start:m.end]) for m in matcher.finditer(text)]
+
+@pytest.fixture(name="terms_file")
+def terms_file_fixture(tmp_path, monkeypatch):
+    path = tmp_path / "terms.txt"
+    path.write_text("# blocklist\nbadword\nheck | mask\n*spam* | flag\n")
+    monkeypatch.setattr(moderation, "moderator", Moderator(str(path), reload_interval=0))
+    return path
+
+def test_matcher_overlaps_and_word_boundaries():
+    matcher = TermMatcher(parse_terms(["he", "she", "hers", "*ush*"]))
+    # "he" and "hers" sit inside "ushers", only unbounded terms match there
+    assert found(matcher, "ushers, she said") == [("ush", "ush"), ("she", "she")]
+    assert found(matcher, "he") == [("he", "he")]
+
+def test_matcher_folds_unicode_and_leetspeak():
+    matcher = TermMatcher(parse_terms(["badword"]))
+    for text in ("B4DW0RD", "ｂａｄｗｏｒｄ", "bádwörd", "bad​word", "bаdword"):
+        assert found(matcher, f"so {text}!") == [("badword", text)], text
+    assert found(matcher, "badwords") == []
+
+def test_parse_terms_rejects_unknown_action():
+    with pytest.raises(ValueError):
+        parse_terms(["term | delete"])
+
+def test_terms_reload_when_the_file_changes(terms_file):
+    checker = moderation.moderator
+    assert checker.check("badword").rejected
+    assert not checker.check("newterm").rejected
+
+    terms_file.write_text("newterm\n")
+    stat = os.stat(terms_file)
+    os.utime(terms_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert checker.check("newterm").rejected
+    assert not checker.check("badword").rejected
+
+    # a broken file keeps the list that was loaded
+    terms_file.write_text("newterm | explode\n")
+    os.utime(terms_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000))
+    assert checker.check("newterm").rejected
+
+def test_comment_writes_are_moderated(client: TestClient, session: Session, terms_file):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    headers = get_auth_headers(client)
+
+    response = client.post(f"/posts/{post.id}/comments", json={"content": "what a b4dword"}, headers=headers)
+    assert response.status_code == 400
+    masked = client.post(f"/posts/{post.id}/comments", json={"content": "oh HECK no"}, headers=headers).json()
+    assert masked["content"] == "oh **** no"
+    flagged = client.post(f"/posts/{post.id}/comments", json={"content": "buy spammy pills"}, headers=headers).json()
+    assert flagged["content"] == "buy spammy pills"
+    session.expire_all()
+    assert session.get(Comment, flagged["id"]).flagged is True
+    assert session.get(Comment, masked["id"]).flagged is False
+
+    assert client.patch(f"/comments/{masked['id']}", json={"content": "badword"}, headers=headers).status_code == 400
+    assert client.patch(f"/comments/{flagged['id']}", json={"content": "all clean"}, headers=headers).status_code == 200
+    session.expire_all()
+    assert session.get(Comment, flagged["id"]).flagged is False
+
+def test_rescan_flags_existing_comments(session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    hit = add_comment(session, post.id, user.id, "ancient badword")
+    miss = add_comment(session, post.id, user.id, "harmless")
+
+    assert rescan_comments(session, TermMatcher(parse_terms(["badword"])), batch_size=1) == 1
+    session.expire_all()
+    assert session.get(Comment, hit.id).flagged is True
+    assert session.get(Comment, miss.id).flagged is False
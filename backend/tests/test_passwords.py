@@ -0,0 +1,39 @@
+import asyncio
+from fastapi.testclient import TestClient
+from passlib.hash import bcrypt
+from sqlmodel import Session
+from app.core import passwords
+from app.models import User
+
+from test_comments import create_user
+
+def test_hashing_runs_on_process_pool(monkeypatch):
+    monkeypatch.setattr(passwords, "PASSWORD_POOL_WORKERS", 1)
+
+    async def run():
+        hashed = await passwords.run_in_password_pool(passwords.get_password_hash, "secret")
+        return await passwords.run_in_password_pool(passwords.verify_password, "secret", hashed)
+
+    try:
+        assert asyncio.run(run()) is True
+        assert passwords._executor is not None
+    finally:
+        passwords.shutdown_password_pool()
+
+def test_login_sheds_load_when_pool_is_full(client: TestClient, session: Session, monkeypatch):
+    create_user(session)
+    monkeypatch.setattr(passwords, "PASSWORD_POOL_MAX_PENDING", 0)
+    response = client.post("/auth/login", json={"username": "testuser", "password": "password"})
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+
+def test_login_upgrades_weak_hash(client: TestClient, session: Session):
+    user = User(username="legacy", email="legacy@example.com", password_hash=bcrypt.using(rounds=4).hash("password"), is_verified=True)
+    session.add(user)
+    session.commit()
+
+    response = client.post("/auth/login", json={"username": "legacy", "password": "password"})
+    assert response.status_code == 200
+    session.refresh(user)
+    assert user.password_hash.startswith(f"$2b${passwords.BCRYPT_ROUNDS}$")
+    assert client.post("/auth/login", json={"username": "legacy", "password": "wrong"}).status_code == 401
@@ -0,0 +1,134 @@
+import asyncio
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, select
+
+from app.models import Comment, CommentLike, Post
+from app.core.cache import thread_version_key
+from app.core.post_purge import purge_deleted_posts
+from app.scripts.reconcile_post_counters import reconcile_post_counters
+from conftest import redis_server
+from test_comments import create_user, create_post, get_auth_headers, add_comment
+
+def test_feed_pages_newest_first(client: TestClient, session: Session):
+    user = create_user(session)
+    posts = [create_post(session, user.id) for _ in range(5)]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/posts/feed", params=params).json()
+        seen += [p["id"] for p in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [p.id for p in reversed(posts)]
+    assert client.get("/posts/feed", params={"cursor": "garbage"}).status_code == 400
+
+def test_comment_create_and_delete_maintain_post_counters(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    headers = get_auth_headers(client)
+
+    first = client.post(f"/posts/{post.id}/comments", json={"content": "one"}, headers=headers).json()
+    client.post(f"/posts/{post.id}/comments", json={"content": "two", "parent_id": first["id"]}, headers=headers)
+    item = client.get("/posts/feed").json()["items"][0]
+    assert item["comments_count"] == 2
+    assert item["last_activity_at"] >= item["created_at"]
+
+    assert client.delete(f"/comments/{first['id']}", headers=headers).status_code == 204
+    client.delete(f"/comments/{first['id']}", headers=headers)
+    assert client.get("/posts/feed").json()["items"][0]["comments_count"] == 1
+
+def test_reconcile_post_counters(session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    comment = add_comment(session, post.id, user.id, "not counted")
+
+    assert reconcile_post_counters(session, batch_size=1) == 1
+    session.refresh(post)
+    assert post.comments_count == 1
+    assert post.last_activity_at == comment.created_at
+    assert reconcile_post_counters(session) == 0
+
+def _purge(db_path, **kwargs):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+    return asyncio.run(purge_deleted_posts(engine, **kwargs))
+
+def _thread_with_likes(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    headers = get_auth_headers(client)
+    root = client.post(f"/posts/{post.id}/comments", json={"content": "doomed root"}, headers=headers).json()
+    reply = client.post(f"/posts/{post.id}/comments", json={"content": "doomed reply", "parent_id": root["id"]}, headers=headers).json()
+    for comment in (root, reply):
+        client.post(f"/comments/{comment['id']}/like", headers=headers)
+    return post.id, headers
+
+def test_delete_post_tombstones_immediately(client: TestClient, session: Session):
+    post_id, headers = _thread_with_likes(client, session)
+
+    assert client.delete(f"/posts/{post_id}", headers=headers).json() == {"ok": True}
+    assert client.get(f"/posts/{post_id}").status_code == 404
+    assert client.get("/posts/feed").json()["items"] == []
+    assert client.get(f"/posts/{post_id}/comments").json() == []
+    assert client.get(f"/posts/{post_id}/thread").status_code == 404
+    assert client.get("/search", params={"q": "doomed"}).json()["items"] == []
+    assert client.post(f"/posts/{post_id}/comments", json={"content": "late"}, headers=headers).status_code == 404
+    assert client.delete(f"/posts/{post_id}", headers=headers).status_code == 404
+    # comments of the post are reachable by id until the purge, but not served
+    for comment in session.exec(select(Comment).where(Comment.post_id == post_id)).all():
+        assert client.post(f"/comments/{comment.id}/like", headers=headers).status_code == 404
+        assert client.patch(f"/comments/{comment.id}", json={"content": "edited"}, headers=headers).status_code == 404
+        assert client.get(f"/comments/{comment.id}/replies").status_code == 404
+        assert client.get(f"/comments/{comment.id}/context").status_code == 404
+        assert client.delete(f"/comments/{comment.id}", headers=headers).status_code == 404
+
+    # nothing else was touched by the request
+    session.expire_all()
+    assert session.get(Post, post_id).deleted_at is not None
+    assert len(session.exec(select(Comment).where(Comment.post_id == post_id)).all()) == 2
+    assert len(session.exec(select(CommentLike)).all()) == 2
+
+def test_purge_removes_everything_in_batches(client: TestClient, session: Session, db_path):
+    post_id, headers = _thread_with_likes(client, session)
+    client.delete(f"/posts/{post_id}", headers=headers)
+
+    batches = []
+
+    async def progress(post_id, table, rows):
+        batches.append((table, rows))
+
+    assert _purge(db_path, batch_size=1, progress=progress) == 1
+    # the reply (newer id) goes before its parent, each with its like first
+    assert batches[:4] == [("likes", 1), ("likes", 0), ("comments", 1), ("likes", 1)]
+    assert ("posts", 1) in batches
+    session.expire_all()
+    assert session.get(Post, post_id) is None
+    assert session.exec(select(Comment)).all() == []
+    assert session.exec(select(CommentLike)).all() == []
+    assert session.exec(text("SELECT count(*) FROM search_index")).one()[0] == 0
+    assert not fakeredis.FakeRedis(server=redis_server).exists(thread_version_key(post_id))
+    assert _purge(db_path) == 0
+
+def test_purge_resumes_after_interruption(client: TestClient, session: Session, db_path):
+    post_id, headers = _thread_with_likes(client, session)
+    client.delete(f"/posts/{post_id}", headers=headers)
+
+    async def crash_after_first_comment(post_id, table, rows):
+        if table == "comments":
+            raise RuntimeError("worker restarted")
+
+    with pytest.raises(RuntimeError):
+        _purge(db_path, batch_size=1, progress=crash_after_first_comment)
+    session.expire_all()
+    assert len(session.exec(select(Comment)).all()) == 1
+
+    assert _purge(db_path, batch_size=1) == 1
+    session.expire_all()
+    assert session.get(Post, post_id) is None
+    assert session.exec(select(Comment)).all() == []
@@ -0,0 +1,35 @@
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from app import db
+from app.main import app
+
+from test_comments import create_user, create_post, get_auth_headers
+
+def test_reads_use_replica_outside_read_your_writes_window(client: TestClient, session: Session, db_path, tmp_path, monkeypatch):
+    # an empty replica stands in for one that has not caught up yet
+    replica_path = tmp_path / "replica.db"
+    replica_sync = create_engine(f"sqlite:///{replica_path}")
+    SQLModel.metadata.create_all(replica_sync)
+    replica_sync.dispose()
+    monkeypatch.setattr(db, "async_engine", create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool))
+    monkeypatch.setattr(db, "replica_engine", create_async_engine(f"sqlite+aiosqlite:///{replica_path}", poolclass=NullPool))
+    app.dependency_overrides.pop(db.get_read_session)
+
+    user = create_user(session)
+    post = create_post(session, user.id)
+    headers = get_auth_headers(client)
+
+    assert client.get(f"/posts/{post.id}").status_code == 404
+    assert client.get(f"/posts/{post.id}", headers=headers).status_code == 404
+
+    response = client.put(f"/posts/{post.id}", json={"title": "Edited", "content": "Body"}, headers=headers)
+    assert response.status_code == 200
+
+    # the writer now reads from the primary, anonymous readers stay on the replica
+    response = client.get(f"/posts/{post.id}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["title"] == "Edited"
+    assert client.get("/posts/", headers=headers).json()[0]["title"] == "Edited"
+    assert client.get("/posts/").json() == []
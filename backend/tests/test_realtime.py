@@ -0,0 +1,68 @@
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from app.core import realtime
+from app.core.realtime import EventHub, publish_event
+
+from test_comments import create_user, create_post, get_auth_headers, add_comment
+
+def test_hub_fans_out_published_events():
+    hub = EventHub()
+
+    async def run():
+        first, second = await hub.subscribe(1), await hub.subscribe(1)
+        other = await hub.subscribe(2)
+        await publish_event(1, "new_comment", {"id": 7})
+        events = [await asyncio.wait_for(s.get(), 2) for s in (first, second)]
+        for subscription in (first, second, other):
+            await hub.unsubscribe(subscription)
+        return events, other.queue.qsize()
+
+    events, other_pending = asyncio.run(run())
+    assert [json.loads(e) for e in events] == [{"type": "new_comment", "data": {"id": 7}}] * 2
+    assert other_pending == 0
+    assert hub.connections == 0
+
+def test_like_counts_are_coalesced():
+    hub = EventHub()
+    subscription = realtime.Subscription(1)
+    hub._subscriptions[1] = {subscription}
+
+    for count in range(1, 6):
+        hub.dispatch(1, json.dumps({"type": "like_count", "data": {"id": 3, "likes_count": count}}))
+    hub.dispatch(1, json.dumps({"type": "like_count", "data": {"id": 4, "likes_count": 1}}))
+    hub.flush_likes()
+
+    assert subscription.queue.qsize() == 1
+    event = json.loads(subscription.queue.get_nowait())
+    assert event == {"type": "like_counts", "data": [{"id": 3, "likes_count": 5}, {"id": 4, "likes_count": 1}]}
+
+def test_slow_consumer_gets_resync(monkeypatch):
+    monkeypatch.setattr(realtime, "EVENT_QUEUE_SIZE", 2)
+    hub = EventHub()
+    subscription = realtime.Subscription(1)
+    hub._subscriptions[1] = {subscription}
+
+    for i in range(3):
+        hub.dispatch(1, json.dumps({"type": "new_comment", "data": {"id": i}}))
+
+    assert subscription.queue.qsize() == 1
+    assert subscription.queue.get_nowait() == realtime.RESYNC
+    assert hub.resyncs == 1
+
+def test_websocket_receives_new_comments(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    headers = get_auth_headers(client)
+
+    with client.websocket_connect(f"/ws/posts/{post.id}") as websocket:
+        # wait until the hub's subscription is live before publishing
+        for _ in range(100):
+            if realtime.hub.connections:
+                break
+            asyncio.run(asyncio.sleep(0.01))
+        client.post(f"/posts/{post.id}/comments", json={"content": "live"}, headers=headers)
+        event = json.loads(websocket.receive_text())
+    assert event["type"] == "new_comment"
+    assert event["data"]["content"] == "live"
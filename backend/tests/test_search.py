@@ -0,0 +1,59 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.scripts.rebuild_search_index import rebuild_search_index
+from test_comments import create_user, create_post, get_auth_headers, add_comment
+
+def _comment(client, headers, post_id, content):
+    return client.post(f"/posts/{post_id}/comments", json={"content": content}, headers=headers).json()
+
+def test_search_follows_create_update_delete(client: TestClient, session: Session):
+    create_user(session)
+    headers = get_auth_headers(client)
+    post = client.post("/posts/", json={"title": "Gardening", "content": "Tomatoes and basil"}, headers=headers).json()
+    running = _comment(client, headers, post["id"], "I went running with the dogs")
+    other = _comment(client, headers, post["id"], "nothing relevant here")
+
+    hits = client.get("/search", params={"q": "run dog"}).json()["items"]
+    assert [(h["type"], h["id"]) for h in hits] == [("comment", running["id"])]
+    assert hits[0]["post_id"] == post["id"]
+    assert client.get("/search", params={"q": "tomatoes"}).json()["items"][0]["title"] == "Gardening"
+
+    client.patch(f"/comments/{other['id']}", json={"content": "dogs everywhere"}, headers=headers)
+    assert {h["id"] for h in client.get("/search", params={"q": "dogs"}).json()["items"]} == {running["id"], other["id"]}
+
+    client.delete(f"/comments/{running['id']}", headers=headers)
+    assert [h["id"] for h in client.get("/search", params={"q": "dogs"}).json()["items"]] == [other["id"]]
+
+def test_search_ranks_filters_and_paginates(client: TestClient, session: Session):
+    create_user(session)
+    headers = get_auth_headers(client)
+    first = client.post("/posts/", json={"title": "one", "content": "x"}, headers=headers).json()
+    second = client.post("/posts/", json={"title": "two", "content": "y"}, headers=headers).json()
+    strong = _comment(client, headers, first["id"], "kiwi kiwi kiwi")
+    for i in range(4):
+        _comment(client, headers, first["id"], f"kiwi and a lot of other words number {i}")
+    elsewhere = _comment(client, headers, second["id"], "kiwi")
+
+    page = client.get("/search", params={"q": "kiwi", "post_id": first["id"], "limit": 2}).json()
+    assert page["items"][0]["id"] == strong["id"]
+    seen = [h["id"] for h in page["items"]]
+    while page["next_cursor"]:
+        page = client.get("/search", params={"q": "kiwi", "post_id": first["id"], "limit": 2, "cursor": page["next_cursor"]}).json()
+        seen += [h["id"] for h in page["items"]]
+    assert len(seen) == len(set(seen)) == 5
+    assert elsewhere["id"] not in seen
+    assert client.get("/search", params={"q": "kiwi", "type": "post"}).json()["items"] == []
+    assert client.get("/search", params={"q": "kiwi", "cursor": "garbage"}).status_code == 400
+
+def test_rebuild_search_index(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    comment = add_comment(session, post.id, user.id, "written before the index existed")
+    session.exec(text("DELETE FROM search_index"))
+    session.commit()
+
+    assert rebuild_search_index(session, batch_size=1) == 2
+    hits = client.get("/search", params={"q": "index existed"}).json()["items"]
+    assert [h["id"] for h in hits] == [comment.id]
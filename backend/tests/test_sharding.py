@@ -0,0 +1,155 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, create_engine, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.post_purge import purge_deleted_posts
+from app.core.sharding import HashRing, shard_metadata, shard_router
+from app.models import Comment, CommentLike, CommentLocator, PostShard
+from app.scripts.rebalance_shards import move_post, pin_remapped_posts
+from test_comments import create_user, create_post, get_auth_headers
+
+def _async_engine(path):
+    return create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+
+@pytest.fixture(name="shards")
+def shards_fixture(client: TestClient, db_path, tmp_path):
+    # main plus two comment shards, each its own SQLite file
+    previous = dict(shard_router.engines)
+    sync_engines = {}
+    engines = {"main": _async_engine(db_path)}
+    for name in ("a", "b"):
+        sync_engines[name] = create_engine(f"sqlite:///{tmp_path / name}.db")
+        shard_metadata().create_all(sync_engines[name])
+        engines[name] = _async_engine(tmp_path / f"{name}.db")
+    shard_router.configure(engines)
+    yield sync_engines
+    shard_router.configure(previous)
+    for engine in sync_engines.values():
+        engine.dispose()
+
+def _comments_on(engine):
+    with Session(engine) as session:
+        return session.exec(select(Comment.id, Comment.post_id)).all()
+
+def _pin(session: Session, post_id: int, shard: str):
+    session.add(PostShard(post_id=post_id, shard=shard))
+    session.commit()
+
+def test_hash_ring_remaps_a_fraction_when_a_shard_is_added():
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b", "c", "d"])
+    moved = [i for i in range(10_000) if before.lookup(i) != after.lookup(i)]
+    # only keys now owned by the new shard move
+    assert all(after.lookup(i) == "d" for i in moved)
+    assert 1500 < len(moved) < 3500
+
+def test_comments_live_on_their_post_shard(client: TestClient, session: Session, shards):
+    user = create_user(session)
+    post_a, post_b = create_post(session, user.id), create_post(session, user.id)
+    _pin(session, post_a.id, "a")
+    _pin(session, post_b.id, "b")
+    headers = get_auth_headers(client)
+
+    root = client.post(f"/posts/{post_a.id}/comments", json={"content": "sharded hello"}, headers=headers).json()
+    reply = client.post(
+        f"/posts/{post_a.id}/comments", json={"content": "reply", "parent_id": root["id"]}, headers=headers
+    ).json()
+    other = client.post(f"/posts/{post_b.id}/comments", json={"content": "elsewhere"}, headers=headers).json()
+    # ids come from the main database, unique across shards
+    assert len({root["id"], reply["id"], other["id"]}) == 3
+    assert reply["username"] == user.username
+
+    assert sorted(_comments_on(shards["a"])) == [(root["id"], post_a.id), (reply["id"], post_a.id)]
+    assert _comments_on(shards["b"]) == [(other["id"], post_b.id)]
+    assert session.exec(select(Comment)).all() == []
+    assert len(session.exec(select(CommentLocator)).all()) == 3
+    session.expire_all()
+    assert session.get(type(post_a), post_a.id).comments_count == 2
+
+    # comment routes find the shard through the locator
+    assert client.post(f"/comments/{reply['id']}/like", headers=headers).json() == {"liked": True, "likes_count": 1}
+    with Session(shards["a"]) as shard_session:
+        assert shard_session.exec(select(CommentLike.comment_id)).all() == [reply["id"]]
+    tree = client.get(f"/posts/{post_a.id}/comments", headers=headers).json()
+    assert tree[0]["username"] == user.username
+    assert tree[0]["children"][0]["liked_by_me"] is True
+    context = client.get(f"/comments/{reply['id']}/context").json()
+    assert [c["id"] for c in context["ancestors"]] == [root["id"]]
+    assert client.get(f"/comments/{root['id']}/replies").json()["items"][0]["id"] == reply["id"]
+    assert client.get("/search", params={"q": "sharded"}).json()["items"][0]["id"] == root["id"]
+    thread = client.get(f"/posts/{post_a.id}/thread").json()
+    assert thread["items"][0]["children"][0]["username"] == user.username
+    export = client.get(f"/posts/{post_a.id}/comments/export").text.splitlines()
+    assert [json.loads(line)["username"] for line in export] == [user.username] * 2
+
+    assert client.delete(f"/comments/{other['id']}", headers=headers).status_code == 204
+    with Session(shards["b"]) as shard_session:
+        assert shard_session.get(Comment, other["id"]).deleted is True
+    assert client.get("/comments/999999/replies").status_code == 404
+
+def test_move_post_between_shards(client: TestClient, session: Session, shards, db_path):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    _pin(session, post.id, "a")
+    post_id = post.id
+    headers = get_auth_headers(client)
+    root = client.post(f"/posts/{post_id}/comments", json={"content": "moving"}, headers=headers).json()
+    reply = client.post(f"/posts/{post_id}/comments", json={"content": "along", "parent_id": root["id"]}, headers=headers).json()
+    client.post(f"/comments/{reply['id']}/like", headers=headers)
+    assert client.get(f"/posts/{post_id}/comments").json()[0]["id"] == root["id"]
+
+    moved = asyncio.run(move_post(post_id, "b", _async_engine(db_path), batch_size=1, settle=0, progress=lambda _: None))
+    assert moved == 2
+    assert _comments_on(shards["a"]) == []
+    assert sorted(_comments_on(shards["b"])) == [(root["id"], post_id), (reply["id"], post_id)]
+    session.expire_all()
+    placement = session.get(PostShard, post_id)
+    assert (placement.shard, placement.moving_to) == ("b", None)
+
+    # the thread version was bumped, readers see the moved copy
+    tree = client.get(f"/posts/{post_id}/comments").json()
+    assert tree[0]["children"][0]["likes_count"] == 1
+    assert client.post(f"/comments/{reply['id']}/like", headers=headers).json()["liked"] is False
+
+def test_writes_rejected_while_moving(client: TestClient, session: Session, shards):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    session.add(PostShard(post_id=post.id, shard="a", moving_to="b"))
+    session.commit()
+    headers = get_auth_headers(client)
+
+    response = client.post(f"/posts/{post.id}/comments", json={"content": "wait"}, headers=headers)
+    assert response.status_code == 503
+    assert "retry-after" in response.headers
+    assert client.get(f"/posts/{post.id}/comments").status_code == 200
+
+def test_pin_keeps_remapped_posts_in_place(session: Session, shards, db_path):
+    user = create_user(session)
+    post_ids = [create_post(session, user.id).id for _ in range(40)]
+    pinned = asyncio.run(pin_remapped_posts("main,a=x,b=y,c=z", _async_engine(db_path)))
+    rows = session.exec(select(PostShard)).all()
+    assert pinned == len(rows) > 0
+    # pinned to where they are now, exactly the posts the new ring remaps
+    new_ring = HashRing(["a", "b", "c", "main"])
+    assert {r.post_id for r in rows} == {p for p in post_ids if new_ring.lookup(p) != shard_router.ring_shard(p)}
+    assert all(r.shard == shard_router.ring_shard(r.post_id) for r in rows)
+
+def test_purge_removes_sharded_thread(client: TestClient, session: Session, shards, db_path):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    _pin(session, post.id, "b")
+    post_id = post.id
+    headers = get_auth_headers(client)
+    comment = client.post(f"/posts/{post_id}/comments", json={"content": "gone soon"}, headers=headers).json()
+    client.post(f"/comments/{comment['id']}/like", headers=headers)
+    client.delete(f"/posts/{post_id}", headers=headers)
+
+    assert asyncio.run(purge_deleted_posts(_async_engine(db_path))) == 1
+    assert _comments_on(shards["b"]) == []
+    session.expire_all()
+    assert session.exec(select(CommentLocator)).all() == []
+    assert session.get(PostShard, post_id) is None
@@ -0,0 +1,71 @@
+import asyncio
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from app.core.singleflight import SingleFlight
+
+from test_comments import create_user, create_post
+
+def test_concurrent_callers_share_one_computation():
+    flight = SingleFlight("test-local")
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", compute) for _ in range(50)))
+
+    assert asyncio.run(run()) == ["result"] * 50
+    assert calls == 1
+    assert flight.stats() == {"executed": 1, "coalesced_local": 49, "coalesced_remote": 0}
+
+def test_followers_in_other_workers_reuse_leader_result():
+    # two instances with separate in-process maps behave like two workers
+    leader, follower = SingleFlight("test-remote"), SingleFlight("test-remote")
+
+    async def slow():
+        await asyncio.sleep(0.1)
+        return "from leader"
+
+    async def fast():
+        return "computed again"
+
+    async def run():
+        first = asyncio.ensure_future(leader.do("key", slow))
+        await asyncio.sleep(0.02)
+        return await asyncio.gather(first, follower.do("key", fast))
+
+    assert asyncio.run(run()) == ["from leader", "from leader"]
+    assert follower.stats()["coalesced_remote"] == 1
+    assert follower.stats()["executed"] == 0
+
+def test_errors_propagate_and_release_key():
+    flight = SingleFlight("test-errors")
+
+    async def boom():
+        raise ValueError("nope")
+
+    async def ok():
+        return "fine"
+
+    async def run():
+        try:
+            await flight.do("key", boom)
+        except ValueError:
+            pass
+        return await flight.do("key", ok)
+
+    assert asyncio.run(run()) == "fine"
+
+def test_get_post_through_single_flight(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+
+    response = client.get(f"/posts/{post.id}")
+    assert response.status_code == 200
+    assert response.json()["title"] == "Test Post"
+    assert client.get("/posts/999").status_code == 404
+    assert "post" in client.get("/stats/coalescing").json()
@@ -0,0 +1,38 @@
+import asyncio
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from app.core.user_cache import invalidate_user, clear_local_cache
+
+from test_comments import create_user, create_post, get_auth_headers
+
+def test_principal_served_from_cache(client: TestClient, session: Session):
+    user = create_user(session)
+    post = create_post(session, user.id)
+    headers = get_auth_headers(client)
+    assert client.post(f"/posts/{post.id}/comments", json={"content": "warm"}, headers=headers).status_code == 200
+
+    # rename behind the cache's back: the cached principal is still used
+    user.username = "renamed"
+    session.add(user)
+    session.commit()
+    response = client.post(f"/posts/{post.id}/comments", json={"content": "cached"}, headers=headers)
+    assert response.json()["username"] == "testuser"
+
+    # the Redis tier survives a cold worker cache
+    clear_local_cache()
+    response = client.post(f"/posts/{post.id}/comments", json={"content": "redis"}, headers=headers)
+    assert response.json()["username"] == "testuser"
+
+    asyncio.run(invalidate_user(user.id))
+    response = client.post(f"/posts/{post.id}/comments", json={"content": "fresh"}, headers=headers)
+    assert response.json()["username"] == "renamed"
+
+def test_deleted_user_rejected_after_invalidation(client: TestClient, session: Session):
+    user = create_user(session)
+    headers = get_auth_headers(client)
+    assert client.post("/posts/", json={"title": "t", "content": "c"}, headers=headers).status_code == 200
+
+    session.delete(user)
+    session.commit()
+    asyncio.run(invalidate_user(user.id))
+    assert client.post("/posts/", json={"title": "t", "content": "c"}, headers=headers).status_code == 401